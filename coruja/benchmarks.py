@@ -0,0 +1,887 @@
+import os
+import platform
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from random import Random
+from tempfile import mkstemp
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from flask import Flask, url_for
+from sqlalchemy import insert, select
+
+from .extensions.database import db
+from .extensions.profiler import QueryProfiler, get_query_budget, summarize
+from .models import (
+    Active,
+    ActiveScore,
+    AdverseAction,
+    AdverseActionScore,
+    AnalysisVulnerability,
+    Organ,
+    Permission,
+    Threat,
+    User,
+    Vulnerability,
+    VulnerabilityCategory,
+    VulnerabilityScore,
+    VulnerabilitySubCategory,
+)
+from .models.hierarchy import rebuild_closure
+from .models.log_partitions import insert_access_logs
+from .models.rollups import rebuild_rollups
+from .models.search import create_fts_table, rebuild_search_index
+from .utils import database_manager
+
+# Configurações da aplicação criada por `seeded_app`. São passadas como
+# variáveis de ambiente (dynaconf), que têm precedência sobre o settings.toml
+SEEDED_APP_SETTINGS = {
+    "TESTING": "true",
+    "WTF_CSRF_ENABLED": "false",
+    "ACCESS_LOG_ASYNC": "false",
+    "ANALYSIS_REPORT_CACHE": '""',
+}
+
+# Hash bcrypt inválido dos usuários gerados; evita o custo do bcrypt
+SEED_PASSWORD = "$2b$12$" + "x" * 53
+
+# Linhas inseridas por comando
+INSERT_BATCH_SIZE = 5000
+
+# Quantidades padrão de `seed_database`. Exceto `organs` e `experts`, são
+# quantidades por item do nível anterior da hierarquia.
+SEED_SIZES = {
+    "organs": 1,
+    "institutions": 1,
+    "units": 1,
+    "analyses": 1,
+    "experts": 3,
+    "actives": 5,
+    "threats": 2,
+    "adverse_actions": 2,
+    "categories": 3,
+    "subcategories": 3,
+    "vulnerabilities": 4,
+    "access_logs": 0,
+}
+
+# Quantidades padrão de `flask seed-bench` e `flask bench-routes`, próximas
+# de uma instalação em produção
+BENCH_SIZES = {
+    **SEED_SIZES,
+    "organs": 2,
+    "institutions": 3,
+    "units": 2,
+    "analyses": 2,
+    "experts": 20,
+    "actives": 30,
+    "threats": 3,
+    "adverse_actions": 3,
+    "categories": 8,
+    "subcategories": 5,
+    "vulnerabilities": 6,
+    "access_logs": 50_000,
+}
+
+# Período (em dias, até agora) dos logs de acesso gerados
+ACCESS_LOG_SEED_DAYS = 180
+
+# Caminhos registrados nos logs de acesso gerados
+ACCESS_LOG_SEED_PATHS = (
+    "/app/home",
+    "/orgao/1",
+    "/analise/1",
+    "/analise-risco/1",
+    "/analise-vulnerabilidade/1",
+    "/api/v1/get-actives",
+)
+
+# Quantidades multiplicadas pela escala em `measure_scales`: as
+# consultas de uma página não devem crescer com os itens que ela lista.
+# Apenas um nível de cada ramo é mantido fixo, de forma que os totais
+# fiquem abaixo do tamanho das listas IN divididas em partes (500 IDs).
+SCALED_SIZES = (
+    "experts",
+    "actives",
+    "threats",
+    "categories",
+    "vulnerabilities",
+)
+
+# Escalas comparadas na verificação dos orçamentos de consultas
+BUDGET_SCALES = (1, 3)
+
+# Requisição: (endpoint, argumentos da URL, corpo JSON). Os valores são
+# chaves do dicionário retornado por `seed_database`; requisições com corpo
+# JSON são enviadas com POST.
+RouteRequest = Tuple[str, Dict[str, str], Optional[Dict[str, str]]]
+
+# Rotas verificadas por `check_query_budgets` e medidas por
+# `benchmark_routes`
+ROUTE_REQUESTS: List[RouteRequest] = [
+    ("application.home", {}, None),
+    ("organ.get_organ", {"organ_id": "organ_id"}, None),
+    (
+        "institution.get_institution",
+        {"institution_id": "institution_id"},
+        None,
+    ),
+    ("unit.get_unit", {"unit_id": "unit_id"}, None),
+    ("analysis.get_analysis", {"analysis_id": "analysis_id"}, None),
+    (
+        "analysis_risk.get_analysis_risk",
+        {"analysis_risk_id": "analysis_risk_id"},
+        None,
+    ),
+    (
+        "analysis_vulnerability.get_analysis_vulnerability",
+        {"analysis_vulnerability_id": "analysis_vulnerability_id"},
+        None,
+    ),
+    ("api.get_users", {"query": "user_query"}, None),
+    ("api.get_actives", {}, {"ar_id": "analysis_risk_id"}),
+    ("api.get_user_actives", {}, {"ar_id": "analysis_risk_id"}),
+    (
+        "api.get_analysis_risk_workspace",
+        {"analysis_risk_id": "analysis_risk_id"},
+        None,
+    ),
+    (
+        "api.get_threats",
+        {},
+        {"ac_id": "active_id", "ar_id": "analysis_risk_id"},
+    ),
+    ("api.get_categories", {}, {"av_id": "analysis_vulnerability_id"}),
+    (
+        "api.get_analysis_vulnerability_workspace",
+        {"analysis_vulnerability_id": "analysis_vulnerability_id"},
+        None,
+    ),
+    (
+        "api.get_subcategories",
+        {},
+        {"c_id": "category_id", "av_id": "analysis_vulnerability_id"},
+    ),
+    (
+        "api.get_vulnerabilities",
+        {},
+        {"sc_id": "subcategory_id", "av_id": "analysis_vulnerability_id"},
+    ),
+]
+
+
+def _insert(table, rows: List[Dict]) -> None:
+    connection = db.session.connection()
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        connection.execute(
+            insert(table), rows[start : start + INSERT_BATCH_SIZE]
+        )
+
+
+def _seed_catalog(categories: int, subcategories: int, vulnerabilities: int):
+    """Cria o catálogo modelo de vulnerabilidades"""
+    _insert(
+        VulnerabilityCategory.__table__,
+        [
+            {"name": f"Categoria {c}", "is_template": True}
+            for c in range(categories)
+        ],
+    )
+    category_ids = db.session.scalars(
+        select(VulnerabilityCategory.id).order_by(VulnerabilityCategory.id)
+    ).all()
+
+    _insert(
+        VulnerabilitySubCategory.__table__,
+        [
+            {
+                "name": f"Subcategoria {category_id}.{s}",
+                "category_id": category_id,
+                "is_template": True,
+            }
+            for category_id in category_ids
+            for s in range(subcategories)
+        ],
+    )
+    subcategory_ids = db.session.scalars(
+        select(VulnerabilitySubCategory.id).order_by(
+            VulnerabilitySubCategory.id
+        )
+    ).all()
+
+    _insert(
+        Vulnerability.__table__,
+        [
+            {
+                "name": f"Vulnerabilidade {subcategory_id}.{v}",
+                "description": "Gerada por seed_database",
+                "sub_category_id": subcategory_id,
+                "is_template": True,
+            }
+            for subcategory_id in subcategory_ids
+            for v in range(vulnerabilities)
+        ],
+    )
+
+
+def _seed_analysis_risk(
+    analysis_risk_id: int,
+    expert_ids: List[int],
+    actives: int,
+    threats: int,
+    adverse_actions: int,
+    random: Random,
+) -> None:
+    """Cria os ativos, ameaças, ações adversas e pontuações de uma análise
+    de risco
+
+    O último especialista não pontua, de forma que as páginas exibam
+    pontuações parciais.
+    """
+    scorers = expert_ids[:-1]
+
+    _insert(
+        Active.__table__,
+        [
+            {
+                "title": f"Ativo {a}",
+                "description": "Gerado por seed_database",
+                "analysis_risk_id": analysis_risk_id,
+            }
+            for a in range(actives)
+        ],
+    )
+    active_ids = db.session.scalars(
+        select(Active.id).where(Active.analysis_risk_id == analysis_risk_id)
+    ).all()
+    _insert(
+        ActiveScore.__table__,
+        [
+            {
+                "user_id": user_id,
+                "active_id": active_id,
+                "substitutability": random.randint(0, 5),
+                "replacement_cost": random.randint(0, 5),
+                "essentiality": random.randint(0, 5),
+            }
+            for active_id in active_ids
+            for user_id in scorers
+        ],
+    )
+
+    _insert(
+        Threat.__table__,
+        [
+            {"title": f"Ameaça {active_id}.{t}", "active_id": active_id}
+            for active_id in active_ids
+            for t in range(threats)
+        ],
+    )
+    threat_ids = db.session.scalars(
+        select(Threat.id).where(Threat.active_id.in_(active_ids))
+    ).all()
+
+    _insert(
+        AdverseAction.__table__,
+        [
+            {"title": f"Ação adversa {threat_id}.{x}", "threat_id": threat_id}
+            for threat_id in threat_ids
+            for x in range(adverse_actions)
+        ],
+    )
+    adverse_action_ids = db.session.scalars(
+        select(AdverseAction.id).where(AdverseAction.threat_id.in_(threat_ids))
+    ).all()
+    _insert(
+        AdverseActionScore.__table__,
+        [
+            {
+                "user_id": user_id,
+                "adverse_action_id": adverse_action_id,
+                "motivation": random.randint(0, 5),
+                "capacity": random.randint(0, 5),
+                "accessibility": random.randint(0, 5),
+            }
+            for adverse_action_id in adverse_action_ids
+            for user_id in scorers
+        ],
+    )
+
+
+def _seed_vulnerability_scores(
+    analysis_vulnerability_id: int, expert_ids: List[int], random: Random
+) -> None:
+    """Pontua metade das vulnerabilidades do catálogo de uma análise"""
+    vulnerability_ids = db.session.scalars(
+        select(Vulnerability.id)
+        .join(VulnerabilitySubCategory)
+        .join(VulnerabilityCategory)
+        .join(
+            AnalysisVulnerability,
+            database_manager.get_catalog_condition(),
+        )
+        .where(AnalysisVulnerability.id == analysis_vulnerability_id)
+        .order_by(Vulnerability.id)
+    ).all()
+    _insert(
+        VulnerabilityScore.__table__,
+        [
+            {
+                "user_id": user_id,
+                "vulnerability_id": vulnerability_id,
+                "analysis_vulnerability_id": analysis_vulnerability_id,
+                "score": random.randint(1, 5),
+            }
+            for vulnerability_id in vulnerability_ids[::2]
+            for user_id in expert_ids[:-1]
+        ],
+    )
+
+
+def _seed_access_logs(total: int, user_ids: List[int], random: Random):
+    """Cria logs de acesso distribuídos pelos últimos ACCESS_LOG_SEED_DAYS
+    dias"""
+    now = datetime.now()
+    connection = db.session.connection()
+    for start in range(0, total, INSERT_BATCH_SIZE):
+        insert_access_logs(
+            connection,
+            [
+                {
+                    "ip": "10.0.{}.{}".format(
+                        random.randint(0, 255), random.randint(1, 254)
+                    ),
+                    "user_agent": "seed_database",
+                    "access_at": now
+                    - timedelta(
+                        seconds=random.randint(0, ACCESS_LOG_SEED_DAYS * 86400)
+                    ),
+                    "endpoint": random.choice(ACCESS_LOG_SEED_PATHS),
+                    "user_id": random.choice(user_ids),
+                }
+                for _ in range(min(INSERT_BATCH_SIZE, total - start))
+            ],
+        )
+
+
+def seed_database(
+    random_seed: int = 0, admin_password: str = SEED_PASSWORD, **sizes: int
+) -> Dict[str, Any]:
+    """Popula um banco de dados vazio com uma hierarquia de análises
+
+    Cria um administrador (com todos os cargos e administrador dos órgãos),
+    os especialistas (associados a todas as análises), o catálogo modelo de
+    vulnerabilidades, os logs de acesso e, para cada análise, ativos,
+    ameaças, ações adversas e as pontuações dos especialistas. Os totais
+    pré-agregados, a tabela de fechamento da hierarquia e o índice de busca
+    de usuários são reconstruídos ao final.
+
+    Args:
+        random_seed (int, optional): Semente dos dados aleatórios. Padrão
+            é 0.
+        admin_password (str, optional): Senha do administrador (CPF
+            00000000000). Padrão é SEED_PASSWORD.
+        **sizes (int): Quantidades (chaves de SEED_SIZES)
+
+    Returns:
+        Dict[str, Any]: IDs do administrador (`admin_id`) e do primeiro item
+            de cada nível (`organ_id`, `analysis_id`, `active_id`,
+            `category_id`, ...) e um termo de busca de usuários
+            (`user_query`)
+    """
+    sizes = {**SEED_SIZES, **sizes}
+    random = Random(random_seed)
+    session = db.session
+
+    if not Permission.query.first():
+        from .extensions.commands import create_default_permissions
+
+        create_default_permissions()
+
+    admin = User(
+        name="Administrador",
+        cpf="0" * 11,
+        password=admin_password,
+        email_professional="admin@coruja",
+    )
+    session.add(admin)
+    session.commit()
+    for permission in Permission.query.all():
+        admin.add_permission(permission)
+
+    _insert(
+        User.__table__,
+        [
+            {
+                "name": f"Especialista {e}",
+                "cpf": str(10**10 + e),
+                "password": SEED_PASSWORD,
+                "email_professional": f"especialista{e}@coruja",
+            }
+            for e in range(sizes["experts"])
+        ],
+    )
+    expert_ids = session.scalars(
+        select(User.id).where(User.id != admin.id).order_by(User.id)
+    ).all()
+
+    _seed_catalog(
+        sizes["categories"], sizes["subcategories"], sizes["vulnerabilities"]
+    )
+    session.commit()
+
+    analyses, first = [], {}
+    for o in range(sizes["organs"]):
+        database_manager.add_organ(
+            name=f"Órgão {o}",
+            cnpj=f"org{o}",
+            address="Endereço",
+            email=f"orgao{o}@coruja",
+            telephone=f"org{o}",
+            administrators=[admin.id],
+        )
+        organ = Organ.query.filter_by(cnpj=f"org{o}").one()
+        first.setdefault("organ_id", organ.id)
+
+        for i in range(sizes["institutions"]):
+            institution = database_manager.add_institution(
+                name=f"Instituição {o}.{i}",
+                cnpj=f"inst{o}.{i}",
+                address="Endereço",
+                email=f"instituicao{o}.{i}@coruja",
+                telephone=f"inst{o}.{i}",
+                administrators=[],
+            )
+            organ.add_institution(institution)
+            first.setdefault("institution_id", institution.id)
+
+            for u in range(sizes["units"]):
+                unit = database_manager.add_unit(
+                    name=f"Unidade {o}.{i}.{u}",
+                    address="Endereço",
+                    administrators=[],
+                )
+                institution.add_unit(unit)
+                first.setdefault("unit_id", unit.id)
+
+                for a in range(sizes["analyses"]):
+                    analysis = database_manager.add_analysis(
+                        description=f"Análise {o}.{i}.{u}.{a}",
+                        administrators=[admin.id],
+                        experts=expert_ids,
+                    )
+                    unit.add_analysis(analysis)
+                    analyses.append(analysis)
+
+    for analysis in analyses:
+        _seed_analysis_risk(
+            analysis.analysis_risk.id,
+            expert_ids,
+            sizes["actives"],
+            sizes["threats"],
+            sizes["adverse_actions"],
+            random,
+        )
+        _seed_vulnerability_scores(
+            analysis.analysis_vulnerability.id, expert_ids, random
+        )
+
+    _seed_access_logs(sizes["access_logs"], [admin.id, *expert_ids], random)
+
+    connection = session.connection()
+    rebuild_closure(connection)
+    rebuild_rollups(connection)
+    create_fts_table(connection)
+    rebuild_search_index(connection)
+    session.commit()
+
+    analysis = analyses[0]
+    analysis_risk_id = analysis.analysis_risk.id
+    analysis_vulnerability_id = analysis.analysis_vulnerability.id
+    category_id = session.scalar(
+        select(VulnerabilityCategory.id)
+        .join(
+            AnalysisVulnerability,
+            database_manager.get_catalog_condition(),
+        )
+        .where(AnalysisVulnerability.id == analysis_vulnerability_id)
+        .order_by(VulnerabilityCategory.id)
+    )
+    subcategory_id = session.scalar(
+        select(VulnerabilitySubCategory.id)
+        .where(VulnerabilitySubCategory.category_id == category_id)
+        .order_by(VulnerabilitySubCategory.id)
+    )
+    return {
+        "admin_id": admin.id,
+        "user_query": "especialista",
+        **first,
+        "analysis_id": analysis.id,
+        "analysis_risk_id": analysis_risk_id,
+        "analysis_vulnerability_id": analysis_vulnerability_id,
+        "active_id": session.scalar(
+            select(Active.id)
+            .where(Active.analysis_risk_id == analysis_risk_id)
+            .order_by(Active.id)
+        ),
+        "category_id": category_id,
+        "subcategory_id": subcategory_id,
+    }
+
+
+@contextmanager
+def seeded_app(**sizes: int) -> Iterator[Tuple[Flask, Dict[str, Any]]]:
+    """Cria a aplicação com um banco SQLite temporário populado por
+    `seed_database`
+
+    O banco é removido ao final. A aplicação é criada com `TESTING`, sem
+    CSRF, sem o cache de relatórios e com os logs de acesso gravados na
+    própria requisição.
+
+    Args:
+        **sizes (int): Quantidades repassadas a `seed_database`
+
+    Yields:
+        Tuple[Flask, Dict[str, Any]]: Aplicação e os IDs retornados por
+            `seed_database`
+    """
+    from .app import create_app
+
+    descriptor, path = mkstemp(suffix=".db")
+    os.close(descriptor)
+    settings = {
+        **SEEDED_APP_SETTINGS,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+    }
+    previous = {key: os.environ.get(f"FLASK_{key}") for key in settings}
+    os.environ.update({f"FLASK_{k}": v for k, v in settings.items()})
+    try:
+        app = create_app()
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(f"FLASK_{key}")
+            else:
+                os.environ[f"FLASK_{key}"] = value
+
+    try:
+        with app.app_context():
+            db.create_all()
+            ids = seed_database(**sizes)
+        yield app, ids
+    finally:
+        with app.app_context():
+            db.engine.dispose()
+        os.remove(path)
+
+
+def _route_request(endpoint, url_args, json, ids):
+    url = url_for(
+        endpoint, **{key: ids[value] for key, value in url_args.items()}
+    )
+    if json is None:
+        return "GET", url, None
+    return "POST", url, {key: ids[value] for key, value in json.items()}
+
+
+def _route_profiler(app: Flask) -> QueryProfiler:
+    profiler = app.extensions.get("sql_profiler")
+    if profiler is None:
+        raise RuntimeError(
+            "A extensão coruja.extensions.profiler está inativa"
+        )
+    return profiler
+
+
+def _admin_client(app: Flask, ids: Dict[str, Any]):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(ids["admin_id"])
+        session["_fresh"] = True
+    return client
+
+
+def _route_requests(app: Flask, ids: Dict[str, Any]):
+    with app.test_request_context():
+        for endpoint, url_args, json in ROUTE_REQUESTS:
+            yield (endpoint, *_route_request(endpoint, url_args, json, ids))
+
+
+def measure_queries(app: Flask, ids: Dict[str, Any]) -> Dict[str, Dict]:
+    """Executa as requisições de ROUTE_REQUESTS como o administrador
+
+    Args:
+        app (Flask): Aplicação criada por `seeded_app`
+        ids (Dict[str, Any]): IDs retornados por `seed_database`
+
+    Returns:
+        Dict[str, Dict]: Por endpoint, `status`, `queries` e `budget`
+    """
+    profiler = _route_profiler(app)
+    client = _admin_client(app, ids)
+
+    results = {}
+    for endpoint, method, url, body in list(_route_requests(app, ids)):
+        profiler.reset()
+        response = client.open(url, method=method, json=body)
+        stats = profiler.snapshot().get(endpoint)
+        results[endpoint] = {
+            "status": response.status_code,
+            "queries": int(stats["queries"]["max"]) if stats else None,
+            "budget": get_query_budget(app, endpoint),
+        }
+    return results
+
+
+def measure_scales(
+    scales: Tuple[int, ...] = BUDGET_SCALES, **sizes: int
+) -> List[Dict[str, Dict]]:
+    """Executa `measure_queries` em um banco populado em cada escala
+
+    Args:
+        scales (Tuple[int, ...], optional): Escalas, que multiplicam as
+            quantidades de SCALED_SIZES. Padrão é BUDGET_SCALES.
+        **sizes (int): Quantidades da menor escala (chaves de SEED_SIZES)
+
+    Returns:
+        List[Dict[str, Dict]]: Resultado de `measure_queries` de cada
+            escala, na ordem de `scales`
+    """
+    sizes = {**SEED_SIZES, **sizes}
+    measures = []
+    for scale in scales:
+        scaled = {
+            key: value * scale if key in SCALED_SIZES else value
+            for key, value in sizes.items()
+        }
+        with seeded_app(**scaled) as (app, ids):
+            measures.append(measure_queries(app, ids))
+    return measures
+
+
+def check_query_budgets(
+    measures: List[Dict[str, Dict]],
+    scales: Tuple[int, ...] = BUDGET_SCALES,
+    endpoints: Optional[List[str]] = None,
+) -> List[str]:
+    """Verifica os orçamentos de consultas das rotas de ROUTE_REQUESTS
+
+    Uma rota viola o orçamento quando falha, excede o seu `query_budget`
+    ou executa mais consultas na escala maior (consultas N+1).
+
+    Args:
+        measures (List[Dict[str, Dict]]): Resultado de `measure_scales`
+        scales (Tuple[int, ...], optional): Escalas de `measures`. Padrão é
+            BUDGET_SCALES.
+        endpoints (Optional[List[str]], optional): Rotas verificadas.
+            Padrão é None (todas).
+
+    Returns:
+        List[str]: Violações encontradas
+    """
+    violations = []
+    for endpoint, _, _ in ROUTE_REQUESTS:
+        if endpoints is not None and endpoint not in endpoints:
+            continue
+
+        results = [measure[endpoint] for measure in measures]
+        budget = results[0]["budget"]
+        counts = [result["queries"] for result in results]
+
+        for scale, result in zip(scales, results):
+            if result["status"] != 200:
+                violations.append(
+                    f"{endpoint}: status {result['status']} (x{scale})"
+                )
+        if None in counts:
+            continue
+        if budget is not None and max(counts) > budget:
+            violations.append(
+                f"{endpoint}: {max(counts)} consultas, acima do orçamento "
+                f"({budget})"
+            )
+        if len(set(counts)) > 1:
+            violations.append(
+                f"{endpoint}: consultas crescem com os dados ({counts})"
+            )
+    return violations
+
+
+def format_query_budgets(
+    measures: List[Dict[str, Dict]], scales: Tuple[int, ...] = BUDGET_SCALES
+) -> str:
+    """Tabela com as consultas de cada rota em cada escala e o orçamento
+
+    Args:
+        measures (List[Dict[str, Dict]]): Resultado de `measure_scales`
+        scales (Tuple[int, ...], optional): Escalas de `measures`. Padrão é
+            BUDGET_SCALES.
+
+    Returns:
+        str: Tabela
+    """
+    lines = [f"{'endpoint':<52}" + "".join(f"{f'x{s}':>6}" for s in scales)]
+    for endpoint, _, _ in ROUTE_REQUESTS:
+        counts = [measure[endpoint]["queries"] for measure in measures]
+        budget = measures[0][endpoint]["budget"]
+        lines.append(
+            f"{endpoint:<52}"
+            + "".join(
+                f"{count if count is not None else '-':>6}" for count in counts
+            )
+            + f"  (orçamento: {budget if budget is not None else '-'})"
+        )
+    return "\n".join(lines)
+
+
+def benchmark_routes(
+    app: Flask, ids: Dict[str, Any], repeat: int = 20
+) -> Dict[str, Dict]:
+    """Mede as requisições de ROUTE_REQUESTS como o administrador
+
+    Cada rota recebe uma requisição de aquecimento, `repeat` requisições
+    medidas e uma última requisição com `tracemalloc`, para o pico de
+    memória (que não entra nas latências).
+
+    Args:
+        app (Flask): Aplicação criada por `seeded_app`
+        ids (Dict[str, Any]): IDs retornados por `seed_database`
+        repeat (int, optional): Requisições medidas por rota. Padrão é 20.
+
+    Returns:
+        Dict[str, Dict]: Por endpoint, com a seguinte estrutura:
+        >>> {
+        ...    "status": int,
+        ...    "latency_ms": {"mean": float, "p50": float, ..., "max": float},
+        ...    "queries": {...},  # mesmas chaves de "latency_ms"
+        ...    "db_ms": {...},
+        ...    "peak_memory_kb": float,
+        ... }
+    """
+    profiler = _route_profiler(app)
+    client = _admin_client(app, ids)
+
+    results = {}
+    for endpoint, method, url, body in list(_route_requests(app, ids)):
+        client.open(url, method=method, json=body)
+
+        profiler.reset()
+        latencies = []
+        for _ in range(repeat):
+            start = perf_counter()
+            response = client.open(url, method=method, json=body)
+            latencies.append((perf_counter() - start) * 1000)
+        stats = profiler.snapshot().get(endpoint, {})
+
+        tracemalloc.start()
+        try:
+            client.open(url, method=method, json=body)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        results[endpoint] = {
+            "status": response.status_code,
+            "latency_ms": summarize(latencies),
+            "queries": stats.get("queries"),
+            "db_ms": stats.get("db_ms"),
+            "peak_memory_kb": round(peak / 1024, 1),
+        }
+    return results
+
+
+def run_benchmark(repeat: int = 20, **sizes: int) -> Dict[str, Any]:
+    """Mede as rotas de ROUTE_REQUESTS em um banco temporário populado por
+    `seed_database`
+
+    Args:
+        repeat (int, optional): Requisições medidas por rota. Padrão é 20.
+        **sizes (int): Quantidades (chaves de SEED_SIZES)
+
+    Returns:
+        Dict[str, Any]: Resultado (serializável em JSON), com a data, as
+            versões, as quantidades e as medidas de cada rota (`routes`,
+            no formato de `benchmark_routes`)
+    """
+    sizes = {**SEED_SIZES, **sizes}
+    start = perf_counter()
+    with seeded_app(**sizes) as (app, ids):
+        seed_seconds = perf_counter() - start
+        routes = benchmark_routes(app, ids, repeat)
+        database = app.config["SQLALCHEMY_DATABASE_URI"].split(":")[0]
+
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "database": database,
+        "sizes": sizes,
+        "seed_seconds": round(seed_seconds, 2),
+        "repeat": repeat,
+        "routes": routes,
+    }
+
+
+def compare_benchmarks(
+    baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.2
+) -> List[str]:
+    """Compara um resultado de `run_benchmark` com um resultado anterior
+
+    Uma rota regride quando passa a falhar, executa mais consultas ou tem
+    latência p95 ou pico de memória acima do anterior por mais que a
+    tolerância. Rotas ausentes em um dos resultados são ignoradas.
+
+    Args:
+        baseline (Dict[str, Any]): Resultado anterior
+        current (Dict[str, Any]): Resultado atual
+        tolerance (float, optional): Aumento relativo tolerado na latência
+            e na memória. Padrão é 0.2 (20%).
+
+    Returns:
+        List[str]: Regressões encontradas
+    """
+    if baseline.get("sizes") != current.get("sizes"):
+        return [
+            "As quantidades dos dados gerados diferem das do resultado "
+            "anterior; os resultados não são comparáveis"
+        ]
+
+    regressions = []
+    for endpoint, result in current["routes"].items():
+        previous = baseline["routes"].get(endpoint)
+        if previous is None:
+            continue
+
+        if result["status"] != previous["status"]:
+            regressions.append(
+                f"{endpoint}: status {previous['status']} -> "
+                f"{result['status']}"
+            )
+        if result["queries"] and previous["queries"]:
+            before, after = (
+                previous["queries"]["max"],
+                result["queries"]["max"],
+            )
+            if after > before:
+                regressions.append(
+                    f"{endpoint}: consultas {before:g} -> {after:g}"
+                )
+
+        for label, before, after in (
+            (
+                "latência p95 (ms)",
+                previous["latency_ms"]["p95"],
+                result["latency_ms"]["p95"],
+            ),
+            (
+                "pico de memória (KiB)",
+                previous["peak_memory_kb"],
+                result["peak_memory_kb"],
+            ),
+        ):
+            if after > before * (1 + tolerance):
+                regressions.append(
+                    f"{endpoint}: {label} {before:g} -> {after:g} "
+                    f"(+{(after / before - 1) * 100 if before else 100:.0f}%)"
+                )
+    return regressions
@@ -1,6 +1,8 @@
 from .proxy import (  # analysis_vulnerability_access,
+    Capabilities,
     analysis_access,
     analysis_risk_access,
+    get_capabilities,
     institution_access,
     organ_access,
     proxy_access,
@@ -16,4 +18,6 @@ __all__ = [
     "analysis_access",
     "analysis_risk_access",
     "proxy_access_function",
+    "Capabilities",
+    "get_capabilities",
 ]
@@ -0,0 +1,272 @@
+from itertools import chain
+from threading import Lock
+from time import monotonic
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from flask import current_app, g, has_app_context
+from sqlalchemy import event, inspect
+
+from ..extensions.database import db
+from ..models import (
+    Analysis,
+    HierarchyClosure,
+    Institution,
+    Organ,
+    Permission,
+    Unit,
+    User,
+)
+
+# (object_type, object_id)
+Node = Tuple[str, int]
+
+# Tipos de objeto da hierarquia Órgão -> Instituição -> Unidade -> Análise
+HIERARCHY_TYPES = {"organ", "institution", "unit", "analysis"}
+
+# Atributos que, quando alterados, modificam permissões ou a hierarquia
+WATCHED_ATTRIBUTES = {
+    User: ("permissions",),
+    Organ: ("institutions",),
+    Institution: ("units", "organs"),
+    Unit: ("analyses",),
+}
+
+_lock = Lock()
+_version = 0
+_graph_cache: Optional[Tuple[float, int, "HierarchyGraph"]] = None
+_index_cache: Dict[int, Tuple[float, int, "PermissionIndex"]] = {}
+
+
+class HierarchyGraph:
+    """Mapa de ancestrais da hierarquia Órgão -> Instituição -> Unidade ->
+    Análise, carregado da tabela de fechamento com uma única consulta."""
+
+    def __init__(self, parents: Dict[Node, List[Node]]):
+        self.parents = parents
+
+    @classmethod
+    def load(cls) -> "HierarchyGraph":
+        rows = (
+            db.session.query(
+                HierarchyClosure.descendant_type,
+                HierarchyClosure.descendant_id,
+                HierarchyClosure.ancestor_type,
+                HierarchyClosure.ancestor_id,
+            )
+            .filter(
+                HierarchyClosure.depth == 1,
+                HierarchyClosure.descendant_type.in_(HIERARCHY_TYPES),
+            )
+            .order_by(
+                HierarchyClosure.descendant_type,
+                HierarchyClosure.descendant_id,
+                HierarchyClosure.ancestor_id,
+            )
+            .all()
+        )
+
+        parents: Dict[Node, List[Node]] = {}
+        for child_type, child_id, parent_type, parent_id in rows:
+            parents.setdefault((child_type, child_id), []).append(
+                (parent_type, parent_id)
+            )
+
+        return cls(parents)
+
+    def root(self, node: Node) -> Node:
+        """Obtém o ancestral mais alto de um nó (seguindo o primeiro pai)"""
+        visited = {node}
+        while self.parents.get(node):
+            node = self.parents[node][0]
+            if node in visited:
+                break
+            visited.add(node)
+        return node
+
+    def ancestors(self, node: Node) -> Set[Node]:
+        """Obtém o próprio nó e todos os seus ancestrais (todos os pais)"""
+        result = {node}
+        stack = [node]
+        while stack:
+            for parent in self.parents.get(stack.pop(), []):
+                if parent not in result:
+                    result.add(parent)
+                    stack.append(parent)
+        return result
+
+
+class PermissionIndex:
+    """Índice das permissões resolvidas de um usuário.
+
+    Guarda as permissões como um conjunto de `(type, object_type, object_id)`
+    e, por tipo de acesso, o conjunto de nós da hierarquia a partir dos quais
+    alguma permissão é alcançável, tornando cada verificação uma consulta
+    O(1) em memória.
+    """
+
+    def __init__(
+        self,
+        permissions: Iterable[Tuple[str, str, Optional[int]]],
+        graph: HierarchyGraph,
+    ):
+        self.permissions = set(permissions)
+        self.graph = graph
+        self._reachable: Dict[str, Set[Node]] = {}
+
+    @classmethod
+    def from_user(cls, user, graph: HierarchyGraph) -> "PermissionIndex":
+        return cls(
+            (
+                (permission.type, permission.object_type, permission.object_id)
+                for permission in getattr(user, "permissions", [])
+            ),
+            graph,
+        )
+
+    def has_permission(
+        self, kind_access: str, object_type: str, object_id: Optional[int]
+    ) -> bool:
+        """Verifica se o usuário possui exatamente a permissão especificada"""
+        return (kind_access, object_type, object_id) in self.permissions
+
+    def has_access(
+        self, kind_access: str, object_type: str, object_id: Optional[int]
+    ) -> bool:
+        """Verifica se o usuário possui acesso a um objeto da hierarquia.
+
+        O acesso é concedido se o usuário possui uma permissão do tipo
+        `kind_access` no próprio objeto ou em qualquer objeto abaixo do
+        ancestral mais alto dele (órgão).
+        """
+        if object_id is None or object_type not in HIERARCHY_TYPES:
+            return self.has_permission(kind_access, object_type, object_id)
+
+        if kind_access not in self._reachable:
+            reachable: Set[Node] = set()
+            for _type, _object_type, _object_id in self.permissions:
+                if (
+                    _type == kind_access
+                    and _object_type in HIERARCHY_TYPES
+                    and _object_id is not None
+                ):
+                    reachable |= self.graph.ancestors(
+                        (_object_type, _object_id)
+                    )
+            self._reachable[kind_access] = reachable
+
+        root = self.graph.root((object_type, object_id))
+        return root in self._reachable[kind_access]
+
+
+def invalidate() -> None:
+    """Invalida os índices de permissão e o grafo da hierarquia em cache"""
+    global _version, _graph_cache
+
+    with _lock:
+        _version += 1
+        _graph_cache = None
+        _index_cache.clear()
+
+
+def _cache_ttl() -> float:
+    if not has_app_context():
+        return 0
+    return current_app.config.get("PERMISSION_CACHE_TTL", 0) or 0
+
+
+def _is_fresh(entry: Optional[tuple], ttl: float) -> bool:
+    return (
+        entry is not None
+        and entry[1] == _version
+        and monotonic() - entry[0] < ttl
+    )
+
+
+def get_hierarchy_graph() -> HierarchyGraph:
+    """Obtém o grafo da hierarquia (em cache por requisição e, caso
+    `PERMISSION_CACHE_TTL` esteja configurado, por processo)"""
+    global _graph_cache
+
+    request_cache = g.setdefault("_permission_graph", None)
+    if request_cache is not None and request_cache[1] == _version:
+        return request_cache[2]
+
+    ttl = _cache_ttl()
+    entry = _graph_cache
+    if ttl and _is_fresh(entry, ttl):
+        graph = entry[2]  # type: ignore [entry isn't None]
+    else:
+        graph = HierarchyGraph.load()
+        entry = (monotonic(), _version, graph)
+        if ttl:
+            _graph_cache = entry
+
+    g._permission_graph = (monotonic(), _version, graph)
+    return graph
+
+
+def get_permission_index(user) -> PermissionIndex:
+    """Obtém o índice de permissões resolvidas de um usuário.
+
+    O índice é mantido por requisição (em `flask.g`) e, caso a configuração
+    `PERMISSION_CACHE_TTL` (segundos) seja maior que zero, também por
+    usuário no processo. Alterações em permissões ou na hierarquia
+    invalidam ambos os caches.
+
+    Args:
+        user (User | LocalProxy): Usuário
+
+    Returns:
+        PermissionIndex: Índice de permissões do usuário
+    """
+    user_id = getattr(user, "id", None)
+    if user_id is None or not has_app_context():
+        return PermissionIndex.from_user(user, HierarchyGraph({}))
+
+    request_cache = g.setdefault("_permission_indexes", {})
+    entry = request_cache.get(user_id)
+    if entry is not None and entry[1] == _version:
+        return entry[2]
+
+    ttl = _cache_ttl()
+    entry = _index_cache.get(user_id)
+    if ttl and _is_fresh(entry, ttl):
+        index = entry[2]  # type: ignore [entry isn't None]
+    else:
+        index = PermissionIndex.from_user(user, get_hierarchy_graph())
+        if ttl:
+            with _lock:
+                _index_cache[user_id] = (monotonic(), _version, index)
+
+    request_cache[user_id] = (monotonic(), _version, index)
+    return index
+
+
+def invalidate_on_flush(session, flush_context) -> None:
+    """Invalida os caches quando permissões ou a hierarquia são alteradas
+
+    Args:
+        session (Session): Sessão do flush
+        flush_context (FlushContext): Contexto de flush
+    """
+    for obj in chain(session.new, session.deleted):
+        if isinstance(obj, (Permission, Organ, Institution, Unit, Analysis)):
+            invalidate()
+            return
+
+    for obj in session.dirty:
+        if isinstance(obj, Permission):
+            invalidate()
+            return
+
+        attributes = WATCHED_ATTRIBUTES.get(type(obj), ())
+        state = inspect(obj)
+        if any(
+            state.attrs[attribute].history.has_changes()
+            for attribute in attributes
+        ):
+            invalidate()
+            return
+
+
+event.listen(db.session, "after_flush", invalidate_on_flush)
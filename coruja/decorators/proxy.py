@@ -1,12 +1,14 @@
+from collections import Counter
 from functools import wraps
-from typing import Callable, Mapping, Optional
+from typing import Callable, FrozenSet, Mapping, Optional, Tuple
 
-from flask import abort
+from flask import abort, g
 from flask_login import AnonymousUserMixin, current_user
 from werkzeug.local import LocalProxy
 
 from ..models import User
 from ..utils import database_manager
+from .permissions import PermissionIndex, get_permission_index
 
 
 def organ_access(
@@ -15,25 +17,8 @@ def organ_access(
     if kind_access in ("read", "update") and not organ_id:
         return False
 
-    user_permissions = getattr(user, "permissions")
-
-    return any(
-        permission.type == kind_access
-        and permission.object_id == organ_id
-        and permission.object_type == "organ"
-        for permission in user_permissions
-    ) or (
-        organ_id
-        and any(
-            [
-                institution_access(
-                    institution.id, user, kind_access, True
-                )
-            ]
-            for institution in database_manager.get_organ(
-                organ_id
-            ).institutions
-        )
+    return get_permission_index(user).has_access(
+        kind_access, "organ", organ_id
     )
 
 
@@ -41,7 +26,6 @@ def institution_access(
     institution_id: int,
     user: User | LocalProxy,
     kind_access: str,
-    from_organ=False,
 ) -> bool:
     if (
         kind_access in ("read", "update")
@@ -49,37 +33,8 @@ def institution_access(
     ):
         return False
 
-    user_permissions = getattr(user, "permissions")
-    organ = database_manager.get_organ_by_institution(
-        institution_id
-    )
-
-    return (
-        any(
-            permission.type == kind_access
-            and permission.object_id == institution_id
-            and permission.object_type == "institution"
-            for permission in user_permissions
-        )
-        or (
-            institution_id
-            and any(
-                [
-                    unit_access(
-                        unit.id, user, kind_access, True
-                    )
-                ]
-                for unit in database_manager.get_institution(
-                    institution_id
-                ).units
-            )
-        )
-        or (
-            not from_organ
-            and organ_access(
-                getattr(organ, "id"), user, kind_access
-            )
-        )
+    return get_permission_index(user).has_access(
+        kind_access, "institution", institution_id
     )
 
 
@@ -87,41 +42,9 @@ def unit_access(
     unit_id: int,
     user: User | LocalProxy,
     kind_access: str,
-    from_institution=False,
 ) -> bool:
-    user_permissions = getattr(user, "permissions")
-    institution = database_manager.get_institution_by_unit(
-        unit_id
-    )
-
-    return (
-        any(
-            permission.type == kind_access
-            and permission.object_id == unit_id
-            and permission.object_type == "unit"
-            for permission in user_permissions
-        )
-        or (
-            unit_id
-            and any(
-                [
-                    analysis_access(
-                        analysis.id, user, kind_access, True
-                    )
-                ]
-                for analysis in database_manager.get_unit(
-                    unit_id
-                ).analyses
-            )
-        )
-        or (
-            not from_institution
-            and institution_access(
-                getattr(institution, "id"),
-                user,
-                kind_access,
-            )
-        )
+    return get_permission_index(user).has_access(
+        kind_access, "unit", unit_id
     )
 
 
@@ -129,23 +52,9 @@ def analysis_access(
     analysis_id: int,
     user: User | LocalProxy,
     kind_access: str,
-    from_unit=False,
 ) -> bool:
-    user_permissions = getattr(user, "permissions")
-    unit = database_manager.get_unit_by_analysis(
-        analysis_id
-    )
-
-    return any(
-        permission.type == kind_access
-        and permission.object_id == analysis_id
-        and permission.object_type == "analysis"
-        for permission in user_permissions
-    ) or (
-        not from_unit
-        and unit_access(
-            getattr(unit, "id"), user, kind_access
-        )
+    return get_permission_index(user).has_access(
+        kind_access, "analysis", analysis_id
     )
 
 
@@ -188,13 +97,9 @@ def adverse_action_access(
 def user_access(
     user_id: int | None, user: User | LocalProxy, kind_access: str
 ) -> bool:
-    user_permissions = getattr(user, "permissions")
     user_id = None  # esta linha está aqui por causa de um bug
-    return any(
-        permission.type == kind_access
-        and permission.object_id == user_id
-        and permission.object_type == "user"
-        for permission in user_permissions
+    return get_permission_index(user).has_permission(
+        kind_access, "user", user_id
     )
 
 
@@ -203,13 +108,9 @@ def admin_access(
 ) -> bool:
     if isinstance(user, AnonymousUserMixin):
         return False
-    user_permissions = getattr(user, "permissions")
     object_id = None
-    return any(
-        permission.type == kind_access
-        and permission.object_id == object_id
-        and permission.object_type == "admin"
-        for permission in user_permissions
+    return get_permission_index(user).has_permission(
+        kind_access, "admin", object_id
     )
 
 
@@ -323,3 +224,80 @@ def proxy_access_function(
 
     func = object_map.get(kind_object, lambda x, y, z: False)
     return func(object_id, user, kind_access)  # type: ignore
+
+
+class Capabilities:
+    """Capacidades do usuário atual, calculadas uma vez por renderização.
+
+    Guarda o conjunto de pares `(kind_object, kind_access)` concedidos sem
+    objeto específico, de forma que os templates verificam permissões por
+    pertinência (`("user", "create") in capabilities`), sem percorrer as
+    permissões do usuário. Verificações de um objeto específico são
+    delegadas a `proxy_access_function`.
+
+    Todas as verificações são contabilizadas em `checks`.
+    """
+
+    def __init__(self, user: User | LocalProxy, index: PermissionIndex):
+        self.user = user
+        self.index = index
+        self.checks: Counter = Counter()
+        self.granted: FrozenSet[Tuple[str, str]] = frozenset(
+            (object_type, kind_access)
+            for kind_access, object_type, object_id in index.permissions
+            if object_id is None
+            and object_type in object_map
+            # Sem ID, leitura e atualização de órgãos e instituições são
+            # sempre negadas (ver `organ_access` e `institution_access`)
+            and not (
+                object_type in ("organ", "institution")
+                and kind_access in ("read", "update")
+            )
+        )
+
+    def __contains__(self, capability: Tuple[str, str]) -> bool:
+        self.checks[(*capability, None)] += 1
+        return tuple(capability) in self.granted
+
+    def __call__(
+        self,
+        kind_object: str,
+        kind_access: str,
+        user: Optional[User] = None,
+        object_id: Optional[int] = None,
+    ) -> bool:
+        """Mesma assinatura de `proxy_access_function`"""
+        if object_id is None and user is None:
+            return (kind_object, kind_access) in self
+
+        self.checks[(kind_object, kind_access, object_id)] += 1
+        return proxy_access_function(
+            kind_object, kind_access, user or self.user, object_id
+        )
+
+
+def get_capabilities(user: Optional[User] = None) -> Capabilities:
+    """Obtém as capacidades de um usuário, reutilizando as da requisição
+    enquanto o índice de permissões não for alterado
+
+    Args:
+        user (Optional[User], optional): Usuário. Defaults to None
+            (`flask_login.current_user`).
+
+    Returns:
+        Capabilities: Capacidades do usuário
+    """
+    user = user or current_user  # type: ignore
+    index = get_permission_index(user)
+
+    previous = g.get("_capabilities")
+    if previous is not None and previous.index is index:
+        return previous
+
+    capabilities = Capabilities(user, index)  # type: ignore
+    if previous is not None:
+        # Mantém a contagem de verificações da requisição
+        capabilities.checks.update(previous.checks)
+    g._capabilities = capabilities
+
+    return capabilities
@@ -0,0 +1,192 @@
+import csv
+import json
+import zlib
+from datetime import datetime
+from io import StringIO
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.sql import Select
+
+from .models import Change, User
+from .models.log_partitions import access_log_statements
+
+# Linhas lidas do cursor (e escritas na saída) por vez
+EXPORT_BATCH_SIZE = 1000
+
+# Formatos de exportação: (Content-Type, extensão)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+
+def changes_statements(
+    connection,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> List[Select]:
+    """Projeção das colunas exportadas dos logs de mudanças
+
+    Args:
+        connection (Connection): Conexão com o banco de dados
+        start (Optional[datetime], optional): Início (inclusivo) do período.
+            Padrão é None.
+        end (Optional[datetime], optional): Fim (exclusivo) do período.
+            Padrão é None.
+
+    Returns:
+        List[Select]: Consulta ordenada por `(created_at, id)`
+    """
+    statement = (
+        select(
+            User.name,
+            User.cpf,
+            Change.object_type,
+            Change.object_old,
+            Change.object_new,
+        )
+        .outerjoin(User, User.id == Change.user_id)
+        .order_by(Change.created_at, Change.id)
+    )
+    if start:
+        statement = statement.where(Change.created_at >= start)
+    if end:
+        statement = statement.where(Change.created_at < end)
+    return [statement]
+
+
+def _censored(cpf: Optional[str]) -> str:
+    return User.censored_cpf(cpf) if cpf else ""
+
+
+def _access_log_record(row) -> Dict:
+    return {
+        "user_name": row.user_name,
+        "user_cpf": _censored(row.user_cpf),
+        "ip": row.ip,
+        "user_agent": row.user_agent,
+        "access_at": row.access_at.isoformat() if row.access_at else None,
+        "endpoint": row.endpoint,
+    }
+
+
+def _access_log_csv(row) -> List:
+    return [
+        row.user_name,
+        _censored(row.user_cpf),
+        row.ip,
+        row.user_agent,
+        row.access_at.strftime("%d/%m/%Y %H:%M:%S") if row.access_at else "",
+        row.endpoint,
+    ]
+
+
+def _change_record(row) -> Dict:
+    name, cpf, object_type, object_old, object_new = row
+    return {
+        "user_name": name,
+        "user_cpf": _censored(cpf),
+        "object_type": object_type,
+        "object_old": object_old,
+        "object_new": object_new,
+    }
+
+
+def _change_csv(row) -> List:
+    name, cpf, object_type, object_old, object_new = row
+    object_old, object_new = object_old or {}, object_new or {}
+
+    changes = []
+    for key, value_old in object_old.items():
+        value_new = object_new.get(key, None)
+        if value_old != value_new:
+            changes.append(f"[{key}] {value_old!r} -> {value_new!r}\n")
+
+    user = f"{name} - {_censored(cpf)}" if name else ""
+    return [user, object_type, "".join(changes).strip()]
+
+
+# Exportação: (consultas, cabeçalho do CSV, linha do CSV, registro NDJSON)
+EXPORTS: Dict[str, Tuple[Callable, List[str], Callable, Callable]] = {
+    "access": (
+        access_log_statements,
+        ["User Name", "User CPF", "IP", "User Agent", "Access At", "Endpoint"],
+        _access_log_csv,
+        _access_log_record,
+    ),
+    "changes": (
+        changes_statements,
+        ["Usuário", "Objeto", "Alterações"],
+        _change_csv,
+        _change_record,
+    ),
+}
+
+
+def stream_export(
+    connection,
+    name: str,
+    export_format: str = "csv",
+    compress: bool = False,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    **filters,
+) -> Iterator[bytes]:
+    """Exporta um log em partes, com memória constante
+
+    Cada consulta da exportação (uma por partição do log) é executada com
+    um cursor no servidor (`stream_results`) e lida em lotes de `batch_size`
+    linhas; cada lote é formatado, codificado e (opcionalmente) comprimido
+    antes de ser entregue.
+
+    Args:
+        connection (Connection): Conexão com o banco de dados, usada apenas
+            por esta exportação enquanto o iterador é consumido
+        name (str): Exportação (chave de EXPORTS)
+        export_format (str, optional): "csv" ou "ndjson". Padrão é "csv".
+        compress (bool, optional): Se True, entrega um fluxo gzip. Padrão é
+            False.
+        batch_size (int, optional): Linhas por lote. Padrão é
+            EXPORT_BATCH_SIZE.
+        **filters: Filtros repassados à consulta da exportação
+
+    Yields:
+        bytes: Partes do arquivo exportado
+    """
+    build_statements, headers, csv_row, record = EXPORTS[name]
+    # wbits=31: cabeçalho e rodapé gzip
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    def encode(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    output = StringIO()
+    writer = csv.writer(output)
+    if export_format == "csv":
+        writer.writerow(headers)
+
+    streaming = connection.execution_options(
+        stream_results=True, yield_per=batch_size
+    )
+    # Uma consulta por partição, já na ordem da exportação
+    for statement in build_statements(connection, **filters):
+        for rows in streaming.execute(statement).partitions():
+            for row in rows:
+                if export_format == "csv":
+                    writer.writerow(csv_row(row))
+                else:
+                    output.write(json.dumps(record(row), default=str))
+                    output.write("\n")
+
+            chunk = encode(output.getvalue())
+            output.truncate(0)
+            output.seek(0)
+            if chunk:
+                yield chunk
+
+    chunk = encode(output.getvalue())
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
@@ -1,11 +1,61 @@
+import json
+import os
+from datetime import datetime
 from functools import reduce
-from random import choices
+from random import choice, choices, randint, sample, seed
+from statistics import quantiles
 from string import ascii_lowercase
+from tempfile import mkstemp
+from time import perf_counter
 
+import click
 from flask import Flask
+from sqlalchemy import create_engine, insert, or_, select
 
+from ..benchmarks import (
+    BENCH_SIZES,
+    BUDGET_SCALES,
+    SEED_SIZES,
+    check_query_budgets,
+    compare_benchmarks,
+    format_query_budgets,
+    measure_scales,
+    run_benchmark,
+    seed_database,
+)
+from ..exports import EXPORT_FORMATS, EXPORTS, stream_export
 from ..extensions.database import db
 from ..models import Permission, User
+from ..models.hierarchy import rebuild_closure
+from ..models.log_partitions import (
+    add_months,
+    drop_partition,
+    ensure_partitions,
+    expired_partitions,
+    get_strategy,
+    month_bounds,
+    month_of,
+    move_legacy_rows,
+)
+from ..models.rollups import rebuild_rollups
+from ..models.search import (
+    create_fts_table,
+    get_trigram_index,
+    rebuild_search_index,
+    search_user_ids,
+)
+from ..utils import parse_datetime
+
+# Partes dos nomes dos usuários gerados por `benchsearch`
+BENCH_FIRST_NAMES = (
+    "Ana Antônio Beatriz Carlos Cláudia Daniel Eduarda Fernando Gabriela "
+    "Helena Igor João Júlia Lucas Márcia Marcos Patrícia Paulo Rafael Sônia"
+).split()
+BENCH_LAST_NAMES = (
+    "Almeida Araújo Barbosa Cardoso Carvalho Costa Dias Ferreira Gomes "
+    "Lima Martins Melo Oliveira Pereira Ribeiro Rocha Santos Silva Souza "
+    "Teixeira"
+).split()
 
 
 def create_default_permissions():
@@ -92,6 +142,270 @@ def create_admin():
     print(f"CPF: {cpf}\n")
 
 
+def seed_bench(**sizes: int):
+    """Popula o banco de dados (vazio) com dados sintéticos
+
+    Args:
+        **sizes (int): Quantidades (chaves de SEED_SIZES)
+    """
+    if db.session.query(User.id).first() is not None:
+        raise click.ClickException(
+            "O banco de dados já possui usuários; utilize um banco vazio"
+        )
+
+    print("Generating synthetic data...")
+    password = "".join(choices(ascii_lowercase, k=10))
+
+    start = perf_counter()
+    ids = seed_database(admin_password=password, **sizes)
+    print(f"Synthetic data generated in {perf_counter() - start:.2f}s")
+
+    for name, value in sizes.items():
+        print(f"{name}: {value}")
+    print("-" * 15)
+    print("Name: Administrador")
+    print(f"Password: {password}")
+    print("CPF: 00000000000")
+    print(f"Analysis: /analise/{ids['analysis_id']}\n")
+
+
+def rebuild_hierarchy():
+    """Reconstrói a tabela de fechamento da hierarquia"""
+    print("Rebuilding hierarchy closure...")
+
+    rows = rebuild_closure(db.session.connection())
+    db.session.commit()
+
+    print(f"Hierarchy closure rebuilt ({rows} rows)\n")
+
+
+def rebuild_score_rollups():
+    """Reconstrói os totais pré-agregados das pontuações"""
+    print("Rebuilding score rollups...")
+
+    rows, mismatched = rebuild_rollups(db.session.connection())
+    db.session.commit()
+
+    print(f"Score rollups rebuilt ({rows} rows, {mismatched} mismatched)\n")
+
+
+def rebuild_user_search():
+    """Reconstrói o índice de busca de usuários"""
+    print("Rebuilding user search index...")
+
+    backend = rebuild_search_index(db.session.connection())
+    db.session.commit()
+
+    print(f"User search index rebuilt ({backend})\n")
+
+
+def _bench_users(total: int):
+    password = "$2b$12$" + "x" * 53
+    cpfs = sample(range(10**10, 10**11), total)
+    for number, cpf in enumerate(cpfs):
+        first, last = choice(BENCH_FIRST_NAMES), choice(BENCH_LAST_NAMES)
+        name = f"{first} {choice(BENCH_LAST_NAMES)} {last}"
+        yield {
+            "name": name,
+            "cpf": str(cpf),
+            "password": password,
+            "email_personal": None,
+            "email_professional": f"{first}.{last}.{number}@coruja".lower(),
+        }
+
+
+def _bench_queries(total: int):
+    queries = []
+    for _ in range(total):
+        name = choice(BENCH_FIRST_NAMES + BENCH_LAST_NAMES)
+        kind = randint(0, 3)
+        if kind == 0:
+            queries.append(name[: randint(1, 4)])
+        elif kind == 1:
+            queries.append(f"{name} {choice(BENCH_LAST_NAMES)[:3]}")
+        elif kind == 2:
+            # Erro de digitação: uma letra trocada
+            position = randint(1, len(name) - 1)
+            queries.append(name[:position] + "x" + name[position + 1 :])
+        else:
+            queries.append(str(randint(1, 9)) + str(randint(0, 999)))
+    return queries
+
+
+def _bench_latencies(function, queries) -> str:
+    latencies = []
+    for query in queries:
+        start = perf_counter()
+        function(query)
+        latencies.append((perf_counter() - start) * 1000)
+    p50, p95 = (quantiles(latencies, n=100)[i] for i in (49, 94))
+    return f"p50={p50:.2f}ms p95={p95:.2f}ms max={max(latencies):.2f}ms"
+
+
+def benchmark_user_search(users: int, queries: int, limit: int):
+    """Mede a latência da busca de usuários em um banco SQLite temporário
+
+    Compara a busca antiga (`ILIKE` sem limite), a tabela FTS5 e o índice
+    de trigramas em memória.
+
+    Args:
+        users (int): Quantidade de usuários gerados
+        queries (int): Quantidade de buscas executadas em cada backend
+        limit (int): Tamanho da página
+    """
+    seed(0)
+    descriptor, path = mkstemp(suffix=".db")
+    os.close(descriptor)
+    engine = create_engine(f"sqlite:///{path}")
+    table = User.__table__
+
+    try:
+        with engine.begin() as connection:
+            print(f"Generating {users} users...")
+            table.create(connection)
+            rows = list(_bench_users(users))
+            for start in range(0, len(rows), 5000):
+                connection.execute(insert(table), rows[start : start + 5000])
+
+            start = perf_counter()
+            has_fts = create_fts_table(connection)
+            if has_fts:
+                rebuild_search_index(connection)
+            print(f"FTS5 index built in {perf_counter() - start:.2f}s")
+
+            start = perf_counter()
+            get_trigram_index(connection)
+            print(f"Trigram index built in {perf_counter() - start:.2f}s\n")
+
+            texts = _bench_queries(queries)
+
+            def legacy(query):
+                pattern = f"%{query}%"
+                connection.execute(
+                    select(table).where(
+                        or_(
+                            table.c.name.ilike(pattern),
+                            table.c.cpf.ilike(pattern),
+                            table.c.email_personal.ilike(pattern),
+                            table.c.email_professional.ilike(pattern),
+                        )
+                    )
+                ).all()
+
+            backends = [("ilike", legacy)]
+            for backend in ("fts5", "trigram") if has_fts else ("trigram",):
+                backends.append(
+                    (
+                        backend,
+                        lambda query, backend=backend: search_user_ids(
+                            connection, query, limit, backend=backend
+                        ),
+                    )
+                )
+
+            for name, function in backends:
+                print(f"{name:>8}: {_bench_latencies(function, texts)}")
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+
+def export_logs(
+    name: str,
+    output,
+    export_format: str,
+    compress: bool,
+    **filters,
+) -> int:
+    """Exporta um log para um arquivo, com o mesmo fluxo dos downloads
+
+    Args:
+        name (str): Exportação (chave de `EXPORTS`)
+        output (BinaryIO): Arquivo de saída
+        export_format (str): "csv" ou "ndjson"
+        compress (bool): Se True, grava gzip
+        **filters: Filtros da exportação
+
+    Returns:
+        int: Quantidade de bytes gravados
+    """
+    written = 0
+    with db.engine.connect() as connection:
+        for chunk in stream_export(
+            connection, name, export_format, compress, **filters
+        ):
+            written += output.write(chunk)
+    return written
+
+
+def maintain_access_logs(
+    retention_months: int, archive_dir: str = "", dry_run: bool = False
+) -> None:
+    """Mantém as partições mensais dos logs de acesso
+
+    Cria as partições do mês atual e do próximo, move para as partições os
+    logs gravados antes do particionamento e remove (arquivando, se
+    `archive_dir` for informado) os meses fora do período de retenção.
+
+    Args:
+        retention_months (int): Meses mantidos, incluindo o atual. 0 mantém
+            todos.
+        archive_dir (str, optional): Diretório dos arquivos `.ndjson.gz` dos
+            meses removidos. Padrão é "" (apenas remove).
+        dry_run (bool, optional): Se True, apenas lista os meses expirados.
+            Padrão é False.
+    """
+    with db.engine.begin() as connection:
+        strategy = get_strategy(connection)
+        print(f"Access log partitioning: {strategy or 'none'}")
+
+        if not dry_run:
+            month = month_of(datetime.now())
+            ensure_partitions(connection, [month, add_months(month, 1)])
+            moved = move_legacy_rows(connection)
+            if moved:
+                print(f"{moved} logs moved to monthly partitions")
+
+        for month in expired_partitions(connection, retention_months):
+            if dry_run:
+                print(f"{month:%Y-%m} expired")
+                continue
+
+            if archive_dir:
+                os.makedirs(archive_dir, exist_ok=True)
+                path = os.path.join(
+                    archive_dir, f"access_log_{month:%Y%m}.ndjson.gz"
+                )
+                start, end = month_bounds(month)
+                with open(path, "wb") as output:
+                    for chunk in stream_export(
+                        connection,
+                        "access",
+                        "ndjson",
+                        True,
+                        start=start,
+                        end=end,
+                    ):
+                        output.write(chunk)
+                print(f"{month:%Y-%m} archived to {path}")
+
+            drop_partition(connection, month)
+            print(f"{month:%Y-%m} removed")
+
+
+def _size_options(command):
+    """Adiciona as opções das quantidades de SEED_SIZES a um comando"""
+    for name in reversed(list(BENCH_SIZES)):
+        command = click.option(
+            f"--{name.replace('_', '-')}",
+            name,
+            type=int,
+            default=BENCH_SIZES[name],
+            show_default=True,
+        )(command)
+    return command
+
+
 def init_app(app: Flask) -> None:
     @app.cli.command("createroles")
     def _():
@@ -102,3 +416,136 @@ def init_app(app: Flask) -> None:
     def _():
         """Cria um usuário administrador."""
         create_admin()
+
+    @app.cli.command("rebuildhierarchy")
+    def _():
+        """Reconstrói a tabela de fechamento da hierarquia."""
+        rebuild_hierarchy()
+
+    @app.cli.command("rebuildrollups")
+    def _():
+        """Reconstrói os totais pré-agregados das pontuações."""
+        rebuild_score_rollups()
+
+    @app.cli.command("rebuildsearch")
+    def _():
+        """Reconstrói o índice de busca de usuários."""
+        rebuild_user_search()
+
+    @app.cli.command("benchsearch")
+    @click.option("--users", default=100_000, help="Usuários gerados.")
+    @click.option("--queries", default=200, help="Buscas por backend.")
+    @click.option("--limit", default=20, help="Tamanho da página.")
+    def _(users: int, queries: int, limit: int):
+        """Mede a latência da busca de usuários."""
+        benchmark_user_search(users, queries, limit)
+
+    @app.cli.command("export-logs")
+    @click.argument("name", type=click.Choice(list(EXPORTS)))
+    @click.option(
+        "--output", "-o", type=click.File("wb"), default="-", help="Arquivo."
+    )
+    @click.option(
+        "--format",
+        "export_format",
+        type=click.Choice(list(EXPORT_FORMATS)),
+        default="csv",
+    )
+    @click.option("--gzip/--no-gzip", "compress", default=False)
+    @click.option("--user-id", type=int, help="Apenas logs deste usuário.")
+    @click.option("--start", help="Início do período (AAAA-MM-DD[THH:MM]).")
+    @click.option("--end", help="Fim do período (AAAA-MM-DD[THH:MM]).")
+    def _(name, output, export_format, compress, user_id, start, end):
+        """Exporta os logs de acesso ou de mudanças."""
+        filters = {
+            "start": parse_datetime(start or ""),
+            "end": parse_datetime(end or "", end=True),
+        }
+        if name == "access":
+            filters["user_id"] = user_id
+
+        written = export_logs(name, output, export_format, compress, **filters)
+        click.echo(f"{written} bytes written", err=True)
+
+    @app.cli.command("maintain-logs")
+    @click.option(
+        "--retention",
+        type=int,
+        help="Meses mantidos (padrão ACCESS_LOG_RETENTION_MONTHS).",
+    )
+    @click.option(
+        "--archive-dir", help="Diretório (padrão ACCESS_LOG_ARCHIVE_DIR)."
+    )
+    @click.option("--dry-run", is_flag=True, help="Apenas lista os meses.")
+    def _(retention, archive_dir, dry_run):
+        """Cria, move e remove as partições mensais dos logs de acesso."""
+        if retention is None:
+            retention = app.config.get("ACCESS_LOG_RETENTION_MONTHS", 0)
+        if archive_dir is None:
+            archive_dir = app.config.get("ACCESS_LOG_ARCHIVE_DIR", "")
+        maintain_access_logs(retention, archive_dir, dry_run)
+
+    @app.cli.command("check-budgets")
+    @click.option(
+        "--scale",
+        "scales",
+        type=int,
+        multiple=True,
+        default=BUDGET_SCALES,
+        help="Escalas dos dados gerados.",
+    )
+    @click.option("--actives", default=SEED_SIZES["actives"])
+    @click.option("--categories", default=SEED_SIZES["categories"])
+    @click.option("--experts", default=SEED_SIZES["experts"])
+    def _(scales, actives, categories, experts):
+        """Verifica os orçamentos de consultas SQL das rotas."""
+        scales = tuple(scales)
+        measures = measure_scales(
+            scales,
+            actives=actives,
+            categories=categories,
+            experts=experts,
+        )
+        click.echo(format_query_budgets(measures, scales))
+        violations = check_query_budgets(measures, scales)
+        for violation in violations:
+            click.echo(violation, err=True)
+        if violations:
+            raise SystemExit(1)
+
+    @app.cli.command("seed-bench")
+    @_size_options
+    def _(**sizes):
+        """Popula o banco de dados com dados sintéticos."""
+        seed_bench(**sizes)
+
+    @app.cli.command("bench-routes")
+    @_size_options
+    @click.option("--repeat", default=50, help="Requisições por rota.")
+    @click.option(
+        "--output", "-o", type=click.File("w"), default="-", help="Arquivo."
+    )
+    @click.option(
+        "--baseline",
+        type=click.File("r"),
+        help="Resultado anterior, para comparação.",
+    )
+    @click.option(
+        "--tolerance",
+        default=0.2,
+        help="Aumento tolerado na latência e na memória.",
+    )
+    def _(repeat, output, baseline, tolerance, **sizes):
+        """Mede latência, consultas e memória das principais rotas."""
+        result = run_benchmark(repeat, **sizes)
+        json.dump(result, output, indent=2)
+        output.write("\n")
+
+        if baseline is not None:
+            regressions = compare_benchmarks(
+                json.load(baseline), result, tolerance
+            )
+            for regression in regressions:
+                click.echo(regression, err=True)
+            if regressions:
+                raise SystemExit(1)
@@ -1,11 +1,53 @@
-from flask import Flask
+from collections import Counter
+from typing import Iterable, List
+
+from flask import Flask, Response, g, request
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 
 db = SQLAlchemy()
 migrate = Migrate()
 
+# Chaves de `flask.g` com os objetos obtidos por ID na requisição e com os
+# acertos e faltas dessas buscas
+IDENTITY_CACHE_KEY = "_identity_cache"
+IDENTITY_STATS_KEY = "_identity_stats"
+
+# Tamanho máximo das listas IN utilizadas na manutenção das tabelas
+# derivadas (hierarquia, totais, busca e relatórios)
+CHUNK_SIZE = 500
+
+
+def chunks(values: List, size: int = CHUNK_SIZE) -> Iterable[List]:
+    """Divide uma lista em partes de no máximo `size` itens"""
+    for i in range(0, len(values), size):
+        yield values[i : i + size]
+
+
+def get_identity_stats() -> Counter:
+    """Obtém os contadores (`"hits"` e `"misses"`) das buscas por ID da
+    requisição atual"""
+    return g.setdefault(IDENTITY_STATS_KEY, Counter())
+
 
 def init_app(app: Flask) -> None:
     db.init_app(app)
     migrate.init_app(app, db)
+
+    @app.after_request
+    def _(response: Response) -> Response:
+        stats = g.get(IDENTITY_STATS_KEY)
+        if not stats:
+            return response
+
+        app.logger.debug(
+            "%s: %d buscas por ID (%d no mapa de identidade)",
+            request.path,
+            stats["hits"] + stats["misses"],
+            stats["hits"],
+        )
+        if app.debug:
+            response.headers["X-Identity-Map"] = (
+                f"hits={stats['hits']}; misses={stats['misses']}"
+            )
+        return response
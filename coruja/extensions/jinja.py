@@ -1,8 +1,10 @@
-from flask import Flask
+from flask import Flask, Response, g, request
+from werkzeug.local import LocalProxy
 from wtforms import Field
 from wtforms.validators import DataRequired
 
-from ..decorators import proxy_access_function
+from ..decorators import get_capabilities
+from ..models import User
 
 
 def is_field_required(field: Field):
@@ -17,9 +19,41 @@ def is_field_required(field: Field):
     return any(isinstance(v, DataRequired) for v in field.validators)
 
 
+def inject_capabilities():
+    """Calcula as capacidades do usuário uma vez por renderização
+
+    `proxy_access` é mantido com a mesma assinatura para verificações de
+    um objeto específico.
+    """
+    capabilities = get_capabilities()
+    return {"capabilities": capabilities, "proxy_access": capabilities}
+
+
 def init_app(app: Flask):
+    # Macros importadas sem contexto não recebem o `context_processor`
+    capabilities = LocalProxy(get_capabilities)
     app.jinja_env.globals.update(
         is_field_required=is_field_required,
-        proxy_access=proxy_access_function,
+        capabilities=capabilities,
+        proxy_access=capabilities,
+        censored_cpf=User.censored_cpf,
         len=len,
     )
+    app.context_processor(inject_capabilities)
+
+    @app.after_request
+    def _(response: Response) -> Response:
+        capabilities = g.get("_capabilities")
+        if capabilities is None or not capabilities.checks:
+            return response
+
+        total = sum(capabilities.checks.values())
+        app.logger.debug(
+            "%s: %d verificações de permissão (%d distintas)",
+            request.path,
+            total,
+            len(capabilities.checks),
+        )
+        if app.debug:
+            response.headers["X-Permission-Checks"] = str(total)
+        return response
@@ -0,0 +1,277 @@
+import os
+import traceback
+from collections import deque
+from threading import Lock
+from time import perf_counter
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from flask import Flask, Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Diretório do pacote, usado para localizar a origem das consultas lentas
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Chave de `Connection.info` com o início das consultas em execução
+START_KEY = "_profiler_query_start"
+
+# Percentis expostos por endpoint
+PERCENTILES = (50, 95, 99)
+
+# (duração da requisição, quantidade de consultas, tempo no banco), em ms
+Sample = Tuple[float, int, float]
+
+
+class QueryBudgetExceeded(Exception):
+    """Uma requisição executou mais consultas que o orçamento da rota"""
+
+
+def query_budget(limit: int) -> Callable:
+    """Declara a quantidade máxima de consultas SQL de uma rota
+
+    Deve ser aplicado logo abaixo de `@bp.route`. Requisições acima do
+    orçamento são registradas (`logger.warning`) ou, com
+    `SQL_QUERY_BUDGET_STRICT`, falham com `QueryBudgetExceeded`. O
+    orçamento pode ser sobrescrito por endpoint em `SQL_QUERY_BUDGETS`.
+
+    Args:
+        limit (int): Quantidade máxima de consultas por requisição
+    """
+
+    def decorator(view: Callable) -> Callable:
+        view.query_budget = limit  # type: ignore [attr-defined]
+        return view
+
+    return decorator
+
+
+def get_query_budget(app: Flask, endpoint: Optional[str]) -> Optional[int]:
+    """Obtém o orçamento de consultas de um endpoint
+
+    Args:
+        app (Flask): Aplicação
+        endpoint (Optional[str]): Endpoint
+
+    Returns:
+        Optional[int]: Orçamento ou None, caso a rota não tenha orçamento
+    """
+    budgets = app.config.get("SQL_QUERY_BUDGETS") or {}
+    if endpoint in budgets:
+        return budgets[endpoint]
+    view = app.view_functions.get(endpoint)  # type: ignore [arg-type]
+    return getattr(view, "query_budget", None)
+
+
+def percentile(values: List[float], rank: int) -> float:
+    """Percentil (nearest-rank) de uma lista ordenada"""
+    if not values:
+        return 0
+    index = max(0, -(-rank * len(values) // 100) - 1)
+    return values[min(index, len(values) - 1)]
+
+
+def summarize(values: Iterable[float]) -> Dict[str, float]:
+    """Média, percentis (PERCENTILES) e máximo de uma amostra não vazia"""
+    values = sorted(values)
+    summary = {"mean": round(sum(values) / len(values), 2)}
+    for rank in PERCENTILES:
+        summary[f"p{rank}"] = round(percentile(values, rank), 2)
+    summary["max"] = round(values[-1], 2)
+    return summary
+
+
+def query_origin() -> str:
+    """Obtém o trecho do pacote (fora deste módulo) que executou a consulta
+
+    Returns:
+        str: `arquivo:linha em função` dos frames mais internos do pacote
+    """
+    frames = [
+        frame
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(PACKAGE_DIR)
+        and frame.filename != __file__
+    ]
+    return " <- ".join(
+        "{}:{} em {}".format(
+            os.path.relpath(frame.filename, PACKAGE_DIR),
+            frame.lineno,
+            frame.name,
+        )
+        for frame in reversed(frames[-3:])
+    )
+
+
+class QueryProfiler:
+    """Instrumentação das consultas SQL.
+
+    Conta as consultas e o tempo gasto no banco em cada requisição, registra
+    (`logger.warning`) as consultas mais lentas que `SQL_PROFILER_SLOW_MS`
+    com a origem no código, verifica o orçamento de consultas da rota
+    (`query_budget`) e mantém, por endpoint, as últimas
+    `SQL_PROFILER_WINDOW` requisições para o cálculo dos percentis.
+    """
+
+    def __init__(self):
+        self.app: Optional[Flask] = None
+        self._samples: Dict[str, Deque[Sample]] = {}
+        self._lock = Lock()
+
+    def init_app(self, app: Flask) -> None:
+        self.app = app
+        app.config.setdefault("SQL_PROFILER_SLOW_MS", 200)
+        app.config.setdefault("SQL_PROFILER_WINDOW", 1000)
+        app.config.setdefault("SQL_QUERY_BUDGET_STRICT", False)
+        app.extensions["sql_profiler"] = self
+
+        if not event.contains(
+            Engine, "before_cursor_execute", self._before_cursor_execute
+        ):
+            event.listen(
+                Engine, "before_cursor_execute", self._before_cursor_execute
+            )
+            event.listen(
+                Engine, "after_cursor_execute", self._after_cursor_execute
+            )
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _before_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ) -> None:
+        conn.info.setdefault(START_KEY, []).append(perf_counter())
+
+    def _after_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ) -> None:
+        starts = conn.info.get(START_KEY)
+        if not starts:
+            return
+        elapsed = (perf_counter() - starts.pop()) * 1000
+
+        if has_request_context():
+            stats = g.get("_sql_stats")
+            if stats is not None:
+                stats[0] += 1
+                stats[1] += elapsed
+
+        app = self.app
+        if app is None or elapsed < app.config["SQL_PROFILER_SLOW_MS"]:
+            return
+        app.logger.warning(
+            "Consulta lenta (%.1f ms) em %s: %s",
+            elapsed,
+            query_origin() or "?",
+            " ".join(statement.split())[:500],
+        )
+
+    def _before_request(self) -> None:
+        # [consultas, tempo no banco (ms), início da requisição]
+        g._sql_stats = [0, 0.0, perf_counter()]
+
+    def _after_request(self, response: Response) -> Response:
+        stats = g.pop("_sql_stats", None)
+        if stats is None:
+            return response
+
+        queries, db_time, started = stats
+        duration = (perf_counter() - started) * 1000
+        self.record(
+            request.endpoint or "<sem endpoint>", duration, queries, db_time
+        )
+
+        app = self.app
+        if app is None:
+            return response
+        app.logger.debug(
+            "%s: %d consultas SQL (%.1f ms no banco)",
+            request.path,
+            queries,
+            db_time,
+        )
+
+        budget = get_query_budget(app, request.endpoint)
+        if budget is not None and queries > budget:
+            message = "{}: {} consultas SQL, acima do orçamento ({})".format(
+                request.endpoint, queries, budget
+            )
+            if app.config["SQL_QUERY_BUDGET_STRICT"]:
+                raise QueryBudgetExceeded(message)
+            app.logger.warning(message)
+
+        if app.debug:
+            response.headers["X-Query-Count"] = str(queries)
+            response.headers["Server-Timing"] = (
+                f"db;dur={db_time:.1f}, app;dur={duration:.1f}"
+            )
+        return response
+
+    def record(
+        self, endpoint: str, duration: float, queries: int, db_time: float
+    ) -> None:
+        """Registra uma requisição na janela do endpoint
+
+        Args:
+            endpoint (str): Endpoint da requisição
+            duration (float): Duração da requisição (ms)
+            queries (int): Quantidade de consultas
+            db_time (float): Tempo gasto no banco (ms)
+        """
+        window = self.app.config["SQL_PROFILER_WINDOW"] if self.app else 1000
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = self._samples[endpoint] = deque(maxlen=window)
+            samples.append((duration, queries, db_time))
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Estatísticas das últimas requisições de cada endpoint
+
+        Returns:
+            Dict[str, Dict]: Por endpoint, com a seguinte estrutura:
+            >>> {
+            ...    "requests": int,
+            ...    "budget": Optional[int],
+            ...    "queries": {
+            ...        "mean": float,
+            ...        "p50": float,
+            ...        "p95": float,
+            ...        "p99": float,
+            ...        "max": float,
+            ...    },
+            ...    "db_ms": {...},  # mesmas chaves de "queries"
+            ...    "duration_ms": {...},
+            ... }
+        """
+        with self._lock:
+            samples = {
+                endpoint: list(values)
+                for endpoint, values in self._samples.items()
+            }
+
+        result = {}
+        for endpoint, values in sorted(samples.items()):
+            durations, queries, db_times = zip(*values)
+            result[endpoint] = {
+                "requests": len(values),
+                "budget": (
+                    get_query_budget(self.app, endpoint) if self.app else None
+                ),
+                "queries": summarize(queries),
+                "db_ms": summarize(db_times),
+                "duration_ms": summarize(durations),
+            }
+        return result
+
+    def reset(self) -> None:
+        """Descarta as requisições registradas"""
+        with self._lock:
+            self._samples.clear()
+
+
+profiler = QueryProfiler()
+
+
+def init_app(app: Flask) -> None:
+    profiler.init_app(app)
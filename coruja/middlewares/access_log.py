@@ -0,0 +1,213 @@
+import atexit
+import os
+from datetime import datetime
+from queue import Empty, Full, Queue
+from threading import Event, Lock, Thread
+from time import monotonic
+from typing import Dict, List, Optional
+
+from flask import Flask
+from sqlalchemy import bindparam, update
+
+from ..extensions.database import db
+from ..models import User
+from ..models.log_partitions import insert_access_logs
+
+# Tamanho máximo das colunas de texto de AccessLog
+MAX_LENGTH = 255
+
+
+class AccessLogWriter:
+    """Pipeline de gravação dos logs de acesso.
+
+    Os registros são enfileirados em um buffer limitado e gravados em lote
+    (executemany) por uma thread em segundo plano a cada
+    `ACCESS_LOG_BATCH_SIZE` registros ou `ACCESS_LOG_FLUSH_INTERVAL_MS`
+    milissegundos. O `last_seen` dos usuários é agrupado por usuário em cada
+    lote.
+
+    Quando o buffer está cheio, `ACCESS_LOG_OVERFLOW` define a política:
+    `"drop"` descarta o registro e `"block"` aguarda espaço no buffer por
+    até um intervalo de gravação antes de descartá-lo.
+
+    Com `ACCESS_LOG_ASYNC = false` os registros são gravados durante a
+    requisição, sem a thread.
+    """
+
+    def __init__(self):
+        self.app: Optional[Flask] = None
+        self.dropped = 0
+        self._queue: Optional[Queue] = None
+        self._thread: Optional[Thread] = None
+        self._stop = Event()
+        self._lock = Lock()
+        self._pid: Optional[int] = None
+
+    def init_app(self, app: Flask) -> None:
+        self.app = app
+        app.config.setdefault("ACCESS_LOG_ASYNC", True)
+        app.config.setdefault("ACCESS_LOG_BATCH_SIZE", 100)
+        app.config.setdefault("ACCESS_LOG_FLUSH_INTERVAL_MS", 500)
+        app.config.setdefault("ACCESS_LOG_BUFFER_SIZE", 10000)
+        app.config.setdefault("ACCESS_LOG_OVERFLOW", "drop")
+
+        atexit.register(self.stop)
+        try:
+            import uwsgi  # type: ignore
+
+            uwsgi.atexit = self.stop
+        except ImportError:
+            pass
+
+    @property
+    def _config(self):
+        return self.app.config  # type: ignore [app isn't None]
+
+    def _ensure_worker(self) -> Queue:
+        """Inicia a thread de gravação (também após um fork do uWSGI)"""
+        if (
+            self._pid == os.getpid()
+            and self._thread
+            and self._thread.is_alive()
+        ):
+            return self._queue  # type: ignore [queue isn't None]
+
+        with self._lock:
+            if self._pid != os.getpid() or not (
+                self._thread and self._thread.is_alive()
+            ):
+                self._pid = os.getpid()
+                self._stop.clear()
+                self._queue = Queue(self._config["ACCESS_LOG_BUFFER_SIZE"])
+                self._thread = Thread(
+                    target=self._run,
+                    name="access-log-writer",
+                    daemon=True,
+                )
+                self._thread.start()
+
+        return self._queue  # type: ignore [queue isn't None]
+
+    def record(
+        self,
+        *,
+        ip: Optional[str],
+        user_agent: Optional[str],
+        access_at: datetime,
+        endpoint: Optional[str],
+        user_id: int,
+    ) -> None:
+        """Registra um acesso
+
+        Args:
+            ip (Optional[str]): IP do usuário
+            user_agent (Optional[str]): User agent do usuário
+            access_at (datetime): Data e hora do acesso
+            endpoint (Optional[str]): Caminho acessado
+            user_id (int): ID do usuário
+        """
+        log = {
+            "ip": (ip or "")[:MAX_LENGTH] or None,
+            "user_agent": (user_agent or "")[:MAX_LENGTH] or None,
+            "access_at": access_at,
+            "endpoint": (endpoint or "")[:MAX_LENGTH] or None,
+            "user_id": user_id,
+        }
+
+        if not self._config["ACCESS_LOG_ASYNC"]:
+            self._write([log])
+            return
+
+        queue = self._ensure_worker()
+        try:
+            if self._config["ACCESS_LOG_OVERFLOW"] == "block":
+                timeout = self._config["ACCESS_LOG_FLUSH_INTERVAL_MS"] / 1000
+                queue.put(log, timeout=timeout)
+            else:
+                queue.put_nowait(log)
+        except Full:
+            self.dropped += 1
+
+    def flush(self) -> None:
+        """Grava imediatamente todos os registros do buffer"""
+        if self._queue is None or self._pid != os.getpid():
+            return
+
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except Empty:
+                break
+
+        if batch:
+            self._write(batch)
+
+    def stop(self) -> None:
+        """Encerra a thread de gravação, gravando o que restar no buffer"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+
+        self._stop.set()
+        self._thread.join(
+            timeout=self._config["ACCESS_LOG_FLUSH_INTERVAL_MS"] / 1000 + 5
+        )
+        self.flush()
+
+    def _run(self) -> None:
+        queue: Queue = self._queue  # type: ignore [queue isn't None]
+        batch_size = self._config["ACCESS_LOG_BATCH_SIZE"]
+        interval = self._config["ACCESS_LOG_FLUSH_INTERVAL_MS"] / 1000
+
+        while not self._stop.is_set():
+            try:
+                batch: List[Dict] = [queue.get(timeout=interval)]
+            except Empty:
+                continue
+
+            # O lote é gravado ao atingir `batch_size`, um intervalo após o
+            # primeiro registro ou ao encerrar (`stop` grava só o buffer)
+            deadline = monotonic() + interval
+            while len(batch) < batch_size and not self._stop.is_set():
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(queue.get(timeout=remaining))
+                except Empty:
+                    break
+
+            self._write(batch)
+
+    def _write(self, batch: List[Dict]) -> None:
+        """Grava um lote de logs e atualiza o `last_seen` dos usuários"""
+        last_seen: Dict[int, datetime] = {}
+        for log in batch:
+            user_id = log["user_id"]
+            if (
+                user_id not in last_seen
+                or last_seen[user_id] < log["access_at"]
+            ):
+                last_seen[user_id] = log["access_at"]
+
+        app: Flask = self.app  # type: ignore [app isn't None]
+        try:
+            with app.app_context(), db.engine.begin() as connection:
+                insert_access_logs(connection, batch)
+                connection.execute(
+                    update(User.__table__)
+                    .where(User.__table__.c.id == bindparam("_user_id"))
+                    .values(last_seen=bindparam("_last_seen")),
+                    [
+                        {"_user_id": user_id, "_last_seen": access_at}
+                        for user_id, access_at in last_seen.items()
+                    ],
+                )
+        except Exception:
+            self.dropped += len(batch)
+            app.logger.exception(
+                "Falha ao gravar %d logs de acesso", len(batch)
+            )
+
+
+access_log_writer = AccessLogWriter()
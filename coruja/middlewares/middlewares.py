@@ -5,8 +5,8 @@ from flask_login import current_user
 from werkzeug.exceptions import Forbidden, NotFound
 
 from ..extensions.auth import login_manager
-from ..extensions.database import db
-from ..models import AccessLog, User
+from ..models import User
+from .access_log import access_log_writer
 
 
 @login_manager.user_loader
@@ -38,16 +38,13 @@ def _before_request():
     is_static = request.path.startswith("/static/")
     is_favicon = request.path.startswith("/favicon.ico")
     if current_user.is_authenticated and not (is_static or is_favicon):  # type: ignore
-        current_user.last_seen = datetime.utcnow()
-        new_access_log = AccessLog(
+        access_log_writer.record(
             ip=request.remote_addr,
             user_agent=request.user_agent.string,
             access_at=datetime.utcnow(),
             endpoint=request.path,
             user_id=current_user.id,  # type: ignore
         )
-        db.session.add(new_access_log)
-        db.session.commit()
 
 
 def handle_404(err: NotFound):
@@ -92,6 +89,7 @@ def handle_403(err: Forbidden):
 
 
 def init_middleware_login(app: Flask) -> None:
+    access_log_writer.init_app(app)
     app.register_error_handler(404, handle_404)
     app.register_error_handler(403, handle_403)
     app.before_request(_before_request)
@@ -1,7 +1,7 @@
 from datetime import datetime
 
 from flask_login import current_user
-from sqlalchemy import event
+from sqlalchemy import event, inspect
 
 from ..extensions.database import db
 from .actives import Active, ActiveScore
@@ -13,9 +13,12 @@ from .dangers import (
     Threat,
     Vulnerability,
     VulnerabilityCategory,
+    VulnerabilityCategoryOverride,
     VulnerabilityScore,
+    VulnerabilitySnapshot,
     VulnerabilitySubCategory,
 )
+from .hierarchy import HierarchyClosure
 from .institution import Institution, institution_administrators, institution_units
 from .organs import Organ
 from .relationships import (
@@ -29,6 +32,9 @@ from .relationships import (
     user_permissions,
     vulnerability_categories,
 )
+from .reports import invalidate_reports_on_flush  # noqa: F401
+from .rollups import ScoreRollup
+from .search import sync_search_on_flush  # noqa: F401
 from .units import Unit
 from .users import Permission, User
 
@@ -45,11 +51,13 @@ __all__ = [
     "units_staff",
     "Institution",
     "ActiveScore",
+    "ScoreRollup",
     "AnalysisRisk",
     "Vulnerability",
     "unit_analysis",
     "AdverseAction",
     "user_permissions",
+    "HierarchyClosure",
     "analytics_experts",
     "institution_units",
     "organ_institutions",
@@ -59,84 +67,73 @@ __all__ = [
     "organ_administrators",
     "AnalysisVulnerability",
     "VulnerabilityCategory",
+    "VulnerabilitySnapshot",
     "vulnerability_categories",
     "VulnerabilitySubCategory",
     "analytics_administrators",
     "institution_administrators",
+    "VulnerabilityCategoryOverride",
 ]
 
 
-def serialize(model_instance: "db.Model"):  # type: ignore
-    """Serialize a model instance into a dictionary
+# Colunas que, sozinhas, não geram um registro de auditoria
+AUDIT_IGNORED_COLUMNS = ("updated_at", "last_seen")
 
-    Args:
-        model_instance (db.Model): Model instance
-
-    Returns:
-        dict: Dictionary
-    """
 
-    serialized_data = {}
-    for c in model_instance.__table__.columns:
-        value = getattr(model_instance, c.name)
-        if isinstance(value, datetime):
-            value = value.isoformat()
-        serialized_data[c.name] = value
-    return serialized_data
+def changed_columns(obj: "db.Model"):  # type: ignore
+    """Obtém as colunas alteradas e ainda não gravadas de um model
 
-
-def capture_initial_state(target, query_context):
-    """Obtém o estado inicial de um determinado model
+    Utiliza o histórico de atributos do SQLAlchemy, sem consultar o banco.
 
     Args:
-        target (db.Model): Model
-        query_context (QueryContext): Contexto de consulta
+        obj (db.Model): Model
+
+    Returns:
+        Tuple[dict, dict]: Valores antigos e novos das colunas alteradas
     """
-    target._original_state = serialize(target)
+    state = inspect(obj)
+    old, new = {}, {}
+    for attribute in state.mapper.column_attrs:
+        history = state.attrs[attribute.key].history
+        if not history.has_changes():
+            continue
+        old[attribute.key] = history.deleted[0] if history.deleted else None
+        new[attribute.key] = history.added[0] if history.added else None
+    return old, new
 
 
-def capture_and_compare_changes(session, flush_context):
-    """Obtém as mudanças feitas por um flush commit
+def capture_changes(session, flush_context, instances):
+    """Registra as colunas alteradas antes de um flush
 
     Args:
-        session (Session): Sessão do commit
+        session (Session): Sessão do flush
         flush_context (FlushContext): Contexto de flush
+        instances (Optional[Sequence]): Objetos passados para o flush
     """
-    for obj in session.dirty:
-        if not hasattr(obj, "_original_state"):
+    for obj in list(session.dirty):
+        if not isinstance(obj, BaseTable) or isinstance(
+            obj, (Change, AccessLog)
+        ):
             continue
 
-        current_state = serialize(obj)
-        original_state = obj._original_state
-        if (
-            isinstance(obj, User)
-            and current_state["last_seen"] != original_state["last_seen"]
-            and any(
-                current_state[key] != original_state[key]
-                for key in current_state
-            )
-        ):
+        old, new = changed_columns(obj)
+        if all(key in AUDIT_IGNORED_COLUMNS for key in new):
             continue
-        object_type = obj.__class__.__name__
-        if original_state != current_state:
-            obj.updated_at = datetime.now()
-            current_state["updated_at"] = obj.updated_at
-            change = Change(
-                object_old=original_state,
-                object_new=current_state,
-                user_id=current_user.id,  # type: ignore
-                object_type=object_type,
-            )
-            session.add(change)
-
-
-# Código abaixo registra eventos para cada subclasse de BaseTable
-for name, value in locals().copy().items():
-    if (
-        isinstance(value, type)
-        and issubclass(value, BaseTable)
-        and name not in ("BaseTable", "Change", "AccessLog")
-    ):
-        event.listen(value, "load", capture_initial_state)
-
-event.listen(db.session, "after_flush", capture_and_compare_changes)
+
+        for key in AUDIT_IGNORED_COLUMNS:
+            old.pop(key, None)
+            new.pop(key, None)
+
+        old["id"] = new["id"] = obj.id
+        old["updated_at"] = obj.updated_at
+        obj.updated_at = new["updated_at"] = datetime.now()
+        change = Change(
+            object_old=old,
+            object_new=new,
+            user_id=getattr(current_user, "id", None),
+            object_type=obj.__class__.__name__,
+        )
+        session.add(change)
+
+
+event.listen(db.session, "before_flush", capture_changes)
@@ -54,6 +54,15 @@ class ActiveScore(BaseTable):
     user = db.relationship("User", backref="acitve_scores", lazy=True)
     active = db.relationship("Active", backref="acitve_scores", lazy=True)
 
+    __table_args__ = (
+        db.Index(
+            "uq_active_score_active_user",
+            "active_id",
+            "user_id",
+            unique=True,
+        ),
+    )
+
     def __init__(
         self,
         *,
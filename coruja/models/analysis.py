@@ -121,15 +121,26 @@ class AnalysisRisk(BaseTable):
 
 class AnalysisVulnerability(BaseTable):
     analysis_id = db.Column(db.Integer, db.ForeignKey("analysis.id"))
+    # Catálogo compartilhado (copy-on-write). Quando None, a análise possui
+    # a sua própria cópia do catálogo (`vulnerability_categories`).
+    snapshot_id = db.Column(
+        db.Integer, db.ForeignKey("vulnerability_snapshot.id")
+    )
     vulnerability_categories = db.relationship(
         "VulnerabilityCategory",
         back_populates="analysis_vulnerability",
     )
+    snapshot = db.relationship("VulnerabilitySnapshot", lazy=True)
 
-    def __init__(self, *, analysis_id: int) -> None:
+    def __init__(
+        self, *, analysis_id: int, snapshot_id: Optional[int] = None
+    ) -> None:
         """Construtor de AnalysisVulnerability
 
         Args:
             analysis_id (int): ID da análise (pai)
+            snapshot_id (Optional[int], optional): ID do catálogo
+                compartilhado. Padrão é None (cópia própria do catálogo).
         """
         self.analysis_id = analysis_id
+        self.snapshot_id = snapshot_id
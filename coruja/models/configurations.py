@@ -74,6 +74,8 @@ class Change(BaseTable):
 
     user = db.relationship("User", backref="changes", lazy=True)
 
+    __table_args__ = (db.Index("ix_change_created_at_id", "created_at", "id"),)
+
     def __init__(self, *, object_old, object_new, user_id, object_type):
         self.object_old = self.serialize_dict(object_old)
         self.object_new = self.serialize_dict(object_new)
@@ -92,13 +94,28 @@ class Change(BaseTable):
 
 
 class AccessLog(BaseTable):
+    """Tabela `access_log`, sem as partições mensais
+
+    Com `ACCESS_LOG_PARTITIONING` (SQLite) os logs novos são gravados em
+    tabelas `access_log_pAAAAMM` e esta tabela contém somente os logs
+    anteriores ao particionamento; os IDs recomeçam em cada tabela mensal.
+    Por isso o model não possui relacionamentos: os logs são gravados com
+    `insert_access_logs` e lidos com `access_log_statements`
+    (`models/log_partitions.py`).
+    """
+
     ip = db.Column(db.String(255))
     user_agent = db.Column(db.String(255))
-    access_at = db.Column(db.DateTime)
+    # NOT NULL: no MySQL a coluna faz parte da chave primária (id,
+    # access_at) da tabela particionada
+    access_at = db.Column(db.DateTime, nullable=False)
     endpoint = db.Column(db.String(255))
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
 
-    user = db.relationship("User", backref="access_logs", lazy=True)
+    __table_args__ = (
+        db.Index("ix_access_log_user_access_at", "user_id", "access_at"),
+        db.Index("ix_access_log_access_at_id", "access_at", "id"),
+    )
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -1,5 +1,8 @@
+from itertools import chain
 from typing import Optional
 
+from sqlalchemy import event, update
+
 from ..extensions.database import db
 from .configurations import BaseTable
 
@@ -78,6 +81,15 @@ class AdverseActionScore(BaseTable):
         lazy=True,
     )
 
+    __table_args__ = (
+        db.Index(
+            "uq_adverse_action_score_adverse_action_user",
+            "adverse_action_id",
+            "user_id",
+            unique=True,
+        ),
+    )
+
     def __init__(
         self,
         *,
@@ -106,11 +118,25 @@ class AdverseActionScore(BaseTable):
         }
 
 
+class VulnerabilitySnapshot(BaseTable):
+    """Versão congelada do catálogo modelo de vulnerabilidades,
+    compartilhada pelas análises de vulnerabilidade criadas enquanto o
+    catálogo modelo não é alterado (`is_current`)."""
+
+    is_current = db.Column(db.Boolean, nullable=False, default=True)
+
+    def __init__(self, *, is_current: bool = True):
+        self.is_current = is_current
+
+
 class VulnerabilityCategory(BaseTable):
     name = db.Column(db.String(255), nullable=False)
     analysis_vulnerability_id = db.Column(
         db.Integer, db.ForeignKey("analysis_vulnerability.id")
     )
+    snapshot_id = db.Column(
+        db.Integer, db.ForeignKey("vulnerability_snapshot.id"), index=True
+    )
 
     analysis_vulnerability = db.relationship(
         "AnalysisVulnerability", back_populates="vulnerability_categories"
@@ -124,10 +150,12 @@ class VulnerabilityCategory(BaseTable):
         name: str,
         is_template: bool = False,
         analysis_vulnerability_id: int | None = None,
+        snapshot_id: int | None = None,
     ):
         self.name = name
         self.is_template = is_template
         self.analysis_vulnerability_id = analysis_vulnerability_id
+        self.snapshot_id = snapshot_id
 
     def as_dict(self):
         return {
@@ -205,6 +233,43 @@ class Vulnerability(BaseTable):
         }
 
 
+class VulnerabilityCategoryOverride(BaseTable):
+    """Alteração local de uma análise de vulnerabilidade sobre uma
+    categoria do catálogo compartilhado (`VulnerabilitySnapshot`)"""
+
+    analysis_vulnerability_id = db.Column(
+        db.Integer,
+        db.ForeignKey("analysis_vulnerability.id"),
+        nullable=False,
+    )
+    category_id = db.Column(
+        db.Integer,
+        db.ForeignKey("vulnerability_category.id"),
+        nullable=False,
+    )
+    is_hidden = db.Column(db.Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        db.Index(
+            "uq_vulnerability_category_override",
+            "analysis_vulnerability_id",
+            "category_id",
+            unique=True,
+        ),
+    )
+
+    def __init__(
+        self,
+        *,
+        analysis_vulnerability_id: int,
+        category_id: int,
+        is_hidden: bool = False,
+    ):
+        self.analysis_vulnerability_id = analysis_vulnerability_id
+        self.category_id = category_id
+        self.is_hidden = is_hidden
+
+
 class VulnerabilityScore(BaseTable):
     score = db.Column(db.Integer, nullable=False, default=0)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
@@ -213,6 +278,11 @@ class VulnerabilityScore(BaseTable):
         db.ForeignKey("vulnerability.id"),
         nullable=False,
     )
+    analysis_vulnerability_id = db.Column(
+        db.Integer,
+        db.ForeignKey("analysis_vulnerability.id"),
+        nullable=False,
+    )
 
     user = db.relationship("User", backref="vulnerability_scores", lazy=True)
     vulnerability = db.relationship(
@@ -221,7 +291,61 @@ class VulnerabilityScore(BaseTable):
         lazy=True,
     )
 
-    def __init__(self, *, score: int = 0, user_id: int, vulnerability_id: int):
+    __table_args__ = (
+        db.Index(
+            "uq_vulnerability_score_analysis_vulnerability_user",
+            "analysis_vulnerability_id",
+            "vulnerability_id",
+            "user_id",
+            unique=True,
+        ),
+        # Atende à chave estrangeira de `vulnerability_id` (MySQL)
+        db.Index(
+            "ix_vulnerability_score_vulnerability_id", "vulnerability_id"
+        ),
+    )
+
+    def __init__(
+        self,
+        *,
+        score: int = 0,
+        user_id: int,
+        vulnerability_id: int,
+        analysis_vulnerability_id: int,
+    ):
         self.score = score
         self.user_id = user_id
         self.vulnerability_id = vulnerability_id
+        self.analysis_vulnerability_id = analysis_vulnerability_id
+
+
+def invalidate_snapshot_on_flush(session, flush_context) -> None:
+    """Marca o catálogo compartilhado atual como desatualizado quando o
+    catálogo modelo é alterado, para que a próxima análise gere uma nova
+    versão
+
+    Args:
+        session (Session): Sessão do flush
+        flush_context (FlushContext): Contexto de flush
+    """
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if (
+            isinstance(
+                obj,
+                (
+                    VulnerabilityCategory,
+                    VulnerabilitySubCategory,
+                    Vulnerability,
+                ),
+            )
+            and obj.is_template
+        ):
+            session.connection().execute(
+                update(VulnerabilitySnapshot.__table__)
+                .where(VulnerabilitySnapshot.__table__.c.is_current.is_(True))
+                .values(is_current=False)
+            )
+            return
+
+
+event.listen(db.session, "after_flush", invalidate_snapshot_on_flush)
@@ -0,0 +1,376 @@
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, delete, event, insert, inspect, select, tuple_
+
+from ..extensions.database import chunks, db
+from .actives import Active
+from .analysis import Analysis, AnalysisRisk
+from .dangers import AdverseAction, Threat
+from .institution import Institution
+from .organs import Organ
+from .relationships import institution_units, organ_institutions, unit_analysis
+from .units import Unit
+
+# (object_type, object_id)
+Node = Tuple[str, int]
+
+
+class HierarchyClosure(db.Model):
+    """Tabela de fechamento (closure table) da hierarquia
+
+    Órgão -> Instituição -> Unidade -> Análise -> Análise de Risco -> Ativo
+    -> Ameaça -> Ação Adversa.
+
+    Cada linha relaciona um ancestral a um descendente (inclusive ele mesmo,
+    com `depth=0`), permitindo obter ancestrais e descendentes de qualquer
+    objeto com uma única consulta indexada.
+    """
+
+    __tablename__ = "hierarchy_closure"
+
+    ancestor_type = db.Column(db.String(32), primary_key=True)
+    ancestor_id = db.Column(db.Integer, primary_key=True)
+    descendant_type = db.Column(db.String(32), primary_key=True)
+    descendant_id = db.Column(db.Integer, primary_key=True)
+    depth = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index(
+            "ix_hierarchy_closure_descendant",
+            "descendant_type",
+            "descendant_id",
+            "depth",
+        ),
+    )
+
+
+TYPE_MODELS = {
+    "organ": Organ,
+    "institution": Institution,
+    "unit": Unit,
+    "analysis": Analysis,
+    "analysis_risk": AnalysisRisk,
+    "active": Active,
+    "threat": Threat,
+    "adverse_action": AdverseAction,
+}
+MODEL_TYPES = {model: _type for _type, model in TYPE_MODELS.items()}
+
+# (tipo filho, tipo pai, tabela de ligação, coluna filho, coluna pai)
+LINKS = (
+    (
+        "institution",
+        "organ",
+        organ_institutions,
+        organ_institutions.c.institution_id,
+        organ_institutions.c.organ_id,
+    ),
+    (
+        "unit",
+        "institution",
+        institution_units,
+        institution_units.c.unit_id,
+        institution_units.c.institution_id,
+    ),
+    (
+        "analysis",
+        "unit",
+        unit_analysis,
+        unit_analysis.c.analysis_id,
+        unit_analysis.c.unit_id,
+    ),
+    (
+        "analysis_risk",
+        "analysis",
+        AnalysisRisk.__table__,
+        AnalysisRisk.__table__.c.id,
+        AnalysisRisk.__table__.c.analysis_id,
+    ),
+    (
+        "active",
+        "analysis_risk",
+        Active.__table__,
+        Active.__table__.c.id,
+        Active.__table__.c.analysis_risk_id,
+    ),
+    (
+        "threat",
+        "active",
+        Threat.__table__,
+        Threat.__table__.c.id,
+        Threat.__table__.c.active_id,
+    ),
+    (
+        "adverse_action",
+        "threat",
+        AdverseAction.__table__,
+        AdverseAction.__table__.c.id,
+        AdverseAction.__table__.c.threat_id,
+    ),
+)
+
+# Atributos que alteram a hierarquia. Colunas alteram o próprio objeto;
+# coleções alteram os objetos adicionados/removidos, exceto as de
+# `SELF_COLLECTIONS`, que alteram o próprio objeto.
+WATCHED_ATTRIBUTES = {
+    Organ: ("institutions",),
+    Institution: ("units", "organs"),
+    Unit: ("analyses",),
+    AnalysisRisk: ("analysis_id", "associated_actives"),
+    Active: ("analysis_risk_id", "associated_threats", "threats"),
+    Threat: ("active_id", "adverse_actions"),
+    AdverseAction: ("threat_id",),
+}
+SELF_COLLECTIONS = {(Institution, "organs")}
+
+
+def _group(nodes: Iterable[Node]) -> Dict[str, List[int]]:
+    grouped: Dict[str, List[int]] = {}
+    for _type, _id in nodes:
+        grouped.setdefault(_type, []).append(_id)
+    return grouped
+
+
+def _link_select(link: tuple):
+    """Consulta (filho, pai) de uma ligação, ignorando ligações órfãs"""
+    child_type, parent_type, table, child_col, parent_col = link
+    parent_table = TYPE_MODELS[parent_type].__table__
+    child_table = TYPE_MODELS[child_type].__table__
+
+    query = select(child_col, parent_col).select_from(
+        table.join(parent_table, parent_table.c.id == parent_col)
+    )
+    if table is not child_table:
+        query = query.join(child_table, child_table.c.id == child_col)
+    return query
+
+
+def _children(connection, nodes: Set[Node]) -> Set[Node]:
+    grouped = _group(nodes)
+    children: Set[Node] = set()
+    for link in LINKS:
+        child_type, parent_type, _, _, parent_col = link
+        for ids in chunks(grouped.get(parent_type, [])):
+            rows = connection.execute(
+                _link_select(link).where(parent_col.in_(ids))
+            )
+            children.update((child_type, child_id) for child_id, _ in rows)
+    return children
+
+
+def _parents(connection, nodes: Set[Node]) -> Dict[Node, Set[Node]]:
+    grouped = _group(nodes)
+    parents: Dict[Node, Set[Node]] = {}
+    for link in LINKS:
+        child_type, parent_type, _, child_col, _ = link
+        for ids in chunks(grouped.get(child_type, [])):
+            rows = connection.execute(
+                _link_select(link).where(child_col.in_(ids))
+            )
+            for child_id, parent_id in rows:
+                parents.setdefault((child_type, child_id), set()).add(
+                    (parent_type, parent_id)
+                )
+    return parents
+
+
+def _existing(connection, nodes: Set[Node]) -> Set[Node]:
+    existing: Set[Node] = set()
+    for _type, ids in _group(nodes).items():
+        table = TYPE_MODELS[_type].__table__
+        for chunk in chunks(ids):
+            rows = connection.execute(
+                select(table.c.id).where(table.c.id.in_(chunk))
+            )
+            existing.update((_type, _id) for (_id,) in rows)
+    return existing
+
+
+def _closure_rows(
+    nodes: Set[Node], parents: Dict[Node, Set[Node]]
+) -> List[Dict]:
+    """Calcula as linhas da tabela de fechamento (menor profundidade)"""
+    rows = []
+    for node in nodes:
+        depths = {node: 0}
+        level = [node]
+        depth = 0
+        while level:
+            depth += 1
+            next_level = []
+            for current in level:
+                for parent in parents.get(current, ()):
+                    if parent not in depths:
+                        depths[parent] = depth
+                        next_level.append(parent)
+            level = next_level
+
+        rows.extend(
+            {
+                "ancestor_type": ancestor[0],
+                "ancestor_id": ancestor[1],
+                "descendant_type": node[0],
+                "descendant_id": node[1],
+                "depth": _depth,
+            }
+            for ancestor, _depth in depths.items()
+        )
+    return rows
+
+
+def _insert_rows(connection, rows: List[Dict]) -> None:
+    table = HierarchyClosure.__table__
+    for chunk in chunks(rows):
+        connection.execute(insert(table), chunk)
+
+
+def rebuild_closure(connection, roots: Optional[Set[Node]] = None) -> int:
+    """Reconstrói a tabela de fechamento.
+
+    Args:
+        connection (Connection): Conexão com o banco de dados
+        roots (Optional[Set[Node]], optional): Objetos alterados. As linhas
+            desses objetos e de todos os seus descendentes são recalculadas.
+            Padrão é None (reconstrói a tabela inteira).
+
+    Returns:
+        int: Quantidade de linhas inseridas
+    """
+    table = HierarchyClosure.__table__
+
+    if roots is None:
+        connection.execute(delete(table))
+        nodes: Set[Node] = set()
+        for _type, model in TYPE_MODELS.items():
+            rows = connection.execute(select(model.__table__.c.id))
+            nodes.update((_type, _id) for (_id,) in rows)
+
+        parents: Dict[Node, Set[Node]] = {}
+        for link in LINKS:
+            child_type, parent_type = link[0], link[1]
+            for child_id, parent_id in connection.execute(_link_select(link)):
+                parents.setdefault((child_type, child_id), set()).add(
+                    (parent_type, parent_id)
+                )
+
+        rows = _closure_rows(nodes, parents)
+        _insert_rows(connection, rows)
+        return len(rows)
+
+    # Descendentes já registrados (inclusive de objetos removidos)
+    subtree = set(roots)
+    for chunk in chunks(list(roots)):
+        rows = connection.execute(
+            select(table.c.descendant_type, table.c.descendant_id).where(
+                tuple_(table.c.ancestor_type, table.c.ancestor_id).in_(chunk)
+            )
+        )
+        subtree.update((_type, _id) for _type, _id in rows)
+
+    # Descendentes a partir das ligações atuais
+    frontier = set(subtree)
+    while frontier:
+        frontier = _children(connection, frontier) - subtree
+        subtree |= frontier
+
+    for chunk in chunks(list(subtree)):
+        connection.execute(
+            delete(table).where(
+                tuple_(table.c.descendant_type, table.c.descendant_id).in_(
+                    chunk
+                )
+            )
+        )
+
+    nodes = _existing(connection, subtree)
+    parents = {}
+    frontier = set(nodes)
+    visited = set(nodes)
+    while frontier:
+        level_parents = _parents(connection, frontier)
+        parents.update(level_parents)
+        frontier = set(chain.from_iterable(level_parents.values())) - visited
+        visited |= frontier
+
+    rows = _closure_rows(nodes, parents)
+    _insert_rows(connection, rows)
+    return len(rows)
+
+
+def _changed_nodes(session) -> Set[Node]:
+    nodes: Set[Node] = set()
+
+    for obj in chain(session.new, session.deleted):
+        _type = MODEL_TYPES.get(type(obj))
+        if _type and obj.id is not None:
+            nodes.add((_type, obj.id))
+
+    for obj in session.dirty:
+        attributes = WATCHED_ATTRIBUTES.get(type(obj), ())
+        state = inspect(obj)
+        for attribute in attributes:
+            history = state.attrs[attribute].history
+            if not history.has_changes():
+                continue
+
+            if (
+                (type(obj), attribute) in SELF_COLLECTIONS
+                or attribute not in state.mapper.relationships
+            ):
+                nodes.add((MODEL_TYPES[type(obj)], obj.id))
+                continue
+
+            for item in chain(history.added or (), history.deleted or ()):
+                _type = MODEL_TYPES.get(type(item))
+                if _type and item.id is not None:
+                    nodes.add((_type, item.id))
+
+    return nodes
+
+
+def update_closure_on_flush(session, flush_context) -> None:
+    """Mantém a tabela de fechamento sincronizada com a hierarquia
+
+    Args:
+        session (Session): Sessão do flush
+        flush_context (FlushContext): Contexto de flush
+    """
+    nodes = _changed_nodes(session)
+    if nodes:
+        rebuild_closure(session.connection(), nodes)
+
+
+def get_ancestor(
+    model: type, descendant_type: str, descendant_id: int, depth: int = 1
+):
+    """Obtém o ancestral de um objeto a uma determinada profundidade
+
+    Args:
+        model (type): Model do ancestral (ex: `Organ`)
+        descendant_type (str): Tipo do descendente (ex: `"institution"`)
+        descendant_id (int): ID do descendente
+        depth (int, optional): Profundidade. Padrão é 1 (pai direto).
+
+    Returns:
+        db.Model | None: O ancestral, caso exista
+    """
+    return (
+        model.query.join(
+            HierarchyClosure,
+            and_(
+                HierarchyClosure.ancestor_type == MODEL_TYPES[model],
+                HierarchyClosure.ancestor_id == model.id,
+            ),
+        )
+        .filter(
+            HierarchyClosure.descendant_type == descendant_type,
+            HierarchyClosure.descendant_id == descendant_id,
+            HierarchyClosure.depth == depth,
+        )
+        .order_by(model.id)
+        .first()
+    )
+
+
+event.listen(db.session, "after_flush", update_closure_on_flush)
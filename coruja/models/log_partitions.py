@@ -0,0 +1,440 @@
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+from flask import current_app
+from sqlalchemy import (
+    Column,
+    Index,
+    MetaData,
+    Table,
+    delete,
+    func,
+    insert,
+    inspect,
+    select,
+    text,
+    union_all,
+)
+from sqlalchemy.sql import Select
+
+from .configurations import AccessLog
+from .users import User
+
+# Partições mensais de `access_log`: tabelas `access_log_pAAAAMM` no SQLite
+# ou partições `pAAAAMM` (RANGE sobre TO_DAYS(access_at)) no MySQL
+PARTITION_PREFIX = "access_log_p"
+PARTITION_TABLE = re.compile(rf"{PARTITION_PREFIX}(\d{{4}})(\d{{2}})$")
+NATIVE_PARTITION = re.compile(r"p(\d{4})(\d{2})$")
+
+# Tabelas mensais do SQLite, fora do metadata dos models (e das migrações)
+partition_metadata = MetaData()
+
+# Estratégia de particionamento de cada engine
+_strategies: "WeakKeyDictionary" = WeakKeyDictionary()
+
+
+def month_of(value: datetime) -> date:
+    """Primeiro dia do mês de uma data"""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    """Soma (ou subtrai) meses ao primeiro dia de um mês"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month: date) -> Tuple[datetime, datetime]:
+    """Início (inclusivo) e fim (exclusivo) de um mês"""
+    start = datetime(month.year, month.month, 1)
+    end = add_months(month, 1)
+    return start, datetime(end.year, end.month, 1)
+
+
+def partition_table(month: date) -> Table:
+    """Tabela mensal (SQLite) de um mês
+
+    Possui as mesmas colunas de `access_log` e os índices utilizados pela
+    listagem e pelo filtro por usuário. A chave estrangeira para `user` não
+    é declarada, pois o metadata das partições não contém a tabela `user`.
+
+    Args:
+        month (date): Primeiro dia do mês
+
+    Returns:
+        Table: Tabela da partição
+    """
+    name = f"{PARTITION_PREFIX}{month:%Y%m}"
+    if name in partition_metadata.tables:
+        return partition_metadata.tables[name]
+
+    columns = [
+        Column(
+            column.name,
+            column.type,
+            primary_key=column.primary_key,
+            nullable=column.nullable,
+        )
+        for column in AccessLog.__table__.columns
+    ]
+    return Table(
+        name,
+        partition_metadata,
+        *columns,
+        Index(f"ix_{name}_access_at_id", "access_at", "id"),
+        Index(f"ix_{name}_user_access_at", "user_id", "access_at"),
+    )
+
+
+def get_strategy(connection) -> Optional[str]:
+    """Obtém a estratégia de particionamento dos logs de acesso
+
+    Args:
+        connection (Connection): Conexão com o banco de dados
+
+    Returns:
+        Optional[str]: "tables" (SQLite, com `ACCESS_LOG_PARTITIONING`),
+            "native" (MySQL, se `access_log` foi particionada pela migração)
+            ou None (tabela única)
+    """
+    engine = connection.engine
+    if engine not in _strategies:
+        strategy = None
+        dialect = connection.dialect.name
+        if dialect == "sqlite":
+            if current_app.config.get("ACCESS_LOG_PARTITIONING", False):
+                strategy = "tables"
+        elif dialect in ("mysql", "mariadb"):
+            if _native_partitions(connection):
+                strategy = "native"
+        _strategies[engine] = strategy
+    return _strategies[engine]
+
+
+def _native_partitions(connection) -> Dict[date, str]:
+    rows = connection.execute(
+        text(
+            "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table "
+            "AND PARTITION_NAME IS NOT NULL"
+        ),
+        {"table": AccessLog.__tablename__},
+    )
+    partitions = {}
+    for (name,) in rows:
+        match = NATIVE_PARTITION.match(name)
+        if match:
+            year, month = map(int, match.groups())
+            partitions[date(year, month, 1)] = name
+    return partitions
+
+
+def list_partitions(connection) -> List[date]:
+    """Meses com partição, em ordem crescente
+
+    Args:
+        connection (Connection): Conexão com o banco de dados
+
+    Returns:
+        List[date]: Primeiro dia de cada mês
+    """
+    strategy = get_strategy(connection)
+    if strategy == "native":
+        return sorted(_native_partitions(connection))
+    if strategy != "tables":
+        return []
+
+    months = []
+    for name in inspect(connection).get_table_names():
+        match = PARTITION_TABLE.match(name)
+        if match:
+            year, month = map(int, match.groups())
+            months.append(date(year, month, 1))
+    return sorted(months)
+
+
+def ensure_partitions(connection, months: List[date]) -> None:
+    """Cria as partições dos meses que ainda não existem
+
+    No MySQL somente meses posteriores à última partição podem ser criados;
+    os demais permanecem na partição `pmax`.
+
+    Args:
+        connection (Connection): Conexão com o banco de dados
+        months (List[date]): Primeiro dia de cada mês
+    """
+    strategy = get_strategy(connection)
+    if strategy == "tables":
+        for month in months:
+            partition_table(month).create(connection, checkfirst=True)
+        return
+
+    if strategy != "native":
+        return
+
+    existing = _native_partitions(connection)
+    last = max(existing, default=date.min)
+    for month in sorted(set(months)):
+        if month <= last:
+            continue
+        _, end = month_bounds(month)
+        connection.execute(
+            text(
+                f"ALTER TABLE {AccessLog.__tablename__} "
+                "REORGANIZE PARTITION pmax INTO ("
+                f"PARTITION p{month:%Y%m} "
+                f"VALUES LESS THAN (TO_DAYS('{end:%Y-%m-%d}')), "
+                "PARTITION pmax VALUES LESS THAN MAXVALUE)"
+            )
+        )
+        last = month
+
+
+def insert_access_logs(connection, rows: List[Dict]) -> None:
+    """Grava logs de acesso na partição do mês de cada um
+
+    Args:
+        connection (Connection): Conexão com o banco de dados
+        rows (List[Dict]): Logs com as colunas de `access_log`
+    """
+    if get_strategy(connection) != "tables":
+        connection.execute(insert(AccessLog.__table__), rows)
+        return
+
+    by_month: Dict[date, List[Dict]] = {}
+    for row in rows:
+        by_month.setdefault(month_of(row["access_at"]), []).append(row)
+
+    ensure_partitions(connection, list(by_month))
+    for month, month_rows in by_month.items():
+        connection.execute(insert(partition_table(month)), month_rows)
+
+
+def _legacy_months(connection) -> List[date]:
+    table = AccessLog.__table__
+    oldest, newest = connection.execute(
+        select(func.min(table.c.access_at), func.max(table.c.access_at))
+    ).one()
+    months = []
+    month = month_of(oldest) if oldest else None
+    while month and month <= month_of(newest):
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def _monthly_sources(
+    connection, start: Optional[datetime], end: Optional[datetime]
+) -> List:
+    """Fontes dos logs de cada mês do período, em ordem crescente
+
+    Logs gravados antes do particionamento e ainda não movidos para as
+    partições (`move_legacy_rows`) são unidos aos logs da partição do seu
+    mês, de forma que cada fonte continue contendo somente um mês.
+    """
+    first = month_of(start) if start else date.min
+    # `end` é exclusivo
+    last = month_of(end - timedelta(microseconds=1)) if end else date.max
+    partitions = set(list_partitions(connection))
+    legacy = set(_legacy_months(connection))
+
+    table = AccessLog.__table__
+    sources = []
+    for month in sorted(partitions | legacy):
+        if not first <= month <= last:
+            continue
+        if month not in legacy:
+            sources.append(partition_table(month))
+            continue
+
+        month_start, month_end = month_bounds(month)
+        selects = [
+            select(*table.columns).where(
+                table.c.access_at >= month_start,
+                table.c.access_at < month_end,
+            )
+        ]
+        if month in partitions:
+            selects.append(select(*partition_table(month).columns))
+        sources.append(
+            union_all(*selects).subquery(f"access_log_{month:%Y%m}")
+        )
+    return sources
+
+
+def access_log_statements(
+    connection,
+    user_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    descending: bool = False,
+) -> List[Select]:
+    """Consultas dos logs de acesso, uma por partição relevante
+
+    Somente as partições que intersectam o período são consultadas. Cada
+    consulta seleciona as colunas do log e o nome e o CPF do usuário e é
+    ordenada por `(access_at, id)`; as consultas são retornadas na mesma
+    ordem, de forma que a concatenação dos resultados também esteja
+    ordenada. No MySQL a poda de partições é feita pelo próprio banco a
+    partir do filtro em `access_at`.
+
+    Args:
+        connection (Connection): Conexão com o banco de dados
+        user_id (Optional[int], optional): Filtra pelo usuário. Padrão é None.
+        start (Optional[datetime], optional): Início (inclusivo) do período.
+            Padrão é None.
+        end (Optional[datetime], optional): Fim (exclusivo) do período.
+            Padrão é None.
+        descending (bool, optional): Se True, ordem decrescente. Padrão é
+            False.
+
+    Returns:
+        List[Select]: Consultas, na ordem da listagem
+    """
+    sources = [AccessLog.__table__]
+    if get_strategy(connection) == "tables":
+        sources = _monthly_sources(connection, start, end)
+
+    statements = []
+    for table in sources:
+        statement = select(
+            table.c.id,
+            table.c.ip,
+            table.c.user_agent,
+            table.c.access_at,
+            table.c.endpoint,
+            table.c.user_id,
+            User.name.label("user_name"),
+            User.cpf.label("user_cpf"),
+        ).outerjoin(User, User.id == table.c.user_id)
+
+        if user_id:
+            statement = statement.where(table.c.user_id == user_id)
+        if start:
+            statement = statement.where(table.c.access_at >= start)
+        if end:
+            statement = statement.where(table.c.access_at < end)
+
+        order = (table.c.access_at, table.c.id)
+        if descending:
+            order = tuple(column.desc() for column in order)
+        statements.append(statement.order_by(*order))
+
+    if descending:
+        statements.reverse()
+    return statements
+
+
+def move_legacy_rows(connection) -> int:
+    """Move os logs da tabela `access_log` para as partições mensais (SQLite)
+
+    Args:
+        connection (Connection): Conexão com o banco de dados
+
+    Returns:
+        int: Quantidade de logs movidos
+    """
+    if get_strategy(connection) != "tables":
+        return 0
+
+    table = AccessLog.__table__
+    moved = 0
+    for month in _legacy_months(connection):
+        start, end = month_bounds(month)
+        partition = partition_table(month)
+        in_month = (table.c.access_at >= start) & (table.c.access_at < end)
+        partition.create(connection, checkfirst=True)
+        # As partições numeram seus logs a partir de 1; os IDs antigos são
+        # descartados
+        columns = [column for column in table.columns if column.name != "id"]
+        result = connection.execute(
+            insert(partition).from_select(
+                [column.name for column in columns],
+                select(*columns)
+                .where(in_month)
+                .order_by(table.c.access_at, table.c.id),
+            )
+        )
+        moved += result.rowcount
+        connection.execute(delete(table).where(in_month))
+
+    # Logs sem data não pertencem a nenhuma partição
+    connection.execute(delete(table).where(table.c.access_at.is_(None)))
+    return moved
+
+
+def expired_partitions(
+    connection, retention_months: int, today: Optional[date] = None
+) -> List[date]:
+    """Meses cujas partições estão fora do período de retenção
+
+    Args:
+        connection (Connection): Conexão com o banco de dados
+        retention_months (int): Quantidade de meses mantidos, incluindo o
+            atual. 0 mantém todos.
+        today (Optional[date], optional): Data de referência. Padrão é None
+            (hoje).
+
+    Returns:
+        List[date]: Primeiro dia de cada mês expirado
+    """
+    if retention_months <= 0:
+        return []
+
+    cutoff = add_months(month_of(today or date.today()), -retention_months + 1)
+    if get_strategy(connection) is None:
+        # Tabela única: o mês mais antigo até o limite
+        table = AccessLog.__table__
+        oldest = connection.execute(
+            select(table.c.access_at)
+            .where(table.c.access_at.is_not(None))
+            .order_by(table.c.access_at)
+            .limit(1)
+        ).scalar()
+        months = []
+        month = month_of(oldest) if oldest else cutoff
+        while month < cutoff:
+            months.append(month)
+            month = add_months(month, 1)
+        return months
+
+    return [month for month in list_partitions(connection) if month < cutoff]
+
+
+def drop_partition(connection, month: date) -> None:
+    """Remove todos os logs de um mês
+
+    No SQLite a tabela do mês é descartada (DROP TABLE), no MySQL a
+    partição (DROP PARTITION); nos demais bancos os logs são removidos com
+    um DELETE pelo índice de `access_at`.
+
+    Args:
+        connection (Connection): Conexão com o banco de dados
+        month (date): Primeiro dia do mês
+    """
+    strategy = get_strategy(connection)
+    start, end = month_bounds(month)
+    table = AccessLog.__table__
+
+    if strategy == "native":
+        name = _native_partitions(connection).get(month)
+        if name:
+            connection.execute(
+                text(
+                    f"ALTER TABLE {AccessLog.__tablename__} "
+                    f"DROP PARTITION {name}"
+                )
+            )
+        return
+
+    if strategy == "tables":
+        partition_table(month).drop(connection, checkfirst=True)
+        partition_metadata.remove(partition_table(month))
+
+    connection.execute(
+        delete(table).where(
+            (table.c.access_at >= start) & (table.c.access_at < end)
+        )
+    )
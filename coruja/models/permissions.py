@@ -11,6 +11,15 @@ class Permission(BaseTable):
     object_type = db.Column(db.String(255), nullable=False)
     object_id = db.Column(db.Integer)
 
+    __table_args__ = (
+        db.Index(
+            "ix_permission_type_object",
+            "type",
+            "object_type",
+            "object_id",
+        ),
+    )
+
     def __init__(
         self,
         *,
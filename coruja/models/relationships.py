@@ -55,6 +55,12 @@ institution_administrators = db.Table(
     "institution_administrators",
     db.Column("institution_id", db.Integer, db.ForeignKey("institution.id")),
     db.Column("user_id", db.Integer, db.ForeignKey("user.id")),
+    db.Index(
+        "uq_institution_administrators",
+        "institution_id",
+        "user_id",
+        unique=True,
+    ),
 )
 
 institution_units = db.Table(
@@ -78,18 +84,21 @@ units_administrators = db.Table(
     "units_administrators",
     db.Column("unit_id", db.Integer, db.ForeignKey("unit.id")),
     db.Column("user_id", db.Integer, db.ForeignKey("user.id")),
+    db.Index("uq_units_administrators", "unit_id", "user_id", unique=True),
 )
 
 units_staff = db.Table(
     "units_staff",
     db.Column("unit_id", db.Integer, db.ForeignKey("unit.id")),
     db.Column("user_id", db.Integer, db.ForeignKey("user.id")),
+    db.Index("uq_units_staff", "unit_id", "user_id", unique=True),
 )
 
 unit_analysis = db.Table(
     "unit_analysis",
     db.Column("unit_id", db.Integer, db.ForeignKey("unit.id")),
     db.Column("analysis_id", db.Integer, db.ForeignKey("analysis.id")),
+    db.Index("uq_unit_analysis", "unit_id", "analysis_id", unique=True),
 )
 
 # Relacionamento de Análises
@@ -97,12 +106,16 @@ analytics_administrators = db.Table(
     "analytics_administrators",
     db.Column("analysis_id", db.Integer, db.ForeignKey("analysis.id")),
     db.Column("user_id", db.Integer, db.ForeignKey("user.id")),
+    db.Index(
+        "uq_analytics_administrators", "analysis_id", "user_id", unique=True
+    ),
 )
 
 analytics_experts = db.Table(
     "analytics_experts",
     db.Column("analysis_id", db.Integer, db.ForeignKey("analysis.id")),
     db.Column("user_id", db.Integer, db.ForeignKey("user.id")),
+    db.Index("uq_analytics_experts", "analysis_id", "user_id", unique=True),
 )
 
 vulnerability_categories = db.Table(
@@ -117,4 +130,10 @@ vulnerability_categories = db.Table(
         db.Integer,
         db.ForeignKey("vulnerability_category.id"),
     ),
+    db.Index(
+        "uq_vulnerability_categories",
+        "analysis_vulnerability_id",
+        "vulnerability_category_id",
+        unique=True,
+    ),
 )
@@ -0,0 +1,378 @@
+import os
+from collections import OrderedDict
+from itertools import chain
+from threading import RLock
+from time import monotonic, time_ns
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from cachelib import BaseCache, FileSystemCache
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select, tuple_
+
+from ..extensions.database import chunks, db
+from .actives import Active, ActiveScore
+from .analysis import Analysis, AnalysisRisk, AnalysisVulnerability
+from .dangers import (
+    AdverseAction,
+    AdverseActionScore,
+    Threat,
+    Vulnerability,
+    VulnerabilityCategory,
+    VulnerabilityCategoryOverride,
+    VulnerabilityScore,
+    VulnerabilitySubCategory,
+)
+from .hierarchy import HierarchyClosure
+from .relationships import analytics_experts
+from .users import User
+
+# Prefixo das chaves do cache de relatórios
+KEY_PREFIX = "analysis-report"
+
+# Chave de `Session.info` com as análises alteradas e ainda não confirmadas.
+# None representa o catálogo compartilhado (todas as análises).
+PENDING_KEY = "analysis_report_pending"
+
+# Colunas de `User` exibidas no relatório
+EXPERT_COLUMNS = ("name", "cpf")
+
+
+class LRUCache(BaseCache):
+    """Cache em memória do processo, limitado aos `max_size` itens usados
+    mais recentemente
+
+    Os valores são guardados por referência (sem serialização) e não devem
+    ser alterados por quem os obtém.
+    """
+
+    def __init__(self, max_size: int = 256, default_timeout: int = 0):
+        super().__init__(default_timeout)
+        self.max_size = max_size
+        self._items: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = RLock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires and expires <= monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(
+        self, key: str, value: Any, timeout: Optional[int] = None
+    ) -> Optional[bool]:
+        timeout = self._normalize_timeout(timeout)
+        expires = monotonic() + timeout if timeout else 0
+        with self._lock:
+            self._items[key] = (expires, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+        return True
+
+    def add(self, key: str, value: Any, timeout: Optional[int] = None) -> bool:
+        with self._lock:
+            if self.has(key):
+                return False
+            return bool(self.set(key, value, timeout))
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._items.pop(key, None) is not None
+
+    def has(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def clear(self) -> bool:
+        with self._lock:
+            self._items.clear()
+        return True
+
+
+def create_report_cache(config: Dict[str, Any]) -> Optional[BaseCache]:
+    """Cria o cache de relatórios configurado em `ANALYSIS_REPORT_CACHE`
+
+    Args:
+        config (Dict[str, Any]): Configuração da aplicação
+
+    Returns:
+        Optional[BaseCache]: `LRUCache` ("lru"), `FileSystemCache`
+            ("filesystem") ou None (cache desativado)
+    """
+    backend = config.get("ANALYSIS_REPORT_CACHE", "lru")
+    size = config.get("ANALYSIS_REPORT_CACHE_SIZE", 256)
+    timeout = config.get("ANALYSIS_REPORT_CACHE_TIMEOUT", 0)
+
+    if backend == "lru":
+        return LRUCache(max_size=size, default_timeout=timeout)
+    if backend == "filesystem":
+        cache_dir = config.get("ANALYSIS_REPORT_CACHE_DIR") or os.path.join(
+            current_app.instance_path, "analysis_reports"
+        )
+        return FileSystemCache(
+            cache_dir, threshold=size, default_timeout=timeout
+        )
+    return None
+
+
+def get_report_cache() -> Optional[BaseCache]:
+    """Obtém o cache de relatórios da aplicação atual"""
+    extensions = current_app.extensions
+    if "analysis_report_cache" not in extensions:
+        extensions["analysis_report_cache"] = create_report_cache(
+            current_app.config
+        )
+    return extensions["analysis_report_cache"]
+
+
+def _version_key(analysis_id: Optional[int]) -> str:
+    if analysis_id is None:
+        return f"{KEY_PREFIX}:version"
+    return f"{KEY_PREFIX}:{analysis_id}:version"
+
+
+def _get_version(cache: BaseCache, analysis_id: Optional[int]) -> int:
+    # Versões são geradas a partir do relógio (e não de um contador), de
+    # forma que uma versão descartada pelo cache nunca volte a ser usada
+    key = _version_key(analysis_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time_ns(), timeout=0)
+        version = cache.get(key)
+    return version
+
+
+def get_report_version(analysis_id: int) -> Optional[str]:
+    """Obtém a versão atual dos dados de uma análise
+
+    A versão muda sempre que uma transação altera dados do relatório da
+    análise ou do catálogo compartilhado, e pode ser usada para validar
+    outras respostas derivadas desses dados (ex: ETag).
+
+    Args:
+        analysis_id (int): ID da análise
+
+    Returns:
+        Optional[str]: Versão ou None, caso o cache esteja desativado
+    """
+    cache = get_report_cache()
+    if cache is None:
+        return None
+    return "{}.{}".format(
+        _get_version(cache, analysis_id), _get_version(cache, None)
+    )
+
+
+def cached_report(
+    analysis_id: int, user_id: int, build: Callable[[], Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Obtém o relatório de uma análise do cache ou o calcula com `build`
+
+    A chave inclui a versão da análise e a do catálogo compartilhado, que
+    mudam sempre que uma transação altera dados do relatório; relatórios
+    desatualizados, portanto, nunca são encontrados e deixam o cache com o
+    tempo. O relatório também é separado por usuário, pois contém as
+    pontuações de quem o visualiza.
+
+    Args:
+        analysis_id (int): ID da análise
+        user_id (int): ID do usuário que visualiza o relatório
+        build (Callable[[], Dict[str, Any]]): Calcula o relatório
+
+    Returns:
+        Dict[str, Any]: Relatório
+    """
+    cache = get_report_cache()
+    if cache is None:
+        return build()
+
+    key = ":".join(
+        str(part)
+        for part in (
+            KEY_PREFIX,
+            analysis_id,
+            get_report_version(analysis_id),
+            user_id,
+        )
+    )
+    report = cache.get(key)
+    if report is None:
+        report = build()
+        cache.set(key, report)
+    return report
+
+
+def mark_reports_stale(session, analysis_ids: Iterable[Optional[int]]) -> None:
+    """Agenda a invalidação dos relatórios das análises para quando a
+    transação da sessão for confirmada
+
+    Args:
+        session (Session): Sessão da transação
+        analysis_ids (Iterable[Optional[int]]): IDs das análises; None
+            invalida os relatórios de todas as análises
+    """
+    session.info.setdefault(PENDING_KEY, set()).update(analysis_ids)
+
+
+def _select_in(connection, statement, column, values: Set) -> List:
+    rows = []
+    values.discard(None)
+    for chunk in chunks(list(values)):
+        rows.extend(connection.execute(statement.where(column.in_(chunk))))
+    return rows
+
+
+def _stale_analyses(session) -> Set[Optional[int]]:
+    """Obtém as análises cujos relatórios são afetados pelo flush"""
+    analyses: Set[Optional[int]] = set()
+    nodes: Set[Tuple[str, int]] = set()
+    analysis_vulnerabilities: Set[int] = set()
+    categories: Set[int] = set()
+    subcategories: Set[int] = set()
+    experts: Set[int] = set()
+
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if getattr(obj, "is_template", False):
+            continue
+
+        if isinstance(obj, Analysis):
+            analyses.add(obj.id)
+        elif isinstance(obj, (AnalysisRisk, AnalysisVulnerability)):
+            if obj.analysis_id is not None:
+                analyses.add(obj.analysis_id)
+        elif isinstance(obj, Active):
+            nodes.add(("analysis_risk", obj.analysis_risk_id))
+        elif isinstance(obj, (ActiveScore, Threat)):
+            nodes.add(("active", obj.active_id))
+        elif isinstance(obj, AdverseAction):
+            nodes.add(("threat", obj.threat_id))
+        elif isinstance(obj, AdverseActionScore):
+            nodes.add(("adverse_action", obj.adverse_action_id))
+        elif isinstance(
+            obj, (VulnerabilityScore, VulnerabilityCategoryOverride)
+        ):
+            analysis_vulnerabilities.add(obj.analysis_vulnerability_id)
+        elif isinstance(obj, VulnerabilityCategory):
+            analysis_vulnerabilities.add(obj.analysis_vulnerability_id)
+            if obj.snapshot_id is not None:
+                # Catálogo compartilhado entre análises
+                analyses.add(None)
+        elif isinstance(obj, VulnerabilitySubCategory):
+            categories.add(obj.category_id)
+        elif isinstance(obj, Vulnerability):
+            subcategories.add(obj.sub_category_id)
+        elif isinstance(obj, User) and obj in session.dirty:
+            state = inspect(obj)
+            if any(
+                state.attrs[column].history.has_changes()
+                for column in EXPERT_COLUMNS
+            ):
+                experts.add(obj.id)
+
+    if not (
+        analyses
+        or nodes
+        or analysis_vulnerabilities
+        or categories
+        or subcategories
+        or experts
+    ):
+        return set()
+
+    # Os objetos são relacionados às análises pelas chaves estrangeiras já
+    # carregadas, pois os removidos no flush não existem mais no banco
+    connection = session.connection()
+    subcategory = VulnerabilitySubCategory.__table__
+    category = VulnerabilityCategory.__table__
+
+    for (category_id,) in _select_in(
+        connection,
+        select(subcategory.c.category_id),
+        subcategory.c.id,
+        subcategories,
+    ):
+        categories.add(category_id)
+    for analysis_vulnerability_id, snapshot_id in _select_in(
+        connection,
+        select(category.c.analysis_vulnerability_id, category.c.snapshot_id),
+        category.c.id,
+        categories,
+    ):
+        analysis_vulnerabilities.add(analysis_vulnerability_id)
+        if snapshot_id is not None:
+            # Catálogo compartilhado entre análises
+            analyses.add(None)
+
+    table = AnalysisVulnerability.__table__
+    for (analysis_id,) in _select_in(
+        connection,
+        select(table.c.analysis_id),
+        table.c.id,
+        analysis_vulnerabilities,
+    ):
+        analyses.add(analysis_id)
+
+    closure = HierarchyClosure.__table__
+    nodes = {node for node in nodes if node[1] is not None}
+    for chunk in chunks(list(nodes)):
+        analyses.update(
+            connection.execute(
+                select(closure.c.ancestor_id).where(
+                    closure.c.ancestor_type == "analysis",
+                    tuple_(
+                        closure.c.descendant_type, closure.c.descendant_id
+                    ).in_(chunk),
+                )
+            ).scalars()
+        )
+
+    for (analysis_id,) in _select_in(
+        connection,
+        select(analytics_experts.c.analysis_id),
+        analytics_experts.c.user_id,
+        experts,
+    ):
+        analyses.add(analysis_id)
+
+    return analyses
+
+
+def invalidate_reports_on_flush(session, flush_context) -> None:
+    """Registra as análises cujos relatórios foram alterados pelo flush
+
+    Pontuações gravadas diretamente com comandos SQL (`upsert_scores`) não
+    passam pelo flush e são registradas com `mark_reports_stale`.
+
+    Args:
+        session (Session): Sessão do flush
+        flush_context (FlushContext): Contexto de flush
+    """
+    analyses = _stale_analyses(session)
+    if analyses:
+        mark_reports_stale(session, analyses)
+
+
+def bump_reports_on_commit(session) -> None:
+    pending = session.info.pop(PENDING_KEY, None)
+    if not pending or not has_app_context():
+        return
+
+    cache = get_report_cache()
+    if cache is None:
+        return
+    for analysis_id in pending:
+        cache.set(_version_key(analysis_id), time_ns(), timeout=0)
+
+
+def discard_reports_on_rollback(session) -> None:
+    session.info.pop(PENDING_KEY, None)
+
+
+event.listen(db.session, "after_flush", invalidate_reports_on_flush)
+event.listen(db.session, "after_commit", bump_reports_on_commit)
+event.listen(db.session, "after_rollback", discard_reports_on_rollback)
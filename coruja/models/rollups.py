@@ -0,0 +1,437 @@
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import (
+    and_,
+    bindparam,
+    delete,
+    func,
+    insert,
+    literal,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from ..extensions.database import chunks, db
+from .actives import ActiveScore
+from .dangers import (
+    AdverseActionScore,
+    Vulnerability,
+    VulnerabilityScore,
+    VulnerabilitySubCategory,
+)
+
+# (object_type, object_id, scope_id, field)
+RollupKey = Tuple[str, int, int, str]
+
+# Contadores mantidos para cada chave: quantidade, soma e soma dos quadrados
+COUNTERS = ("count", "total", "total_squares")
+
+
+class ScoreRollup(db.Model):
+    """Totais pré-agregados das pontuações
+
+    Cada linha guarda a quantidade, a soma e a soma dos quadrados de uma
+    coluna de pontuação (`field`) de um objeto pontuável (ativo, ação
+    adversa ou vulnerabilidade) ou de um agrupamento de vulnerabilidades
+    (subcategoria e categoria). As linhas de vulnerabilidades são separadas
+    por análise de vulnerabilidade (`scope_id`); nas demais `scope_id=0`.
+
+    Os totais são atualizados na mesma transação que grava as pontuações
+    (`apply_deltas`) e podem ser reconstruídos com `rebuild_rollups`.
+    """
+
+    __tablename__ = "score_rollup"
+
+    object_type = db.Column(db.String(32), primary_key=True)
+    object_id = db.Column(db.Integer, primary_key=True)
+    scope_id = db.Column(db.Integer, primary_key=True, default=0)
+    field = db.Column(db.String(32), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    total_squares = db.Column(db.Integer, nullable=False, default=0)
+
+
+# object_type: (tabela, coluna do objeto, coluna do escopo, colunas)
+SOURCES = {
+    "active": (
+        ActiveScore.__table__,
+        ActiveScore.__table__.c.active_id,
+        None,
+        ("substitutability", "replacement_cost", "essentiality"),
+    ),
+    "adverse_action": (
+        AdverseActionScore.__table__,
+        AdverseActionScore.__table__.c.adverse_action_id,
+        None,
+        ("motivation", "capacity", "accessibility"),
+    ),
+    "vulnerability": (
+        VulnerabilityScore.__table__,
+        VulnerabilityScore.__table__.c.vulnerability_id,
+        VulnerabilityScore.__table__.c.analysis_vulnerability_id,
+        ("score",),
+    ),
+}
+
+# Agrupamentos das vulnerabilidades: (object_type, coluna do agrupamento)
+VULNERABILITY_GROUPS = (
+    ("vulnerability_subcategory", Vulnerability.__table__.c.sub_category_id),
+    (
+        "vulnerability_category",
+        VulnerabilitySubCategory.__table__.c.category_id,
+    ),
+)
+
+
+def score_deltas(
+    object_type: str,
+    object_id: int,
+    old: Optional[Dict[str, int]],
+    new: Dict[str, int],
+    scope_id: int = 0,
+) -> Dict[RollupKey, List[int]]:
+    """Calcula a variação dos totais causada pela gravação de uma pontuação
+
+    Args:
+        object_type (str): Tipo do objeto (ex: `"active"`)
+        object_id (int): ID do objeto
+        old (Optional[Dict[str, int]]): Valores anteriores da pontuação ou
+            None caso ela tenha sido criada
+        new (Dict[str, int]): Valores gravados
+        scope_id (int, optional): ID da análise de vulnerabilidade. Padrão
+            é 0 (sem escopo).
+
+    Returns:
+        Dict[RollupKey, List[int]]: Variação de cada contador (`COUNTERS`)
+    """
+    deltas = {}
+    for field, value in new.items():
+        before = (old or {}).get(field, 0)
+        deltas[(object_type, object_id, scope_id, field)] = [
+            0 if old else 1,
+            value - before,
+            value * value - before * before,
+        ]
+    return deltas
+
+
+def merge_deltas(
+    deltas: Dict[RollupKey, List[int]], other: Dict[RollupKey, List[int]]
+) -> Dict[RollupKey, List[int]]:
+    for key, values in other.items():
+        current = deltas.setdefault(key, [0, 0, 0])
+        for i, value in enumerate(values):
+            current[i] += value
+    return deltas
+
+
+def _with_groups(
+    connection, deltas: Dict[RollupKey, List[int]]
+) -> Dict[RollupKey, List[int]]:
+    """Propaga a variação das vulnerabilidades para as suas subcategorias e
+    categorias"""
+    vulnerability_ids = list(
+        {key[1] for key in deltas if key[0] == "vulnerability"}
+    )
+    if not vulnerability_ids:
+        return deltas
+
+    vulnerability = Vulnerability.__table__
+    subcategory = VulnerabilitySubCategory.__table__
+    groups: Dict[int, Tuple[int, int]] = {}
+    for chunk in chunks(vulnerability_ids):
+        rows = connection.execute(
+            select(
+                vulnerability.c.id,
+                vulnerability.c.sub_category_id,
+                subcategory.c.category_id,
+            )
+            .select_from(vulnerability)
+            .join(
+                subcategory,
+                subcategory.c.id == vulnerability.c.sub_category_id,
+            )
+            .where(vulnerability.c.id.in_(chunk))
+        )
+        for vulnerability_id, subcategory_id, category_id in rows:
+            groups[vulnerability_id] = (subcategory_id, category_id)
+
+    result = dict(deltas)
+    for (object_type, object_id, scope_id, field), values in deltas.items():
+        if object_type != "vulnerability" or object_id not in groups:
+            continue
+
+        for (group_type, _), group_id in zip(
+            VULNERABILITY_GROUPS, groups[object_id]
+        ):
+            merge_deltas(
+                result, {(group_type, group_id, scope_id, field): values}
+            )
+    return result
+
+
+def _increment_statement(connection):
+    """Obtém um INSERT que soma os contadores quando a linha já existe
+
+    Returns:
+        Insert | None: O comando ou None caso o banco não suporte
+    """
+    table = ScoreRollup.__table__
+    dialect = connection.dialect.name
+
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            statement = sqlite_insert(table)
+        else:
+            statement = postgresql_insert(table)
+        return statement.on_conflict_do_update(
+            index_elements=[column.name for column in table.primary_key],
+            set_={
+                counter: table.c[counter] + statement.excluded[counter]
+                for counter in COUNTERS
+            },
+        )
+
+    if dialect in ("mysql", "mariadb"):
+        statement = mysql_insert(table)
+        return statement.on_duplicate_key_update(
+            {
+                counter: table.c[counter] + statement.inserted[counter]
+                for counter in COUNTERS
+            }
+        )
+
+    return None
+
+
+def apply_deltas(connection, deltas: Dict[RollupKey, List[int]]) -> None:
+    """Soma as variações aos totais pré-agregados, inclusive das
+    subcategorias e categorias das vulnerabilidades alteradas
+
+    Args:
+        connection (Connection): Conexão (da transação das pontuações)
+        deltas (Dict[RollupKey, List[int]]): Variação de cada contador
+    """
+    deltas = {
+        key: values
+        for key, values in _with_groups(connection, deltas).items()
+        if any(values)
+    }
+    if not deltas:
+        return
+
+    rows = [
+        {
+            "object_type": object_type,
+            "object_id": object_id,
+            "scope_id": scope_id,
+            "field": field,
+            **dict(zip(COUNTERS, values)),
+        }
+        for (object_type, object_id, scope_id, field), values in deltas.items()
+    ]
+
+    statement = _increment_statement(connection)
+    if statement is not None:
+        connection.execute(statement, rows)
+        return
+
+    table = ScoreRollup.__table__
+    key_columns = [column.name for column in table.primary_key]
+    existing = set()
+    for chunk in chunks(list(deltas)):
+        existing.update(
+            connection.execute(
+                select(*table.primary_key).where(
+                    tuple_(*table.primary_key).in_(chunk)
+                )
+            ).all()
+        )
+
+    inserts = [
+        row
+        for row in rows
+        if tuple(row[c] for c in key_columns) not in existing
+    ]
+    updates = [
+        row for row in rows if tuple(row[c] for c in key_columns) in existing
+    ]
+    if inserts:
+        connection.execute(insert(table), inserts)
+    if updates:
+        connection.execute(
+            update(table)
+            .where(
+                *(
+                    table.c[column] == bindparam(f"_{column}")
+                    for column in key_columns
+                )
+            )
+            .values(
+                **{
+                    counter: table.c[counter] + bindparam(f"_{counter}")
+                    for counter in COUNTERS
+                }
+            ),
+            [
+                {f"_{column}": value for column, value in row.items()}
+                for row in updates
+            ],
+        )
+
+
+def _aggregate_selects():
+    """Consultas que calculam todos os totais a partir das pontuações"""
+    for object_type, (table, object_col, scope_col, fields) in SOURCES.items():
+        scope = scope_col if scope_col is not None else literal(0)
+        groups = [(object_type, object_col, None)]
+        if object_type == "vulnerability":
+            vulnerability = Vulnerability.__table__
+            subcategory = VulnerabilitySubCategory.__table__
+            groups.append(
+                (
+                    VULNERABILITY_GROUPS[0][0],
+                    vulnerability.c.sub_category_id,
+                    table.join(
+                        vulnerability, vulnerability.c.id == object_col
+                    ),
+                )
+            )
+            groups.append(
+                (
+                    VULNERABILITY_GROUPS[1][0],
+                    subcategory.c.category_id,
+                    table.join(
+                        vulnerability, vulnerability.c.id == object_col
+                    ).join(
+                        subcategory,
+                        subcategory.c.id == vulnerability.c.sub_category_id,
+                    ),
+                )
+            )
+
+        for group_type, group_col, from_clause in groups:
+            for field in fields:
+                column = table.c[field]
+                yield group_type, field, (
+                    select(
+                        group_col,
+                        scope,
+                        func.count(),
+                        func.coalesce(func.sum(column), 0),
+                        func.coalesce(func.sum(column * column), 0),
+                    )
+                    .select_from(
+                        from_clause if from_clause is not None else table
+                    )
+                    .group_by(group_col, scope)
+                )
+
+
+def rebuild_rollups(connection) -> Tuple[int, int]:
+    """Reconstrói os totais pré-agregados a partir das pontuações
+
+    Args:
+        connection (Connection): Conexão com o banco de dados
+
+    Returns:
+        Tuple[int, int]: Quantidade de linhas inseridas e quantidade de
+            linhas que divergiam dos totais mantidos incrementalmente
+    """
+    table = ScoreRollup.__table__
+
+    current = {
+        (row.object_type, row.object_id, row.scope_id, row.field): (
+            row.count,
+            row.total,
+            row.total_squares,
+        )
+        for row in connection.execute(select(table))
+    }
+
+    rows = []
+    for object_type, field, query in _aggregate_selects():
+        for object_id, scope_id, count, total, squares in connection.execute(
+            query
+        ):
+            rows.append(
+                {
+                    "object_type": object_type,
+                    "object_id": object_id,
+                    "scope_id": scope_id,
+                    "field": field,
+                    "count": count,
+                    "total": total,
+                    "total_squares": squares,
+                }
+            )
+
+    rebuilt = {
+        (
+            row["object_type"],
+            row["object_id"],
+            row["scope_id"],
+            row["field"],
+        ): (
+            row["count"],
+            row["total"],
+            row["total_squares"],
+        )
+        for row in rows
+    }
+    empty = (0, 0, 0)
+    mismatched = sum(
+        1
+        for key in set(current) | set(rebuilt)
+        if current.get(key, empty) != rebuilt.get(key, empty)
+    )
+
+    connection.execute(delete(table))
+    for chunk in chunks(rows):
+        connection.execute(insert(table), chunk)
+
+    return len(rows), mismatched
+
+
+def get_rollups(
+    object_type: str,
+    object_ids: List[int],
+    scope_id: int = 0,
+) -> Dict[int, Dict[str, Tuple[int, int, int]]]:
+    """Obtém os totais pré-agregados de vários objetos
+
+    Args:
+        object_type (str): Tipo dos objetos (ex: `"active"`)
+        object_ids (List[int]): IDs dos objetos
+        scope_id (int, optional): ID da análise de vulnerabilidade. Padrão
+            é 0 (sem escopo).
+
+    Returns:
+        Dict[int, Dict[str, Tuple[int, int, int]]]: Contadores
+            `(count, total, total_squares)` por ID do objeto e coluna.
+            Objetos sem pontuações não são incluídos.
+    """
+    rollups: Dict[int, Dict[str, Tuple[int, int, int]]] = {}
+    for chunk in chunks(list(object_ids)):
+        rows = db.session.execute(
+            select(
+                ScoreRollup.object_id,
+                ScoreRollup.field,
+                ScoreRollup.count,
+                ScoreRollup.total,
+                ScoreRollup.total_squares,
+            ).where(
+                and_(
+                    ScoreRollup.object_type == object_type,
+                    ScoreRollup.scope_id == scope_id,
+                    ScoreRollup.object_id.in_(chunk),
+                )
+            )
+        )
+        for object_id, field, count, total, squares in rows:
+            rollups.setdefault(object_id, {})[field] = (count, total, squares)
+    return rollups
@@ -0,0 +1,444 @@
+import re
+import unicodedata
+from collections import Counter
+from heapq import nsmallest
+from threading import RLock
+from time import monotonic
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from weakref import WeakKeyDictionary
+
+from sqlalchemy import and_, bindparam, event, inspect, select, text
+from sqlalchemy.dialects.mysql import match as mysql_match
+from sqlalchemy.exc import OperationalError
+
+from ..extensions.database import chunks, db
+from .users import User
+
+# Colunas de `User` indexadas pela busca textual (o CPF é buscado por prefixo
+# no índice único da própria coluna)
+SEARCH_COLUMNS = ("name", "email_personal", "email_professional")
+
+# Tabela FTS5 (SQLite), com `rowid` igual ao ID do usuário
+FTS_TABLE = "user_search"
+
+# Índice FULLTEXT (MySQL) sobre SEARCH_COLUMNS
+FULLTEXT_INDEX = "ft_user_search"
+
+# Peso de cada coluna de SEARCH_COLUMNS no ranking do FTS5 (bm25)
+FTS_WEIGHTS = (10.0, 1.0, 1.0)
+
+# Fração mínima dos trigramas da busca presentes no usuário
+TRIGRAM_THRESHOLD = 0.5
+
+# Chave de `Session.info` com as alterações ainda não confirmadas
+PENDING_KEY = "user_search_pending"
+
+# Consulta composta apenas por dígitos e separadores de CPF
+CPF_QUERY = re.compile(r"[\d.\-\s]+")
+
+# (lista de termos normalizados, prefixo do CPF)
+ParsedQuery = Tuple[List[str], str]
+
+
+def normalize(value: Optional[str]) -> str:
+    """Normaliza um texto para a busca
+
+    Remove acentos, converte para minúsculas e troca qualquer caractere que
+    não seja letra ou dígito por espaço.
+
+    Args:
+        value (Optional[str]): Texto
+
+    Returns:
+        str: Texto normalizado
+    """
+    value = unicodedata.normalize("NFKD", value or "")
+    value = "".join(char for char in value if not unicodedata.combining(char))
+    return re.sub(r"[^0-9a-z]+", " ", value.lower()).strip()
+
+
+def parse_query(query: str) -> ParsedQuery:
+    """Separa a busca em termos ou em prefixo de CPF
+
+    Buscas compostas apenas por dígitos (e pelos separadores `.` e `-`) são
+    tratadas como prefixo do CPF.
+
+    Args:
+        query (str): Busca digitada pelo usuário
+
+    Returns:
+        ParsedQuery: Termos normalizados e prefixo do CPF (um dos dois vazio)
+    """
+    if CPF_QUERY.fullmatch(query) and re.search(r"\d", query):
+        return [], re.sub(r"\D", "", query)
+    return normalize(query).split(), ""
+
+
+def _trigrams(word: str, complete: bool = True) -> Set[str]:
+    # Palavras indexadas são completadas com um espaço no final; termos da
+    # busca não, para que funcionem como prefixo
+    padded = f"  {word} " if complete else f"  {word}"
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Índice de trigramas em memória
+
+    Utilizado nos bancos sem busca textual própria. O índice é carregado a
+    partir da tabela `user` na primeira busca, atualizado pelas transações
+    confirmadas neste processo e recarregado a cada `ttl` segundos para
+    refletir alterações feitas por outros processos.
+    """
+
+    def __init__(self) -> None:
+        self.lock = RLock()
+        self.loaded_at: Optional[float] = None
+        self.documents: Dict[int, Set[str]] = {}
+        self.names: Dict[int, str] = {}
+        self.postings: Dict[str, Set[int]] = {}
+
+    def load(self, connection) -> None:
+        """Carrega (ou recarrega) todos os usuários
+
+        Args:
+            connection (Connection): Conexão com o banco de dados
+        """
+        table = User.__table__
+        rows = connection.execute(
+            select(table.c.id, *(table.c[name] for name in SEARCH_COLUMNS))
+        )
+        with self.lock:
+            self.documents, self.names, self.postings = {}, {}, {}
+            for user_id, *values in rows:
+                self._add(user_id, values)
+            self.loaded_at = monotonic()
+
+    def is_stale(self, ttl: float) -> bool:
+        return self.loaded_at is None or (
+            ttl > 0 and monotonic() - self.loaded_at > ttl
+        )
+
+    def update(self, changes: Dict[int, Optional[Tuple]]) -> None:
+        """Aplica alterações confirmadas
+
+        Args:
+            changes (Dict[int, Optional[Tuple]]): Valores de SEARCH_COLUMNS
+                por ID do usuário (None para usuários removidos)
+        """
+        with self.lock:
+            if self.loaded_at is None:
+                return
+            for user_id, values in changes.items():
+                self._remove(user_id)
+                if values is not None:
+                    self._add(user_id, values)
+
+    def _add(self, user_id: int, values: Iterable[Optional[str]]) -> None:
+        values = list(values)
+        grams: Set[str] = set()
+        for value in values:
+            for word in normalize(value).split():
+                grams |= _trigrams(word)
+
+        self.documents[user_id] = grams
+        self.names[user_id] = normalize(values[0])
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(user_id)
+
+    def _remove(self, user_id: int) -> None:
+        for gram in self.documents.pop(user_id, ()):
+            ids = self.postings[gram]
+            ids.discard(user_id)
+            if not ids:
+                del self.postings[gram]
+        self.names.pop(user_id, None)
+
+    def search(self, terms: List[str], limit: int, offset: int) -> List[int]:
+        """Busca usuários por similaridade de trigramas
+
+        Args:
+            terms (List[str]): Termos normalizados
+            limit (int): Quantidade máxima de IDs
+            offset (int): Quantidade de IDs ignorados no início
+
+        Returns:
+            List[int]: IDs dos usuários, do mais para o menos similar
+        """
+        grams: Set[str] = set()
+        for term in terms:
+            grams |= _trigrams(term, complete=False)
+
+        with self.lock:
+            hits: Counter = Counter()
+            for gram in grams:
+                hits.update(self.postings.get(gram, ()))
+
+            minimum = TRIGRAM_THRESHOLD * len(grams)
+            ranked = nsmallest(
+                offset + limit,
+                (
+                    (-count, self.names[user_id], user_id)
+                    for user_id, count in hits.items()
+                    if count >= minimum
+                ),
+            )
+        return [user_id for _, _, user_id in ranked[offset : offset + limit]]
+
+
+# Backend de busca e índice de trigramas de cada engine
+_backends: "WeakKeyDictionary" = WeakKeyDictionary()
+_trigram_indexes: "WeakKeyDictionary" = WeakKeyDictionary()
+
+
+def get_backend(connection) -> str:
+    """Obtém o backend de busca disponível no banco
+
+    Args:
+        connection (Connection): Conexão com o banco de dados
+
+    Returns:
+        str: "fulltext" (MySQL), "fts5" (SQLite) ou "trigram"
+    """
+    engine = connection.engine
+    if engine not in _backends:
+        backend = "trigram"
+        inspector = inspect(connection)
+        dialect = connection.dialect.name
+        if dialect in ("mysql", "mariadb"):
+            indexes = inspector.get_indexes(User.__tablename__)
+            if any(index["name"] == FULLTEXT_INDEX for index in indexes):
+                backend = "fulltext"
+        elif dialect == "sqlite" and inspector.has_table(FTS_TABLE):
+            backend = "fts5"
+        _backends[engine] = backend
+    return _backends[engine]
+
+
+def get_trigram_index(connection, ttl: float = 0) -> TrigramIndex:
+    """Obtém o índice de trigramas da engine, carregando-o se necessário
+
+    Args:
+        connection (Connection): Conexão com o banco de dados
+        ttl (float, optional): Idade máxima do índice, em segundos. Padrão é
+            0 (nunca recarrega).
+
+    Returns:
+        TrigramIndex: Índice de trigramas
+    """
+    index = _trigram_indexes.setdefault(connection.engine, TrigramIndex())
+    if index.is_stale(ttl):
+        index.load(connection)
+    return index
+
+
+def create_fts_table(connection) -> bool:
+    """Cria a tabela FTS5 (SQLite) caso não exista
+
+    Args:
+        connection (Connection): Conexão com o banco de dados
+
+    Returns:
+        bool: False se o SQLite não possui o módulo FTS5
+    """
+    columns = ", ".join(SEARCH_COLUMNS)
+    try:
+        connection.execute(
+            text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                f"USING fts5({columns}, "
+                "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+        )
+    except OperationalError:
+        return False
+    return True
+
+
+def _fts_insert(connection, user_ids: Optional[List[int]] = None) -> None:
+    columns = ", ".join(SEARCH_COLUMNS)
+    statement = (
+        f"INSERT INTO {FTS_TABLE} (rowid, {columns}) "
+        f'SELECT id, {columns} FROM "{User.__tablename__}"'
+    )
+    if user_ids is None:
+        connection.execute(text(statement))
+        return
+
+    for chunk in chunks(user_ids):
+        connection.execute(
+            text(f"{statement} WHERE id IN :ids").bindparams(
+                bindparam("ids", expanding=True)
+            ),
+            {"ids": chunk},
+        )
+
+
+def rebuild_search_index(connection) -> str:
+    """Reconstrói o índice de busca de usuários
+
+    No SQLite cria (se necessário) e repopula a tabela FTS5; no MySQL o
+    índice FULLTEXT é mantido pelo próprio banco; nos demais recarrega o
+    índice de trigramas deste processo.
+
+    Args:
+        connection (Connection): Conexão com o banco de dados
+
+    Returns:
+        str: Backend utilizado
+    """
+    _backends.pop(connection.engine, None)
+    if connection.dialect.name == "sqlite" and create_fts_table(connection):
+        connection.execute(text(f"DELETE FROM {FTS_TABLE}"))
+        _fts_insert(connection)
+
+    backend = get_backend(connection)
+    if backend == "trigram":
+        get_trigram_index(connection).load(connection)
+    return backend
+
+
+def search_user_ids(
+    connection,
+    query: str,
+    limit: int,
+    offset: int = 0,
+    ttl: float = 0,
+    backend: Optional[str] = None,
+) -> List[int]:
+    """Busca usuários pelo nome, e-mails ou prefixo do CPF
+
+    Args:
+        connection (Connection): Conexão com o banco de dados
+        query (str): Busca digitada pelo usuário
+        limit (int): Quantidade máxima de IDs
+        offset (int, optional): Quantidade de IDs ignorados no início.
+            Padrão é 0.
+        ttl (float, optional): Idade máxima do índice de trigramas, em
+            segundos. Padrão é 0 (nunca recarrega).
+        backend (Optional[str], optional): Força um backend de busca. Padrão
+            é None (utiliza `get_backend`).
+
+    Returns:
+        List[int]: IDs dos usuários, do mais para o menos relevante
+    """
+    table = User.__table__
+    terms, cpf = parse_query(query)
+    if terms and backend is None:
+        backend = get_backend(connection)
+
+    if cpf:
+        # Intervalo em vez de LIKE para utilizar o índice único do CPF
+        statement = (
+            select(table.c.id)
+            .where(and_(table.c.cpf >= cpf, table.c.cpf < cpf + ":"))
+            .order_by(table.c.cpf)
+        )
+    elif not terms:
+        statement = select(table.c.id).order_by(table.c.name, table.c.id)
+    elif backend == "fts5":
+        weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+        statement = text(
+            f"SELECT rowid FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH :expression "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}), rowid "
+            "LIMIT :limit OFFSET :offset"
+        )
+        expression = " AND ".join(f'"{term}"*' for term in terms)
+        rows = connection.execute(
+            statement,
+            {"expression": expression, "limit": limit, "offset": offset},
+        )
+        return list(rows.scalars())
+    elif backend == "fulltext":
+        score = mysql_match(
+            *(table.c[name] for name in SEARCH_COLUMNS),
+            against=" ".join(f"+{term}*" for term in terms),
+        ).in_boolean_mode()
+        statement = (
+            select(table.c.id)
+            .where(score > 0)
+            .order_by(score.desc(), table.c.id)
+        )
+    else:
+        index = get_trigram_index(connection, ttl)
+        return index.search(terms, limit, offset)
+
+    statement = statement.limit(limit).offset(offset)
+    return list(connection.execute(statement).scalars())
+
+
+def _changed_users(session) -> Dict[int, Optional[Tuple]]:
+    changes: Dict[int, Optional[Tuple]] = {}
+
+    for obj in session.new:
+        if isinstance(obj, User):
+            changes[obj.id] = tuple(
+                getattr(obj, name) for name in SEARCH_COLUMNS
+            )
+
+    for obj in session.dirty:
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        if any(
+            state.attrs[name].history.has_changes() for name in SEARCH_COLUMNS
+        ):
+            changes[obj.id] = tuple(
+                getattr(obj, name) for name in SEARCH_COLUMNS
+            )
+
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changes[obj.id] = None
+
+    return changes
+
+
+def sync_search_on_flush(session, flush_context) -> None:
+    """Mantém o índice de busca sincronizado com os usuários gravados
+
+    No SQLite a tabela FTS5 é atualizada na mesma transação; o índice de
+    trigramas só é atualizado quando a transação é confirmada.
+
+    Args:
+        session (Session): Sessão do flush
+        flush_context (FlushContext): Contexto de flush
+    """
+    changes = _changed_users(session)
+    if not changes:
+        return
+
+    connection = session.connection()
+    backend = get_backend(connection)
+    if backend == "fts5":
+        for chunk in chunks(list(changes)):
+            connection.execute(
+                text(
+                    f"DELETE FROM {FTS_TABLE} WHERE rowid IN :ids"
+                ).bindparams(bindparam("ids", expanding=True)),
+                {"ids": chunk},
+            )
+        _fts_insert(
+            connection,
+            [user_id for user_id, values in changes.items() if values],
+        )
+    elif backend == "trigram":
+        engine, pending = session.info.setdefault(
+            PENDING_KEY, (connection.engine, {})
+        )
+        pending.update(changes)
+
+
+def apply_search_on_commit(session) -> None:
+    engine, pending = session.info.pop(PENDING_KEY, (None, None))
+    if engine in _trigram_indexes:
+        _trigram_indexes[engine].update(pending)
+
+
+def discard_search_on_rollback(session) -> None:
+    session.info.pop(PENDING_KEY, None)
+
+
+event.listen(db.session, "after_flush", sync_search_on_flush)
+event.listen(db.session, "after_commit", apply_search_on_commit)
+event.listen(db.session, "after_rollback", discard_search_on_rollback)
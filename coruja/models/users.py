@@ -61,7 +61,7 @@ class User(BaseTable, UserMixin):
 
     @property
     def cpf_censored(self) -> str:
-        return self.__censor_cpf(self.cpf)
+        return self.censored_cpf(self.cpf)
 
     @telephones.setter
     def telephones(self, value) -> None:
@@ -101,7 +101,7 @@ class User(BaseTable, UserMixin):
         for column in self.__table__.columns:  # type: ignore
             if filter_params and column.name in filter_params:
                 if censor_cpf and column.name == "cpf":
-                    result[column.name] = self.__censor_cpf(
+                    result[column.name] = self.censored_cpf(
                         getattr(self, column.name)
                     )
                 else:
@@ -109,7 +109,8 @@ class User(BaseTable, UserMixin):
 
         return result
 
-    def __censor_cpf(self, cpf: str) -> str:
+    @staticmethod
+    def censored_cpf(cpf: str) -> str:
         """
         Censura um CPF, mantendo apenas os três primeiros e os dois últimos dígitos
         visíveis.
@@ -1,28 +1,121 @@
-import csv
-from io import StringIO
-
-from flask import Blueprint, Response, render_template, request, stream_with_context
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from flask import (
+    Blueprint,
+    Response,
+    abort,
+    render_template,
+    request,
+    stream_with_context,
+)
 from flask_login import login_required
+from sqlalchemy.orm import joinedload
 
 from ...decorators import proxy_access
+from ...exports import EXPORT_FORMATS, stream_export
+from ...extensions.database import db
 from ...models import AccessLog, Change
+from ...models.log_partitions import access_log_statements
+from ...utils import KeysetPagination, parse_datetime
 
 bp = Blueprint("logs", __name__, url_prefix="/logs")
 
 
+def period_filters() -> Dict[str, Optional[datetime]]:
+    """Período (`start`/`end`) da requisição"""
+    return {
+        "start": parse_datetime(request.args.get("start", "")),
+        "end": parse_datetime(request.args.get("end", ""), end=True),
+    }
+
+
+def filter_by_period(query, column):
+    """Filtra a consulta pelo período `start`/`end` da requisição
+
+    Args:
+        query (Query): Consulta
+        column (InstrumentedAttribute): Coluna de data e hora
+
+    Returns:
+        Query: Consulta filtrada
+    """
+    period = period_filters()
+    if period["start"]:
+        query = query.filter(column >= period["start"])
+    if period["end"]:
+        query = query.filter(column < period["end"])
+    return query
+
+
+class AccessLogPagination(KeysetPagination):
+    """Paginação por chave dos logs de acesso sobre as partições mensais
+
+    As partições são consultadas em ordem, a partir da que contém o cursor,
+    até completar a página.
+    """
+
+    def __init__(
+        self,
+        connection,
+        user_id: Optional[int] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        **kwargs,
+    ):
+        self.connection = connection
+        self.filters = {"user_id": user_id, "start": start, "end": end}
+        super().__init__(None, AccessLog.access_at, AccessLog.id, **kwargs)
+
+    def fetch(self, cursor, backward, limit):
+        filters = dict(self.filters)
+        if cursor is not None:
+            # Descarta as partições anteriores (ou posteriores) ao cursor
+            value = cursor[0]
+            if backward:
+                end = value + timedelta(microseconds=1)
+                filters["end"] = min(filters["end"] or end, end)
+            else:
+                filters["start"] = max(filters["start"] or value, value)
+
+        rows: List = []
+        statements = access_log_statements(
+            self.connection, descending=backward, **filters
+        )
+        for statement in statements:
+            if cursor is not None:
+                columns = statement.selected_columns
+                condition, _ = self.seek(
+                    columns.access_at, columns.id, cursor, backward
+                )
+                statement = statement.where(condition)
+
+            statement = statement.limit(limit - len(rows))
+            rows += self.connection.execute(statement).all()
+            if len(rows) >= limit:
+                break
+        return rows
+
+
+def changes_query():
+    """Consulta dos logs de mudanças com os filtros da requisição"""
+    query = filter_by_period(Change.query, Change.created_at)
+    return query.options(joinedload(Change.user))
+
+
 @bp.route("/acesso", methods=["GET", "POST"])
 @login_required
 @proxy_access(kind_object="admin", kind_access="read", has_obj_id=False)
 def get_logs():
     """Rota que renderiza os logs de acesso paginados"""
-    query = AccessLog.query
-
-    user_id = request.args.get("user_id", "")
-    if user_id:
-        query = query.filter_by(user_id=user_id)
-
-    page = request.args.get("page", 1, type=int)
-    pagination = query.paginate(page=page, per_page=10)
+    pagination = AccessLogPagination(
+        db.session.connection(),
+        user_id=request.args.get("user_id", None, int),
+        **period_filters(),
+        per_page=10,
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+    )
     all_access_logs = pagination.items
     return render_template(
         "admin/records.html",
@@ -38,8 +131,14 @@ def get_logs():
 @proxy_access(kind_object="admin", kind_access="read", has_obj_id=False)
 def get_changes():
     """Página que renderiza os logs de mudanças paginados"""
-    page = request.args.get("page", 1, type=int)
-    pagination = Change.query.paginate(page=page, per_page=10)
+    pagination = KeysetPagination(
+        changes_query(),
+        Change.created_at,
+        Change.id,
+        per_page=10,
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+    )
     all_changes = pagination.items
     return render_template(
         "admin/changes.html",
@@ -50,118 +149,62 @@ def get_changes():
     )
 
 
-def generate_csv_chunks_access():
-    output = StringIO()
-    writer = csv.writer(output)
-    headers = [
-        "User Name",
-        "User CPF",
-        "IP",
-        "User Agent",
-        "Access At",
-        "Endpoint",
-    ]
-    writer.writerow(headers)
-    yield output.getvalue()
-    output.truncate(0)
-    output.seek(0)
-
-    page = 1
-    per_page = 100
-
-    while True:
-        all_logs = AccessLog.query.paginate(
-            page=page, per_page=per_page, error_out=False
-        ).items  # Substitua isso com sua própria lógica de consulta
-        if not all_logs:
-            break
-
-        for log in all_logs:
-            user_name = log.user.name
-            user_cpf = log.user.cpf_censored
-            ip = log.ip
-            user_agent = log.user_agent
-            access_at = log.access_at.strftime("%d/%m/%Y %H:%M:%S")
-            endpoint = log.endpoint
-
-            writer.writerow(
-                [user_name, user_cpf, ip, user_agent, access_at, endpoint]
-            )
+def export_response(name: str, filename: str, **filters) -> Response:
+    """Resposta que transmite uma exportação de log
 
-        yield output.getvalue()
-        output.truncate(0)
-        output.seek(0)
+    O formato é escolhido por `?format=csv|ndjson` e o conteúdo é comprimido
+    com gzip quando o cliente o aceita.
 
-        page += 1
+    Args:
+        name (str): Exportação (chave de `EXPORTS`)
+        filename (str): Nome do arquivo, sem extensão
+        **filters: Filtros da exportação
 
+    Returns:
+        Response: Resposta transmitida em partes
+    """
+    export_format = request.args.get("format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        abort(400, "Formato de exportação inválido")
 
-@bp.route("/download_logs", methods=["POST", "GET"])
-@login_required
-@proxy_access(kind_object="admin", kind_access="read", has_obj_id=False)
-def download_logs():
+    content_type, extension = EXPORT_FORMATS[export_format]
+    compress = "gzip" in request.accept_encodings
     headers = {
-        "Content-Disposition": "attachment; filename=access_logs.csv",
-        "Content-Type": "text/csv",
+        "Content-Disposition": f"attachment; filename={filename}.{extension}",
+        "Content-Type": content_type,
+        "Vary": "Accept-Encoding",
     }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+
+    def generate():
+        # Conexão própria: o cursor permanece aberto durante a transmissão
+        with db.engine.connect() as connection:
+            yield from stream_export(
+                connection, name, export_format, compress, **filters
+            )
 
-    return Response(
-        stream_with_context(generate_csv_chunks_access()), headers=headers
-    )
-
-
-def generate_csv_chunks():
-    output = StringIO()
-    writer = csv.writer(output)
-    headers = ["Usuário", "Objeto", "Alterações"]
-    writer.writerow(headers)
-    yield output.getvalue()
-    output.truncate(0)
-    output.seek(0)
-
-    page = 1
-    per_page = 100
-
-    while True:
-        all_changes = Change.query.paginate(
-            page=page, per_page=per_page, error_out=False
-        ).items  # Substitua isso com sua própria lógica de consulta
-        if not all_changes:
-            break
-
-        for change in all_changes:
-            user_name = change.user.name
-            user_cpf = change.user.cpf_censored
-            object_type = change.object_type
-            object_old = change.object_old
-            object_new = change.object_new
-
-            changes = []
-            for key, value_old in object_old.items():
-                value_new = object_new.get(key, None)
-                if value_old != value_new:
-                    change_str = f"[{key}] {value_old!r} -> {value_new!r}\n"
-                    changes.append(change_str)
-
-            changes_str = "".join(changes).strip()
-            user = f"{user_name} - {user_cpf}"
-            writer.writerow([user, object_type, changes_str])
+    return Response(stream_with_context(generate()), headers=headers)
 
-        yield output.getvalue()
-        output.truncate(0)
-        output.seek(0)
 
-        page += 1
+@bp.route("/download_logs", methods=["POST", "GET"])
+@login_required
+@proxy_access(kind_object="admin", kind_access="read", has_obj_id=False)
+def download_logs():
+    return export_response(
+        "access",
+        "access_logs",
+        user_id=request.args.get("user_id", None, int),
+        **period_filters(),
+    )
 
 
 @bp.route("/download_changes", methods=["POST", "GET"])
 @login_required
 @proxy_access(kind_object="admin", kind_access="read", has_obj_id=False)
 def download_changes():
-    headers = {
-        "Content-Disposition": "attachment; filename=change_logs.csv",
-        "Content-Type": "text/csv",
-    }
-
-    return Response(
-        stream_with_context(generate_csv_chunks()), headers=headers
+    return export_response(
+        "changes",
+        "change_logs",
+        **period_filters(),
     )
@@ -0,0 +1,31 @@
+from flask import Blueprint, abort, current_app, jsonify, request
+from flask_login import login_required
+
+from ...decorators import proxy_access
+
+bp = Blueprint("profiler", __name__, url_prefix="/profiler")
+
+
+@bp.route("/", methods=["GET", "DELETE"])
+@login_required
+@proxy_access(kind_object="admin", kind_access="read", has_obj_id=False)
+def query_stats():
+    """Estatísticas das consultas SQL por endpoint (percentis da quantidade
+    de consultas, do tempo no banco e da duração das requisições)
+
+    `DELETE` descarta as requisições registradas.
+    """
+    profiler = current_app.extensions.get("sql_profiler")
+    if profiler is None:
+        abort(404, description="Instrumentação SQL desativada")
+
+    if request.method == "DELETE":
+        profiler.reset()
+
+    return jsonify(
+        {
+            "slow_query_ms": current_app.config["SQL_PROFILER_SLOW_MS"],
+            "window": current_app.config["SQL_PROFILER_WINDOW"],
+            "endpoints": profiler.snapshot(),
+        }
+    )
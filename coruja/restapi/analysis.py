@@ -2,6 +2,7 @@ from flask import Blueprint, Flask, flash, redirect, render_template, request, u
 from flask_login import login_required
 
 from ..decorators import proxy_access
+from ..extensions.profiler import query_budget
 from ..forms import AnalysisForm
 from ..utils import database_manager
 
@@ -9,6 +10,7 @@ bp = Blueprint("analysis", __name__, url_prefix="/analise")
 
 
 @bp.route("/<int:analysis_id>")
+@query_budget(25)
 @login_required
 @proxy_access(kind_object="analysis", kind_access="read")
 def get_analysis(analysis_id: int):
@@ -18,18 +20,9 @@ def get_analysis(analysis_id: int):
         analysis_id (int): ID da Análise
     """
     analysis = database_manager.get_analysis(analysis_id)
-    experts = database_manager.get_experts_by_analysis(analysis)  # type: ignore [analysis isn't None]
-    actives = database_manager.get_actives_by_analysis(analysis)  # type: ignore [analysis isn't None]
-    vuln_factor = database_manager.get_vuln_factor(
-        getattr(analysis, "analysis_vulnerability")
-    )
-
-    context = {
-        "analysis": analysis,
-        "experts": experts,
-        "actives": actives,
-        "vuln_factor": vuln_factor,
-    }
+    report = database_manager.get_analysis_report(analysis)  # type: ignore [analysis isn't None]
+
+    context = {"analysis": analysis, **report}
     return render_template("analysis/analysis.html", **context)
 
 
@@ -12,6 +12,7 @@ from flask import (
 from flask_login import login_required
 
 from ..decorators import proxy_access
+from ..extensions.profiler import query_budget
 from ..forms import DefaultForm
 from ..utils import database_manager, form_to_dict
 
@@ -19,6 +20,7 @@ bp = Blueprint("analysis_risk", __name__, url_prefix="/analise-risco")
 
 
 @bp.route("/<int:analysis_risk_id>")
+@query_budget(7)
 @login_required
 @proxy_access(kind_object="analysis_risk", kind_access="read")
 def get_analysis_risk(analysis_risk_id: int):
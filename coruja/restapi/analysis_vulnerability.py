@@ -2,6 +2,7 @@ from flask import Blueprint, Flask, render_template
 from flask_login import login_required
 
 from ..decorators import proxy_access
+from ..extensions.profiler import query_budget
 from ..utils import database_manager
 
 bp = Blueprint(
@@ -10,6 +11,7 @@ bp = Blueprint(
 
 
 @bp.route("/<int:analysis_vulnerability_id>")
+@query_budget(7)
 @login_required
 # @proxy_access(kind_object="analysis_vulnerability", kind_access="read")
 def get_analysis_vulnerability(analysis_vulnerability_id: int):
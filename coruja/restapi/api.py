@@ -1,22 +1,33 @@
-from flask import Blueprint, Flask, jsonify, request
+import gzip
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flask import Blueprint, Flask, Response, current_app, jsonify, request
 from flask_login import current_user, login_required
-from sqlalchemy import or_
+from sqlalchemy.exc import SQLAlchemyError
 
-from ..decorators import analysis_risk_access
-from ..models import ActiveScore, User
-from ..utils import database_manager
+from ..decorators import analysis_access, analysis_risk_access
+from ..decorators.permissions import get_permission_index
+from ..extensions.profiler import query_budget
+from ..models.reports import get_report_version
+from ..models.rollups import get_rollups
+from ..utils import SCORE_TYPES, database_manager
 
 bp = Blueprint("api", __name__, url_prefix="/api/v1")
 
 
 @bp.route("/get-users")
+@query_budget(5)
 @login_required
 def get_users():
     """Obtém uma lista de usuários com base em uma busca.
 
     Returns:
         Uma resposta JSON contendo uma lista de usuários que correspondem aos
-        critérios de busca. A resposta tem a seguinte estrutura:
+        critérios de busca, do mais para o menos relevante. Aceita os
+        parâmetros `query`, `limit` (padrão `USER_SEARCH_LIMIT`, no máximo
+        `USER_SEARCH_MAX_LIMIT`) e `offset`. Buscas compostas apenas por
+        dígitos são tratadas como prefixo do CPF. A resposta tem a seguinte
+        estrutura:
         >>> {
         ...    "users": [
         ...        {
@@ -30,20 +41,23 @@ def get_users():
         ... }
     """
     query = request.args.get("query", "")
-    users: list[User] = User.query.filter(
-        or_(
-            User.name.ilike(f"%{query}%"),  # type: ignore
-            User.cpf.ilike(f"%{query}%"),  # type: ignore
-            User.email_personal.ilike(f"%{query}%"),  # type: ignore
-            User.email_professional.ilike(f"%{query}%"),  # type: ignore
-        )
-    ).all()
+    limit = min(
+        request.args.get(
+            "limit", current_app.config.get("USER_SEARCH_LIMIT", 20), int
+        ),
+        current_app.config.get("USER_SEARCH_MAX_LIMIT", 100),
+    )
+    offset = request.args.get("offset", 0, int)
+    users = database_manager.search_users(
+        query, limit=max(limit, 0), offset=max(offset, 0)
+    )
 
     _users = [user.as_dict(["id", "name", "cpf", "title"]) for user in users]
     return jsonify({"users": _users})
 
 
 @bp.route("/get-actives", methods=["POST"])
+@query_budget(8)
 @login_required
 def get_actives():
     """Obtém uma lista de ativos com base ID de Análise de Risco (`ar_id`).
@@ -82,6 +96,7 @@ def get_actives():
         )
 
     _actives = analysis_risk.associated_actives  # type: ignore [analysis_risk isn't None]
+    rollups = get_rollups("active", [_active.id for _active in _actives])  # type: ignore
 
     result = {"actives": []}
     for _active in _actives:  # type: ignore
@@ -92,17 +107,11 @@ def get_actives():
             if key in ["id", "title", "description"]
         }
 
-        _scores = ActiveScore.query.filter_by(active_id=_active["id"]).all()
-        total = len(_scores)
-
-        _scores = [score.as_dict() for score in _scores]
+        rollup = rollups.get(_active["id"], {})
 
         def get_media(key):
-            return (
-                sum([score[key] for score in _scores]) / total
-                if total > 0
-                else 0
-            )
+            count, total, _ = rollup.get(key, (0, 0, 0))
+            return total / count if count > 0 else 0
 
         _active["substitutability"] = get_media("substitutability")
         _active["replacement_cost"] = get_media("replacement_cost")
@@ -126,6 +135,7 @@ def get_actives():
 
 
 @bp.route("/get-user-actives", methods=["POST"])
+@query_budget(8)
 @login_required
 def get_user_actives():
     """Obtém uma lista de ativos com base ID de Análise de Risco (`ar_id`) e de Usuário (`user_id`).
@@ -168,6 +178,11 @@ def get_user_actives():
 
     _actives = analysis_risk.associated_actives  # type: ignore [analysis_risk isn't None]
 
+    _scores = database_manager.get_active_scores_by_user(
+        [_active.id for _active in _actives],  # type: ignore
+        current_user.id,  # type: ignore
+    )
+
     result = {"actives": {}}
     for _active in _actives:  # type: ignore
         _active = _active.as_dict()
@@ -176,18 +191,7 @@ def get_user_actives():
             for key, value in _active.items()
             if key in ["id", "title", "description"]
         }
-
-        _scores = ActiveScore.query.filter_by(
-            active_id=_active["id"], user_id=current_user.id  # type: ignore
-        ).first()
-
-        if _scores:
-            _active["scores"] = _scores.as_dict()  # type: ignore
-        else:
-            _scores = database_manager.add_active_score(
-                active_id=_active["id"], user_id=current_user.id  # type: ignore
-            )
-            _active["scores"] = _scores.as_dict()
+        _active["scores"] = _scores[_active["id"]]
 
         result["actives"][_active["id"]] = _active
 
@@ -195,6 +199,7 @@ def get_user_actives():
 
 
 @bp.route("/get-threats", methods=["POST"])
+@query_budget(10)
 @login_required
 def get_threats():
     """Obtém uma lista de ameaças com base no ID do Ativo (`ac_id`) e de Análise de Risco (`ar_id`).
@@ -245,16 +250,192 @@ def get_threats():
         for threat in _active.associated_threats  # type: ignore
     }
 
+    adverse_actions = database_manager.get_adverse_actions_by_threat_ids(
+        list(_result), getattr(current_user, "id")
+    )
     for _id in _result:
-        _result[_id][
-            "adverses_actions"
-        ] = database_manager.get_adverse_actions(
-            threat_id=_id, user_id=getattr(current_user, "id", None)
-        )
+        _result[_id]["adverses_actions"] = adverse_actions[_id]
 
     return jsonify(_result)
 
 
+def _conditional_json(
+    build: Callable[[], Any],
+    etag: Optional[str] = None,
+    compress: bool = False,
+) -> Response:
+    """Resposta JSON com ETag, que responde 304 a `If-None-Match`
+
+    Com `etag` (derivado da versão dos dados), a resposta não é calculada
+    quando o cliente já possui a versão atual; sem ele, o ETag é o hash do
+    corpo da resposta.
+
+    Args:
+        build (Callable[[], Any]): Calcula o corpo da resposta
+        etag (Optional[str], optional): ETag da versão atual. Padrão é None.
+        compress (bool, optional): Se True, comprime a resposta com gzip
+            quando o cliente o aceita. Padrão é False.
+
+    Returns:
+        Response: Resposta JSON ou 304
+    """
+    gzipped = compress and "gzip" in request.accept_encodings
+    if etag is not None and gzipped:
+        # Cada codificação é uma representação diferente
+        etag = f"{etag}-gzip"
+
+    if etag is not None and request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+        if gzipped:
+            response.set_data(gzip.compress(response.get_data(), mtime=0))
+            response.headers["Content-Encoding"] = "gzip"
+
+    if etag is None:
+        response.add_etag()
+    else:
+        response.set_etag(etag)
+    if compress:
+        response.vary.add("Accept-Encoding")
+
+    # O navegador guarda a resposta, mas a revalida a cada uso
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@bp.route("/analysis-risk/<int:analysis_risk_id>/workspace")
+@query_budget(11)
+@login_required
+def get_analysis_risk_workspace(analysis_risk_id: int):
+    """Obtém os ativos, ameaças e ações adversas de uma Análise de Risco, com
+    as pontuações do usuário atual
+
+    Substitui `get-user-actives` seguido de `get-threats` para cada ativo.
+    A resposta possui ETag e requisições com `If-None-Match` da versão
+    atual recebem 304.
+
+    Returns:
+        Uma resposta JSON com a seguinte estrutura:
+        >>> {
+        ...    "analysis_risk_id": int,
+        ...    "actives": {
+        ...        id: {
+        ...            "id": int,
+        ...            "title": str,
+        ...            "description": str,
+        ...            "scores": {
+        ...                "substitutability": int,
+        ...                "replacement_cost": int,
+        ...                "essentiality": int,
+        ...            },
+        ...            "threats": {
+        ...                id: {
+        ...                    "title": str,
+        ...                    "description": str,
+        ...                    "adverses_actions": [...],
+        ...                },
+        ...                ...
+        ...            },
+        ...        },
+        ...        ...
+        ...    }
+        ... }
+    """
+    if not analysis_risk_access(analysis_risk_id, current_user, "read"):  # type: ignore [current_user isn't None]
+        return (
+            jsonify({"error": "You don't have access to this analysis_risk"}),
+            403,
+        )
+
+    analysis_risk = database_manager.get_analysis_risk(analysis_risk_id)
+    user_id = getattr(current_user, "id")
+
+    etag = None
+    version = get_report_version(getattr(analysis_risk, "analysis_id"))
+    if version is not None:
+        etag = f"analysis-risk-{analysis_risk_id}-{user_id}-{version}"
+
+    return _conditional_json(
+        lambda: database_manager.get_analysis_risk_workspace(
+            analysis_risk_id, user_id
+        ),
+        etag,
+        compress=True,
+    )
+
+
+@bp.route("/analysis-vulnerability/<int:analysis_vulnerability_id>/workspace")
+@query_budget(10)
+@login_required
+def get_analysis_vulnerability_workspace(analysis_vulnerability_id: int):
+    """Obtém as categorias, subcategorias e vulnerabilidades de uma Análise
+    de Vulnerabilidade, com as pontuações do usuário atual
+
+    Substitui `get-categories` seguido de `get-subcategories` para cada
+    categoria. A resposta é comprimida com gzip quando o cliente o aceita,
+    possui ETag e requisições com `If-None-Match` da versão atual recebem
+    304.
+
+    Returns:
+        Uma resposta JSON com a seguinte estrutura:
+        >>> {
+        ...    "analysis_vulnerability_id": int,
+        ...    "categories": {
+        ...        id: {
+        ...            "id": int,
+        ...            "name": str,
+        ...            ...,
+        ...            "subcategories": [
+        ...                {
+        ...                    "id": int,
+        ...                    "name": str,
+        ...                    ...,
+        ...                    "vulnerabilities": [
+        ...                        {"id": int, "name": str, ..., "score": int},
+        ...                        ...
+        ...                    ],
+        ...                },
+        ...                ...
+        ...            ],
+        ...        },
+        ...        ...
+        ...    }
+        ... }
+    """
+    analysis_vulnerability = database_manager.get_analysis_vulnerability(
+        analysis_vulnerability_id, or_404=False
+    )
+    if not analysis_vulnerability:
+        return jsonify({"error": "Analysis vulnerability not found"}), 404
+
+    analysis_id = getattr(analysis_vulnerability, "analysis_id")
+    if not analysis_access(analysis_id, current_user, "read"):  # type: ignore [current_user isn't None]
+        return (
+            jsonify(
+                {"error": "You don't have access to this analysis_vulnerability"}
+            ),
+            403,
+        )
+
+    user_id = getattr(current_user, "id")
+    etag = None
+    version = get_report_version(analysis_id)
+    if version is not None:
+        etag = "analysis-vulnerability-{}-{}-{}".format(
+            analysis_vulnerability_id, user_id, version
+        )
+
+    return _conditional_json(
+        lambda: database_manager.get_analysis_vulnerability_workspace(
+            analysis_vulnerability, user_id  # type: ignore [analysis_vulnerability isn't None]
+        ),
+        etag,
+        compress=True,
+    )
+
+
 @bp.route("/update-adveser-action-score", methods=["POST"])
 @login_required
 def update_adverse_action_score():
@@ -299,7 +480,130 @@ def update_active_score():
     return jsonify({})
 
 
+def _parse_score_item(item: Any) -> Tuple[Dict[str, Any], Optional[tuple]]:
+    """Valida um item de `/scores/batch`
+
+    Returns:
+        Tuple[Dict[str, Any], Optional[tuple]]: Resultado do item e, caso
+            seja válido, a tupla `(tipo, chave do item, pontuações)`
+    """
+    if not isinstance(item, dict):
+        return {"status": "invalid", "error": "Invalid item"}, None
+
+    _type, _id, values = item.get("type"), item.get("id"), item.get("scores")
+    result = {"type": _type, "id": _id}
+
+    if _type not in SCORE_TYPES:
+        return {**result, "status": "invalid", "error": "Invalid type"}, None
+
+    # Vulnerabilidades são pontuadas por análise de vulnerabilidade
+    key = (_id,)
+    if _type == "vulnerability":
+        result["av_id"] = item.get("av_id")
+        key = (result["av_id"], _id)
+
+    if any(not isinstance(v, int) or isinstance(v, bool) for v in key):
+        return {**result, "status": "invalid", "error": "Invalid id"}, None
+
+    fields = SCORE_TYPES[_type][2]
+    if (
+        not isinstance(values, dict)
+        or not values
+        or any(
+            field not in fields
+            or not isinstance(value, int)
+            or isinstance(value, bool)
+            for field, value in values.items()
+        )
+    ):
+        return {**result, "status": "invalid", "error": "Invalid scores"}, None
+
+    return result, (_type, key, values)
+
+
+@bp.route("/scores/batch", methods=["POST"])
+@login_required
+def update_scores_batch():
+    """Atualiza em lote pontuações de ativos, ações adversas e
+    vulnerabilidades do usuário atual, em uma única transação.
+
+    Recebe uma carga JSON com a seguinte estrutura:
+        >>> {
+        ...    "scores": [
+        ...        {"type": "active", "id": int, "scores": {"essentiality": int}},
+        ...        {"type": "adverse_action", "id": int, "scores": {"capacity": int}},
+        ...        {
+        ...            "type": "vulnerability",
+        ...            "id": int,
+        ...            "av_id": int,
+        ...            "scores": {"score": int},
+        ...        },
+        ...        ...
+        ...    ]
+        ... }
+
+    Returns:
+        Uma resposta JSON com a situação de cada item, na mesma ordem
+        (`created`, `updated`, `unchanged`, `invalid`, `not_found`,
+        `forbidden` ou `error`):
+        >>> {"results": [{"type": str, "id": int, "status": str}, ...]}
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get("scores") if isinstance(data, dict) else None
+
+    if not isinstance(items, list):
+        return jsonify({"error": "Missing scores"}), 400
+
+    results, valid = [], []
+    for item in items:
+        result, entry = _parse_score_item(item)
+        results.append(result)
+        if entry:
+            valid.append((result, entry))
+
+    items_keys: Dict[str, List[Tuple[int, ...]]] = {}
+    for _, (_type, key, _) in valid:
+        items_keys.setdefault(_type, []).append(key)
+
+    analyses = database_manager.get_analyses_by_score_items(items_keys)
+    permission_index = get_permission_index(current_user)
+    allowed = {
+        analysis_id: permission_index.has_access(
+            "update", "analysis", analysis_id
+        )
+        for analysis_id in set(analyses.values())
+    }
+
+    scores: Dict[str, Dict[Tuple[int, ...], Dict[str, int]]] = {}
+    pending = []
+    for result, (_type, key, values) in valid:
+        analysis_id = analyses.get((_type, key))
+        if analysis_id is None:
+            result["status"] = "not_found"
+        elif not allowed[analysis_id]:
+            result["status"] = "forbidden"
+        else:
+            scores.setdefault(_type, {}).setdefault(key, {}).update(values)
+            pending.append((result, (_type, key)))
+
+    try:
+        status = database_manager.upsert_scores(
+            current_user.id, scores  # type: ignore
+        )
+    except SQLAlchemyError:
+        current_app.logger.exception("Falha ao gravar pontuações em lote")
+        for result, _ in pending:
+            result["status"] = "error"
+        return jsonify({"results": results}), 500
+
+    for result, item in pending:
+        result["status"] = status[item]
+
+    return jsonify({"results": results})
+
+
 @bp.route("/get-categories", methods=["POST"])
+@query_budget(5)
 @login_required
 def get_categories():
     data = request.get_json()
@@ -320,6 +624,7 @@ def get_categories():
 
 
 @bp.route("/get-subcategories", methods=["POST"])
+@query_budget(6)
 @login_required
 def get_subcategories():
     data = request.get_json()
@@ -331,18 +636,25 @@ def get_subcategories():
         data["c_id"]
     )
 
+    vulns_by_subcategory = (
+        database_manager.get_vulnerabilities_by_subcategory_ids(
+            [sc.id for sc in sub_categories]
+        )
+    )
+    scores = database_manager.get_vuln_scores_by_user(
+        [vuln.id for vulns in vulns_by_subcategory.values() for vuln in vulns],
+        getattr(current_user, "id"),
+        data.get("av_id"),
+    )
+
     results = {"subcategories": []}
     for sc in sub_categories:
-        vulns = database_manager.get_vulnerabilities_by_subcategory_id(sc.id)
-
         subcategory = sc.as_dict()
         subcategory["vulnerabilities"] = []
 
-        for vuln in vulns:
+        for vuln in vulns_by_subcategory[sc.id]:
             _vuln = vuln.as_dict()
-            _vuln["score"] = database_manager.get_vuln_score_by_user(
-                vuln.id, getattr(current_user, "id")
-            )
+            _vuln["score"] = scores[vuln.id]
             subcategory["vulnerabilities"].append(_vuln)
 
         results["subcategories"].append(subcategory)
@@ -351,6 +663,7 @@ def get_subcategories():
 
 
 @bp.route("/get-vulnerabilities", methods=["POST"])
+@query_budget(5)
 @login_required
 def get_vulnerabilities():
     data = request.get_json()
@@ -362,12 +675,16 @@ def get_vulnerabilities():
         data["sc_id"]
     )
 
+    scores = database_manager.get_vuln_scores_by_user(
+        [vuln.id for vuln in vulns],
+        getattr(current_user, "id"),
+        data.get("av_id"),
+    )
+
     result = []
     for vuln in vulns:
         _vuln = vuln.as_dict()
-        _vuln["score"] = database_manager.get_vuln_score_by_user(
-            vuln.id, getattr(current_user, "id")
-        )
+        _vuln["score"] = scores[vuln.id]
         result.append(_vuln)
 
     return jsonify(result)
@@ -378,11 +695,21 @@ def get_vulnerabilities():
 def update_vulnerability_score():
     data = request.get_json()
 
-    database_manager.update_vulnerability_score(
-        vuln_id=data["vuln_id"],
-        score=data["score"],
-        user_id=current_user.id,  # type: ignore
-    )
+    if "vuln_id" not in data:
+        return jsonify({"error": "Missing vulnerability_id"}), 400
+
+    if "score" not in data:
+        return jsonify({"error": "Missing score"}), 400
+
+    try:
+        database_manager.update_vulnerability_score(
+            vuln_id=data["vuln_id"],
+            score=data["score"],
+            user_id=current_user.id,  # type: ignore
+            analysis_vulnerability_id=data.get("av_id"),
+        )
+    except KeyError:
+        return jsonify({"error": "Vulnerability not found"}), 404
 
     return jsonify({})
 
@@ -395,8 +722,12 @@ def delete_category():
     if "c_id" not in data:
         return jsonify({"error": "Missing category_id"}), 400
 
+    if "av_id" not in data:
+        return jsonify({"error": "Missing analysis_vulnerability_id"}), 400
+
     database_manager.delete_category(
         category_id=data["c_id"],
+        analysis_vulnerability_id=data["av_id"],
     )
 
     return jsonify({})
@@ -1,6 +1,7 @@
 from flask import Blueprint, Flask, render_template
 from flask_login import current_user, login_required
 
+from ..extensions.profiler import query_budget
 from ..forms import OrganForm
 from ..utils import database_manager
 
@@ -8,6 +9,7 @@ bp = Blueprint("application", __name__, url_prefix="/app")
 
 
 @bp.route("/home")
+@query_budget(6)
 @login_required
 def home():
     """Rota principal da aplicação"""
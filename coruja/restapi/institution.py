@@ -4,6 +4,7 @@ from flask_login import current_user, login_required
 from coruja.decorators.proxy import unit_access
 
 from ..decorators import proxy_access
+from ..extensions.profiler import query_budget
 from ..forms import InstitutionForm
 from ..utils import database_manager, form_to_dict
 
@@ -63,6 +64,7 @@ def create_institution():
 
 
 @bp.route("/<int:institution_id>")
+@query_budget(7)
 @login_required
 @proxy_access(kind_object="institution", kind_access="read")
 def get_institution(institution_id: int):
@@ -4,6 +4,7 @@ from flask import Blueprint, Flask, flash, redirect, render_template, request, u
 from flask_login import current_user, login_required
 
 from ..decorators import institution_access, proxy_access
+from ..extensions.profiler import query_budget
 from ..forms import OrganForm
 from ..utils import database_manager, form_to_dict
 
@@ -11,6 +12,7 @@ bp = Blueprint("organ", __name__, url_prefix="/orgao")
 
 
 @bp.route("/<int:organ_id>")
+@query_budget(7)
 @login_required
 @proxy_access(kind_object="organ", kind_access="read")
 def get_organ(organ_id: int):
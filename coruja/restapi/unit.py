@@ -5,12 +5,14 @@ from coruja.decorators.proxy import analysis_access
 from coruja.forms import UnitForm
 
 from ..decorators import proxy_access
+from ..extensions.profiler import query_budget
 from ..utils import database_manager, form_to_dict
 
 bp = Blueprint("unit", __name__, url_prefix="/unidade")
 
 
 @bp.route("/<int:unit_id>")
+@query_budget(7)
 @login_required
 @proxy_access(kind_object="unit", kind_access="read")
 def get_unit(unit_id: int):
@@ -1,12 +1,37 @@
 import re
+from datetime import datetime, timedelta
+from time import perf_counter
 from typing import Any, Dict, List, Optional, Tuple, overload
 
+from flask import abort, current_app, g
 from flask_login import current_user
 from flask_wtf import FlaskForm
+from sqlalchemy import (
+    and_,
+    bindparam,
+    exists,
+    func,
+    insert,
+    inspect,
+    literal,
+    or_,
+    select,
+    tuple_,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import aliased
+from sqlalchemy.orm.util import identity_key
 from wtforms import ValidationError
 
-from .extensions.database import db
+from .extensions.database import (
+    IDENTITY_CACHE_KEY,
+    db,
+    get_identity_stats,
+)
 from .models import (
     Active,
     ActiveScore,
@@ -15,24 +40,57 @@ from .models import (
     Analysis,
     AnalysisRisk,
     AnalysisVulnerability,
+    Change,
+    HierarchyClosure,
     Institution,
     Organ,
+    ScoreRollup,
     Threat,
     Unit,
     User,
     Vulnerability,
     VulnerabilityCategory,
+    VulnerabilityCategoryOverride,
     VulnerabilityScore,
+    VulnerabilitySnapshot,
     VulnerabilitySubCategory,
     analytics_administrators,
     analytics_experts,
     institution_administrators,
-    institution_units,
     organ_administrators,
-    organ_institutions,
-    unit_analysis,
     units_administrators,
 )
+from .models.hierarchy import get_ancestor
+from .models.reports import cached_report, mark_reports_stale
+from .models.rollups import (
+    apply_deltas,
+    get_rollups,
+    merge_deltas,
+    score_deltas,
+)
+from .models.search import search_user_ids
+
+# Chave de um item pontuável, na ordem das colunas do item em SCORE_TYPES
+ScoreKey = Tuple[int, ...]
+
+# Tipo do item: (model da pontuação, colunas do item, colunas de pontuação)
+SCORE_TYPES = {
+    "active": (
+        ActiveScore,
+        ("active_id",),
+        ("substitutability", "replacement_cost", "essentiality"),
+    ),
+    "adverse_action": (
+        AdverseActionScore,
+        ("adverse_action_id",),
+        ("motivation", "capacity", "accessibility"),
+    ),
+    "vulnerability": (
+        VulnerabilityScore,
+        ("analysis_vulnerability_id", "vulnerability_id"),
+        ("score",),
+    ),
+}
 
 
 def form_to_dict(form: FlaskForm) -> Dict[Any, Any]:
@@ -87,10 +145,199 @@ class UniqueData:
                 raise ValidationError(self.message)
 
 
+def parse_datetime(value: str, end: bool = False) -> Optional[datetime]:
+    """Converte um parâmetro de data (`AAAA-MM-DD`) ou data e hora
+    (`AAAA-MM-DDTHH:MM[:SS]`) de um filtro de intervalo
+
+    Args:
+        value (str): Valor recebido
+        end (bool, optional): Se True, é o limite final (exclusivo) do
+            intervalo e datas sem hora incluem o dia inteiro.
+            Defaults to False.
+
+    Returns:
+        Optional[datetime]: Data e hora, ou None se o valor for vazio ou
+            inválido
+    """
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if end and "T" not in value and " " not in value:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+class KeysetPagination:
+    """Paginação por chave (seek) ordenada por `(coluna, id)`
+
+    Em vez de OFFSET e COUNT(*), cada página continua a partir da última (ou
+    primeira) linha da página anterior, utilizando o índice da ordenação.
+    O cursor de uma linha é `<coluna em ISO 8601>_<id>`.
+    """
+
+    def __init__(
+        self,
+        query: Any,
+        column: Any,
+        id_column: Any,
+        per_page: int = 10,
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+    ):
+        """Construtor de KeysetPagination
+
+        Args:
+            query (Query): Consulta já filtrada, sem ordenação
+            column (InstrumentedAttribute): Coluna (datetime) da ordenação
+            id_column (InstrumentedAttribute): Chave primária (desempate)
+            per_page (int, optional): Itens por página. Defaults to 10.
+            after (Optional[str], optional): Cursor; obtém a página seguinte
+                a ele. Defaults to None.
+            before (Optional[str], optional): Cursor; obtém a página anterior
+                a ele. Defaults to None.
+        """
+        self.query = query
+        self.column = column
+        self.id_column = id_column
+        self.per_page = per_page
+
+        cursor = self.decode(before) if before else None
+        backward = cursor is not None
+        if not backward:
+            cursor = self.decode(after) if after else None
+
+        items = self.fetch(cursor, backward, per_page + 1)
+        has_more = len(items) > per_page
+        items = items[:per_page]
+
+        if backward:
+            items.reverse()
+            self.has_prev, self.has_next = has_more, True
+        else:
+            self.has_prev, self.has_next = cursor is not None, has_more
+        self.items = items
+
+    @staticmethod
+    def seek(
+        column: Any,
+        id_column: Any,
+        cursor: Tuple[datetime, int],
+        backward: bool = False,
+    ) -> Tuple[Any, Tuple]:
+        """Condição e ordenação das linhas após (ou antes de) um cursor
+
+        Args:
+            column (ColumnElement): Coluna (datetime) da ordenação
+            id_column (ColumnElement): Coluna de desempate
+            cursor (Tuple[datetime, int]): Cursor decodificado
+            backward (bool, optional): Se True, linhas anteriores ao cursor,
+                em ordem decrescente. Defaults to False.
+
+        Returns:
+            Tuple[Any, Tuple]: Condição e colunas do ORDER BY
+        """
+        value, _id = cursor
+        if backward:
+            condition = and_(
+                column <= value, or_(column < value, id_column < _id)
+            )
+            return condition, (column.desc(), id_column.desc())
+
+        condition = and_(column >= value, or_(column > value, id_column > _id))
+        return condition, (column, id_column)
+
+    def fetch(
+        self,
+        cursor: Optional[Tuple[datetime, int]],
+        backward: bool,
+        limit: int,
+    ) -> List[Any]:
+        """Obtém as linhas após (ou antes de) um cursor, na ordem da página
+
+        Args:
+            cursor (Optional[Tuple[datetime, int]]): Cursor decodificado
+            backward (bool): Se True, linhas anteriores ao cursor, em ordem
+                decrescente
+            limit (int): Quantidade máxima de linhas
+
+        Returns:
+            List[Any]: Linhas
+        """
+        query = self.query
+        order: Tuple = (self.column, self.id_column)
+        if backward:
+            order = (self.column.desc(), self.id_column.desc())
+        if cursor is not None:
+            condition, order = self.seek(
+                self.column, self.id_column, cursor, backward
+            )
+            query = query.filter(condition)
+        return query.order_by(*order).limit(limit).all()
+
+    def encode(self, item: Any) -> str:
+        value = getattr(item, self.column.key)
+        return f"{value.isoformat()}_{getattr(item, self.id_column.key)}"
+
+    @staticmethod
+    def decode(cursor: str) -> Optional[Tuple[datetime, int]]:
+        try:
+            value, _id = cursor.rsplit("_", 1)
+            return datetime.fromisoformat(value), int(_id)
+        except ValueError:
+            return None
+
+    @property
+    def prev_cursor(self) -> Optional[str]:
+        return self.encode(self.items[0]) if self.items else None
+
+    @property
+    def next_cursor(self) -> Optional[str]:
+        return self.encode(self.items[-1]) if self.items else None
+
+
 class DatabaseManager:
     def __init__(self):
         self.__db = db
 
+    def _get_by_id(
+        self, model: Any, object_id: int, or_404: bool, message: str
+    ) -> Any:
+        """Obtém um objeto pela chave primária
+
+        Objetos já carregados na sessão (e não expirados por um commit) são
+        retornados pelo mapa de identidade sem consultar o banco; os demais
+        são carregados com `session.get`. Como o mapa de identidade guarda
+        apenas referências fracas, os objetos obtidos são mantidos em
+        `flask.g` até o fim da requisição.
+
+        Args:
+            model (Any): Model
+            object_id (int): ID do objeto
+            or_404 (bool): Se True, `abort(404)` caso o objeto não exista
+            message (str): Descrição do erro 404
+
+        Returns:
+            Any: O objeto ou None, caso não exista e `or_404=False`
+        """
+        session = self.__db.session
+        stats = get_identity_stats()
+
+        obj = session.identity_map.get(identity_key(model, object_id))
+        if obj is not None and not inspect(obj).expired:
+            stats["hits"] += 1
+        else:
+            stats["misses"] += 1
+            obj = session.get(model, object_id)
+
+        if obj is None:
+            if or_404:
+                abort(404, description=message)
+            return None
+
+        g.setdefault(IDENTITY_CACHE_KEY, {})[(model, object_id)] = obj
+        return obj
+
     def get_organs(self, user_id: int) -> List[Organ]:
         """
         Obtém órgãos associados a um usuário com base em seu ID.
@@ -101,100 +348,50 @@ class DatabaseManager:
         Return:
             list[Organ]: Uma lista de objetos Organ associados ao usuário especificado.
         """
-        organ_admin_alias = aliased(organ_administrators)
-        institution_admin_alias = aliased(institution_administrators)
-        unit_admin_alias = aliased(units_administrators)
-
-        # 1. Órgãos onde o user_id é um dos administradores
-        query_1 = Organ.query.join(
-            organ_admin_alias,
-            Organ.id == organ_admin_alias.c.organ_id,
-        ).filter(organ_admin_alias.c.user_id == user_id)
-
-        # 2. Órgãos relacionados às instituições onde o user_id é um dos administradores
-        query_2 = (
-            Organ.query.join(
-                organ_institutions,
-                (organ_institutions.c.organ_id == Organ.id),
-            )
-            .join(
-                institution_admin_alias,
-                institution_admin_alias.c.institution_id
-                == organ_institutions.c.institution_id,
-            )
-            .filter(institution_admin_alias.c.user_id == user_id)
-        )
-
-        # 3. Órgãos relacionados às unidades onde o user_id é um dos administradores
-        query_3 = (
-            Organ.query.join(
-                organ_institutions,
-                (organ_institutions.c.organ_id == Organ.id),
-            )
-            .join(
-                institution_units,
-                institution_units.c.institution_id
-                == organ_institutions.c.institution_id,
-            )
-            .join(
-                unit_admin_alias,
-                unit_admin_alias.c.unit_id == institution_units.c.unit_id,
-            )
-            .filter(unit_admin_alias.c.user_id == user_id)
-        )
-
-        # 4. Órgãos relacionados às análises onde o user_id é um dos administradores
-        query_4 = (
-            Organ.query.join(
-                organ_institutions,
-                (organ_institutions.c.organ_id == Organ.id),
-            )
-            .join(
-                institution_units,
-                institution_units.c.institution_id
-                == organ_institutions.c.institution_id,
-            )
-            .join(
-                unit_analysis,
-                unit_analysis.c.unit_id == institution_units.c.unit_id,
-            )
-            .join(
-                analytics_administrators,
-                analytics_administrators.c.analysis_id
-                == unit_analysis.c.analysis_id,
-            )
-            .filter(analytics_administrators.c.user_id == user_id)
-        )
-
-        # 5. Órgãos relacionados às análises onde o user_id é um dos experts
-        query_5 = (
-            Organ.query.join(
-                organ_institutions,
-                (organ_institutions.c.organ_id == Organ.id),
-            )
-            .join(
-                institution_units,
-                institution_units.c.institution_id
-                == organ_institutions.c.institution_id,
-            )
-            .join(
-                unit_analysis,
-                unit_analysis.c.unit_id == institution_units.c.unit_id,
-            )
+        # Objetos da hierarquia administrados (ou avaliados) pelo usuário
+        user_nodes = union_all(
+            select(
+                literal("organ").label("object_type"),
+                organ_administrators.c.organ_id.label("object_id"),
+            ).where(organ_administrators.c.user_id == user_id),
+            select(
+                literal("institution"),
+                institution_administrators.c.institution_id,
+            ).where(institution_administrators.c.user_id == user_id),
+            select(
+                literal("unit"),
+                units_administrators.c.unit_id,
+            ).where(units_administrators.c.user_id == user_id),
+            select(
+                literal("analysis"),
+                analytics_administrators.c.analysis_id,
+            ).where(analytics_administrators.c.user_id == user_id),
+            select(
+                literal("analysis"),
+                analytics_experts.c.analysis_id,
+            ).where(analytics_experts.c.user_id == user_id),
+        ).subquery()
+
+        # Órgãos ancestrais (ou o próprio órgão) desses objetos
+        organ_ids = (
+            select(HierarchyClosure.ancestor_id)
             .join(
-                analytics_experts,
-                analytics_experts.c.analysis_id == unit_analysis.c.analysis_id,
+                user_nodes,
+                and_(
+                    HierarchyClosure.descendant_type
+                    == user_nodes.c.object_type,
+                    HierarchyClosure.descendant_id == user_nodes.c.object_id,
+                ),
             )
-            .filter(analytics_experts.c.user_id == user_id)
+            .where(HierarchyClosure.ancestor_type == "organ")
         )
 
-        # Query Final:
-        final_query = (
-            query_1.union(query_2).union(query_3).union(query_4).union(query_5)
+        return (
+            Organ.query.filter(Organ.id.in_(organ_ids))
+            .order_by(Organ.id)
+            .all()
         )
 
-        return final_query.all()
-
     def get_organ(
         self,
         organ_id: int,
@@ -213,11 +410,7 @@ class DatabaseManager:
             Organ: O órgão com o ID especificado.
             None: Caso não exista um órgão com o ID especificado.
         """
-        if or_404:
-            message = "Órgão não encontrado"
-            return Organ.query.filter_by(id=organ_id).first_or_404(message)
-
-        return Organ.query.filter_by(id=organ_id).first()
+        return self._get_by_id(Organ, organ_id, or_404, "Órgão não encontrado")
 
     def update_organ(
         self,
@@ -337,14 +530,9 @@ class DatabaseManager:
         Raises:
             NotFoundError: Se a instituição não foi encontrada e `or_404=True`
         """
-        institution = (
-            Institution.query.filter_by(id=institution_id).first_or_404(
-                "Instituição não encontrada"
-            )
-            if or_404
-            else Institution.query.filter_by(id=institution_id).first()
+        return self._get_by_id(
+            Institution, institution_id, or_404, "Instituição não encontrada"
         )
-        return institution
 
     def update_institution(
         self,
@@ -416,14 +604,9 @@ class DatabaseManager:
             Analysis: A análise com o ID especificado.
             None: Caso não exista uma análise com o ID especificado.
         """
-        analysis = (
-            Analysis.query.filter_by(id=analysis_id).first_or_404(
-                "Análise não encontrada"
-            )
-            if or_404
-            else Analysis.query.filter_by(id=analysis_id).first()
+        return self._get_by_id(
+            Analysis, analysis_id, or_404, "Análise não encontrada"
         )
-        return analysis  # type: ignore
 
     def get_unit(
         self,
@@ -444,15 +627,7 @@ class DatabaseManager:
         Raises:
             NotFoundError: Se a unidade não foi encontrada e `or_404=True`
         """
-
-        unit = (
-            Unit.query.filter_by(id=unit_id).first_or_404(
-                "Unidade não encontrada"
-            )
-            if or_404
-            else Unit.query.filter_by(id=unit_id).first()
-        )
-        return unit
+        return self._get_by_id(Unit, unit_id, or_404, "Unidade não encontrada")
 
     def get_user(self, user_id: int, or_404: bool = True) -> User:
         """Obtém um usuário com base em seu ID
@@ -465,16 +640,48 @@ class DatabaseManager:
         Returns:
             User: O usuário com o ID especificado
         """
-        user = (
-            User.query.filter_by(id=user_id).first_or_404(
-                "Usuário com o ID especificado ({}) não foi encontrado".format(
-                    user_id
-                )
-            )
-            if or_404
-            else User.query.filter_by(id=user_id).first()
+        return self._get_by_id(
+            User,
+            user_id,
+            or_404,
+            "Usuário com o ID especificado ({}) não foi encontrado".format(
+                user_id
+            ),
+        )
+
+    def search_users(
+        self, query: str, limit: int = 20, offset: int = 0
+    ) -> List[User]:
+        """Busca usuários pelo nome, e-mails ou prefixo do CPF
+
+        Utiliza o índice de busca do banco (FULLTEXT no MySQL, FTS5 no
+        SQLite ou trigramas em memória nos demais).
+
+        Args:
+            query (str): Busca digitada pelo usuário
+            limit (int, optional): Quantidade máxima de usuários.
+                Defaults to 20.
+            offset (int, optional): Quantidade de usuários ignorados no
+                início. Defaults to 0.
+
+        Returns:
+            List[User]: Usuários, do mais para o menos relevante
+        """
+        user_ids = search_user_ids(
+            db.session.connection(),
+            query.strip(),
+            limit,
+            offset,
+            ttl=current_app.config.get("USER_SEARCH_TRIGRAM_TTL", 0),
         )
-        return user  # type: ignore
+        if not user_ids:
+            return []
+
+        users = {
+            user.id: user
+            for user in User.query.filter(User.id.in_(user_ids)).all()
+        }
+        return [users[user_id] for user_id in user_ids if user_id in users]
 
     def update_user(
         self,
@@ -519,6 +726,10 @@ class DatabaseManager:
         experts = kwargs.pop("experts", [])
         new_analysis = Analysis(description=kwargs.pop("description", None))
 
+        # O ID da análise precisa existir antes da criação das permissões
+        self.__db.session.add(new_analysis)
+        self.__db.session.flush()
+
         for admin_id in administrators:
             admin = self.get_user(admin_id)
             new_analysis.add_administrator(admin, commit_changes=False)
@@ -527,55 +738,189 @@ class DatabaseManager:
             expert = self.get_user(expert_id)
             new_analysis.add_expert(expert, commit_changes=False)
 
-        self.__db.session.add(new_analysis)
-        self.__db.session.commit()
+        # Com o catálogo compartilhado (copy-on-write), a análise apenas
+        # referencia a versão atual do catálogo modelo
+        snapshot_id, stats = None, None
+        if current_app.config.get("VULNERABILITY_CATALOG_COPY_ON_WRITE"):
+            snapshot, stats = self.get_current_vulnerability_snapshot()
+            snapshot_id = snapshot.id
 
         new_analysis_risk = AnalysisRisk(analysis_id=new_analysis.id)
-        self.__db.session.add(new_analysis_risk)
-        self.__db.session.commit()
-
         new_analysis_vulnerability = AnalysisVulnerability(
-            analysis_id=new_analysis.id
+            analysis_id=new_analysis.id, snapshot_id=snapshot_id
+        )
+        self.__db.session.add_all(
+            [new_analysis, new_analysis_risk, new_analysis_vulnerability]
         )
+        self.__db.session.flush()
 
-        self.__db.session.add(new_analysis_vulnerability)
+        if snapshot_id is None:
+            stats = self.clone_vulnerability_template(
+                new_analysis_vulnerability
+            )
         self.__db.session.commit()
 
-        for vuln_category in VulnerabilityCategory.query.filter_by(
-            is_template=True
-        ).all():
-            new_vuln_category = VulnerabilityCategory(
-                name=vuln_category.name,
+        if snapshot_id is not None:
+            current_app.logger.info(
+                "Análise %d criada com o catálogo compartilhado %d",
+                new_analysis.id,
+                snapshot_id,
+            )
+        if stats is not None:
+            current_app.logger.info(
+                "Análise %d criada: %d categorias, %d subcategorias e %d"
+                " vulnerabilidades copiadas em %.1f ms",
+                new_analysis.id,
+                stats["categories"],
+                stats["subcategories"],
+                stats["vulnerabilities"],
+                stats["elapsed_ms"],
+            )
+
+        return new_analysis
+
+    def get_current_vulnerability_snapshot(
+        self,
+    ) -> Tuple[VulnerabilitySnapshot, Optional[Dict[str, float]]]:
+        """Obtém a versão atual do catálogo compartilhado de
+        vulnerabilidades, criando-a (cópia do catálogo modelo) caso o
+        catálogo modelo tenha sido alterado desde a última versão. A
+        transação não é confirmada.
+
+        Returns:
+            Tuple[VulnerabilitySnapshot, Optional[Dict[str, float]]]: A
+                versão do catálogo e, caso tenha sido criada, as
+                estatísticas da cópia (`clone_vulnerability_template`)
+        """
+        snapshot = (
+            VulnerabilitySnapshot.query.filter_by(is_current=True)
+            .order_by(VulnerabilitySnapshot.id.desc())
+            .first()
+        )
+        if snapshot:
+            return snapshot, None
+
+        snapshot = VulnerabilitySnapshot()
+        self.__db.session.add(snapshot)
+        self.__db.session.flush()
+
+        return snapshot, self.clone_vulnerability_template(snapshot)
+
+    def clone_vulnerability_template(
+        self, target: AnalysisVulnerability | VulnerabilitySnapshot
+    ) -> Dict[str, float]:
+        """Copia o catálogo modelo de vulnerabilidades (categorias,
+        subcategorias e vulnerabilidades com `is_template=True`) para uma
+        análise de vulnerabilidade ou para uma versão do catálogo
+        compartilhado.
+
+        O catálogo é lido com três consultas. Categorias e subcategorias
+        são inseridas em um único flush (que mapeia os novos IDs) e as
+        vulnerabilidades com um único executemany. A transação não é
+        confirmada.
+
+        Args:
+            target (AnalysisVulnerability | VulnerabilitySnapshot): Análise
+                de vulnerabilidade ou versão do catálogo de destino
+
+        Returns:
+            Dict[str, float]: Quantidades copiadas (`categories`,
+                `subcategories` e `vulnerabilities`) e o tempo da cópia em
+                milissegundos (`elapsed_ms`)
+        """
+        start = perf_counter()
+        session = self.__db.session
+
+        categories = session.execute(
+            select(VulnerabilityCategory.id, VulnerabilityCategory.name)
+            .where(VulnerabilityCategory.is_template.is_(True))
+            .order_by(VulnerabilityCategory.id)
+        ).all()
+        subcategories = session.execute(
+            select(
+                VulnerabilitySubCategory.id,
+                VulnerabilitySubCategory.name,
+                VulnerabilitySubCategory.category_id,
+            )
+            .join(
+                VulnerabilityCategory,
+                VulnerabilitySubCategory.category_id
+                == VulnerabilityCategory.id,
+            )
+            .where(
+                VulnerabilityCategory.is_template.is_(True),
+                VulnerabilitySubCategory.is_template.is_(True),
+            )
+            .order_by(VulnerabilitySubCategory.id)
+        ).all()
+        vulnerabilities = session.execute(
+            select(
+                Vulnerability.name,
+                Vulnerability.description,
+                Vulnerability.sub_category_id,
+            )
+            .join(
+                VulnerabilitySubCategory,
+                Vulnerability.sub_category_id == VulnerabilitySubCategory.id,
+            )
+            .join(
+                VulnerabilityCategory,
+                VulnerabilitySubCategory.category_id
+                == VulnerabilityCategory.id,
+            )
+            .where(
+                VulnerabilityCategory.is_template.is_(True),
+                VulnerabilitySubCategory.is_template.is_(True),
+                Vulnerability.is_template.is_(True),
+            )
+            .order_by(Vulnerability.id)
+        ).all()
+
+        is_snapshot = isinstance(target, VulnerabilitySnapshot)
+        new_categories = {
+            category_id: VulnerabilityCategory(
+                name=name,
                 is_template=False,
-                analysis_vulnerability_id=new_analysis_vulnerability.id,
+                analysis_vulnerability_id=(None if is_snapshot else target.id),
+                snapshot_id=target.id if is_snapshot else None,
             )
-            self.__db.session.add(new_vuln_category)
-            self.__db.session.commit()
+            for category_id, name in categories
+        }
 
-            for vuln_subcategory in VulnerabilitySubCategory.query.filter_by(
-                category_id=vuln_category.id, is_template=True
-            ).all():
-                new_vuln_subcategory = VulnerabilitySubCategory(
-                    name=vuln_subcategory.name,
-                    category_id=new_vuln_category.id,
-                    is_template=False,
-                )
-                self.__db.session.add(new_vuln_subcategory)
-                self.__db.session.commit()
-
-                for vuln in Vulnerability.query.filter_by(
-                    sub_category_id=vuln_subcategory.id, is_template=True
-                ).all():
-                    new_vuln = Vulnerability(
-                        name=vuln.name,
-                        description=vuln.description,
-                        sub_category_id=new_vuln_subcategory.id,
-                        is_template=False,
-                    )
-                    self.__db.session.add(new_vuln)
-                    self.__db.session.commit()
+        new_subcategories = {}
+        for subcategory_id, name, category_id in subcategories:
+            new_subcategory = VulnerabilitySubCategory(
+                name=name, is_template=False
+            )
+            new_subcategory.category = new_categories[category_id]
+            new_subcategories[subcategory_id] = new_subcategory
+
+        session.add_all(new_categories.values())
+        session.add_all(new_subcategories.values())
+        session.flush()
+
+        # As vulnerabilidades não possuem filhos, então não é necessário
+        # obter seus IDs e todas são inseridas com um único executemany
+        new_vulnerabilities = [
+            {
+                "name": name,
+                "description": description,
+                "sub_category_id": new_subcategories[subcategory_id].id,
+                "is_template": False,
+            }
+            for name, description, subcategory_id in vulnerabilities
+        ]
+        if new_vulnerabilities:
+            session.execute(
+                insert(Vulnerability.__table__), new_vulnerabilities
+            )
 
-        return new_analysis
+        return {
+            "categories": len(new_categories),
+            "subcategories": len(new_subcategories),
+            "vulnerabilities": len(new_vulnerabilities),
+            "elapsed_ms": (perf_counter() - start) * 1000,
+        }
 
     def update_analysis(
         self,
@@ -614,243 +959,458 @@ class DatabaseManager:
         db.session.commit()
         return analysis
 
-    def get_vuln_factor(
-        self, analysis_vulnerability: AnalysisVulnerability
-    ) -> float:
-        """Retorna o fator de vulnerabilidade de uma dada analise de vulnerabilidade"""
+    def get_catalog_condition(
+        self,
+        analysis_vulnerability: Any = AnalysisVulnerability,
+    ) -> Any:
+        """Obtém a condição que seleciona as categorias de vulnerabilidade
+        do catálogo de uma análise de vulnerabilidade: a sua própria cópia
+        ou as categorias do catálogo compartilhado que ela não ocultou.
 
-        experts = getattr(
-            self.get_analysis(analysis_vulnerability.analysis_id),
-            "experts",
-            [],
-        )
-        experts_count = len(experts)
+        Args:
+            analysis_vulnerability (AnalysisVulnerability, optional):
+                Análise de vulnerabilidade. Padrão é o próprio model, para
+                utilizar a condição em um JOIN com `AnalysisVulnerability`.
 
-        categories = getattr(
-            analysis_vulnerability, "vulnerability_categories", []
+        Returns:
+            ColumnElement: Condição sobre `VulnerabilityCategory`
+        """
+        own = (
+            VulnerabilityCategory.analysis_vulnerability_id
+            == analysis_vulnerability.id
+        )
+        shared = and_(
+            VulnerabilityCategory.snapshot_id
+            == analysis_vulnerability.snapshot_id,
+            ~exists().where(
+                VulnerabilityCategoryOverride.analysis_vulnerability_id
+                == analysis_vulnerability.id,
+                VulnerabilityCategoryOverride.category_id
+                == VulnerabilityCategory.id,
+                VulnerabilityCategoryOverride.is_hidden.is_(True),
+            ),
         )
 
-        m_categories = []  # média das categorias
-        for category in categories:
-            subcategories = VulnerabilitySubCategory.query.filter_by(
-                category_id=category.id, is_template=False
-            ).all()
-
-            m_subs = []  # média das subcategorias
-
-            for subcategory in subcategories:
-                vulnerabilities = Vulnerability.query.filter_by(
-                    sub_category_id=subcategory.id, is_template=False
-                ).all()
-
-                m_vulns = []  # médias das vulnerabilidades
-                for vuln in vulnerabilities:
-                    vuln_scores = VulnerabilityScore.query.filter_by(
-                        vulnerability_id=vuln.id
-                    ).all()
-
-                    # média da vulnerabilidade
-                    m_vuln = (
-                        sum(score.score for score in vuln_scores)
-                        / experts_count
-                        if experts_count > 0
-                        else 0
-                    )
-                    m_vulns.append(m_vuln)
+        if not isinstance(analysis_vulnerability, AnalysisVulnerability):
+            return or_(own, shared)
+        if analysis_vulnerability.snapshot_id is None:
+            return own
+        return shared
 
-                # média da subcategoria
-                m_sub = sum(m_vulns) / len(m_vulns) if len(m_vulns) > 0 else 0
-                m_subs.append(m_sub)
+    def get_vuln_factor(
+        self, analysis_vulnerability: AnalysisVulnerability
+    ) -> float:
+        """Retorna o fator de vulnerabilidade de uma dada analise de vulnerabilidade"""
 
-            # média da categoria
-            m_category = sum(m_subs) / len(m_subs) if len(m_subs) > 0 else 0
-            m_categories.append(m_category)
+        return self.get_vuln_factor_breakdown(analysis_vulnerability)["factor"]
 
-        # fator de vulnerabilidade
-        return (
-            sum(m_categories) / len(m_categories)
-            if len(m_categories) > 0
-            else 0
-        )
+    def get_vuln_factor_breakdown(
+        self, analysis_vulnerability: AnalysisVulnerability
+    ) -> Dict[str, Any]:
+        """Calcula o fator de vulnerabilidade e as médias de cada nível
+        (categoria, subcategoria e vulnerabilidade).
 
-    def get_threat_score(self, threat: Threat, analysis: Analysis) -> float:
-        """Retorna o score de uma dada ameaça
+        Toda a árvore de vulnerabilidades e a soma das notas de cada
+        vulnerabilidade (pré-agregada em `ScoreRollup`) são obtidas em uma
+        única consulta, e as médias são calculadas em memória.
 
         Args:
-            threat (Threat): ameaça
+            analysis_vulnerability (AnalysisVulnerability): Análise de
+                vulnerabilidade
 
         Returns:
-            float: score
+            Dict[str, Any]: Dicionário com a seguinte estrutura:
+            >>> {
+            ...    "factor": float,
+            ...    "categories": [
+            ...        {
+            ...            "id": int,
+            ...            "average": float,
+            ...            "subcategories": [
+            ...                {
+            ...                    "id": int,
+            ...                    "average": float,
+            ...                    "vulnerabilities": [
+            ...                        {"id": int, "average": float},
+            ...                        ...
+            ...                    ]
+            ...                },
+            ...                ...
+            ...            ]
+            ...        },
+            ...        ...
+            ...    ]
+            ... }
         """
+        experts_count = (
+            self.__db.session.query(func.count())
+            .select_from(analytics_experts)
+            .filter(
+                analytics_experts.c.analysis_id
+                == analysis_vulnerability.analysis_id
+            )
+            .scalar()
+        )
 
-        experts = getattr(analysis, "experts", [])
-        adverse_actions = AdverseAction.query.filter_by(
-            threat_id=threat.id
-        ).all()
+        rows = (
+            self.__db.session.query(
+                VulnerabilityCategory.id,
+                VulnerabilitySubCategory.id,
+                Vulnerability.id,
+                func.coalesce(ScoreRollup.total, 0),
+            )
+            .select_from(VulnerabilityCategory)
+            .outerjoin(
+                VulnerabilitySubCategory,
+                and_(
+                    VulnerabilitySubCategory.category_id
+                    == VulnerabilityCategory.id,
+                    VulnerabilitySubCategory.is_template.is_(False),
+                ),
+            )
+            .outerjoin(
+                Vulnerability,
+                and_(
+                    Vulnerability.sub_category_id
+                    == VulnerabilitySubCategory.id,
+                    Vulnerability.is_template.is_(False),
+                ),
+            )
+            .outerjoin(
+                ScoreRollup,
+                and_(
+                    ScoreRollup.object_type == "vulnerability",
+                    ScoreRollup.object_id == Vulnerability.id,
+                    ScoreRollup.scope_id == analysis_vulnerability.id,
+                    ScoreRollup.field == "score",
+                ),
+            )
+            .filter(self.get_catalog_condition(analysis_vulnerability))
+            .order_by(
+                VulnerabilityCategory.id,
+                VulnerabilitySubCategory.id,
+                Vulnerability.id,
+            )
+            .all()
+        )
 
-        m_adverse_actions = []
-        for adverse_action in adverse_actions:
-            scores = AdverseActionScore.query.filter_by(
-                adverse_action_id=adverse_action.id
-            ).all()
-            m_adverse_action = (
-                sum(
-                    (score.capacity + score.motivation + score.accessibility)
-                    / 3
-                    for score in scores
+        # categoria -> subcategoria -> vulnerabilidade -> média
+        tree: Dict[int, Dict[int, Dict[int, float]]] = {}
+        for category_id, subcategory_id, vuln_id, total in rows:
+            subcategories = tree.setdefault(category_id, {})
+            if subcategory_id is None:
+                continue
+
+            vulns = subcategories.setdefault(subcategory_id, {})
+            if vuln_id is None:
+                continue
+
+            # média da vulnerabilidade
+            vulns[vuln_id] = total / experts_count if experts_count > 0 else 0
+
+        def mean(values: List[float]) -> float:
+            return sum(values) / len(values) if len(values) > 0 else 0
+
+        categories = []
+        for category_id, subcategories in tree.items():
+            _subcategories = []
+            for subcategory_id, vulns in subcategories.items():
+                _subcategories.append(
+                    {
+                        "id": subcategory_id,
+                        # média da subcategoria
+                        "average": mean(list(vulns.values())),
+                        "vulnerabilities": [
+                            {"id": vuln_id, "average": average}
+                            for vuln_id, average in vulns.items()
+                        ],
+                    }
                 )
-                / len(scores)
-                if len(scores) > 0
-                else 0
+
+            categories.append(
+                {
+                    "id": category_id,
+                    # média da categoria
+                    "average": mean([s["average"] for s in _subcategories]),
+                    "subcategories": _subcategories,
+                }
             )
-            m_adverse_actions.append(m_adverse_action)
 
-        return sum(m_adverse_actions) / len(experts) if len(experts) > 0 else 0
+        return {
+            # fator de vulnerabilidade
+            "factor": mean([c["average"] for c in categories]),
+            "categories": categories,
+        }
+
+    def _adverse_action_mean(
+        self, rollup: Dict[str, Tuple[int, int, int]]
+    ) -> float:
+        """Média das pontuações de uma ação adversa (média de
+        motivação, capacidade e acessibilidade de cada especialista)"""
+        count = rollup.get("motivation", (0, 0, 0))[0]
+        if count == 0:
+            return 0
+
+        total = sum(
+            rollup.get(field, (0, 0, 0))[1]
+            for field in ("motivation", "capacity", "accessibility")
+        )
+        return total / 3 / count
 
-    def get_actives_by_analysis(
+    def get_risk_matrix(
         self,
         analysis: Analysis,
-        with_average_scores: bool = True,
-    ) -> List[Active]:
-        """Obtém lista de ativos de uma determinada análise (ou seja, lista
-        de ativos de uma análise de risco que está relacionada com a Análise
-        especificada).
+        user_id: int | None = None,
+    ) -> List[Dict[str, Any]]:
+        """Obtém a matriz de risco de uma análise: ativos com as médias de
+        seus scores, suas ameaças (com score) e as ações adversas de cada
+        ameaça (com os scores do usuário especificado).
+
+        Ativos, ameaças, ações adversas, os totais pré-agregados dos scores
+        (`ScoreRollup`) e os scores do usuário são carregados com um número
+        constante de consultas (filtradas pela análise de risco) e as
+        médias são calculadas em uma única passada.
 
         Args:
             analysis (Analysis): Análise
-            with_average_scores (bool, optional): Se True, inclui as médias
-                dos scores dos ativos. Defaults to True.
+            user_id (int | None, optional): ID do usuário cujos scores das
+                ações adversas serão retornados. Padrão é None
+                (`current_user`).
 
         Returns:
-            List[Active]: Lista de ativos.
+            List[Dict[str, Any]]: Lista de ativos (com os campos do ativo,
+                `score`, `scores` e `threats`).
         """
+        user_id = user_id or current_user.id  # type: ignore [current_user isn't None]
         analysis_risk = analysis.analysis_risk
-        if not analysis_risk:
+        if not analysis_risk or not analysis.analysis_vulnerability:
             return []
 
-        analysis_vulnerability = analysis.analysis_vulnerability
+        experts_count = (
+            self.__db.session.query(func.count())
+            .select_from(analytics_experts)
+            .filter(analytics_experts.c.analysis_id == analysis.id)
+            .scalar()
+        )
 
-        if not analysis_vulnerability:
-            return []
+        actives = (
+            Active.query.filter_by(analysis_risk_id=analysis_risk.id)
+            .order_by(Active.id)
+            .all()
+        )
+        threats = (
+            Threat.query.join(Active, Threat.active_id == Active.id)
+            .filter(Active.analysis_risk_id == analysis_risk.id)
+            .order_by(Threat.id)
+            .all()
+        )
+        adverse_actions = (
+            AdverseAction.query.join(
+                Threat, AdverseAction.threat_id == Threat.id
+            )
+            .join(Active, Threat.active_id == Active.id)
+            .filter(Active.analysis_risk_id == analysis_risk.id)
+            .order_by(AdverseAction.id)
+            .all()
+        )
 
-        actives = Active.query.filter_by(
-            analysis_risk_id=analysis_risk.id
-        ).all()
+        active_rollups = get_rollups(
+            "active", [active.id for active in actives]
+        )
+        action_rollups = get_rollups(
+            "adverse_action", [action.id for action in adverse_actions]
+        )
+        user_action_scores: Dict[int, Dict[str, int]] = {}
+        if adverse_actions:
+            rows = (
+                self.__db.session.query(
+                    AdverseActionScore.adverse_action_id,
+                    AdverseActionScore.motivation,
+                    AdverseActionScore.capacity,
+                    AdverseActionScore.accessibility,
+                )
+                .filter(
+                    AdverseActionScore.user_id == user_id,
+                    AdverseActionScore.adverse_action_id.in_(
+                        [action.id for action in adverse_actions]
+                    ),
+                )
+                .order_by(AdverseActionScore.id)
+                .all()
+            )
+            for action_id, mot, cap, acc in rows:
+                user_action_scores.setdefault(
+                    action_id,
+                    {"motivation": mot, "capacity": cap, "accessibility": acc},
+                )
+
+        actions_by_threat: Dict[int, List[Dict[str, Any]]] = {}
+        threat_sums: Dict[int, float] = {}
+        for adverse_action in adverse_actions:
+            threat_sums[adverse_action.threat_id] = threat_sums.get(
+                adverse_action.threat_id, 0
+            ) + self._adverse_action_mean(
+                action_rollups.get(adverse_action.id, {})
+            )
 
-        if with_average_scores:
-            _actives = []
-            for active in actives:
-                active_scores: List[ActiveScore] = ActiveScore.query.filter_by(
-                    active_id=active.id
-                ).all()
+            _adverse_action = adverse_action.as_dict()
+            _adverse_action["scores"] = user_action_scores.get(
+                adverse_action.id, {}
+            )
+            _adverse_action["score"] = (
+                _adverse_action["scores"].get("motivation", 0)
+                + _adverse_action["scores"].get("capacity", 0)
+                + _adverse_action["scores"].get("accessibility", 0)
+            ) / 3
+            actions_by_threat.setdefault(adverse_action.threat_id, []).append(
+                _adverse_action
+            )
 
-                denominator = (
-                    len(active_scores) if len(active_scores) > 0 else 1
-                )
+        threats_by_active: Dict[int, List[Dict[str, Any]]] = {}
+        for threat in threats:
+            _threat = threat.to_dict()
+            _threat["score"] = (
+                threat_sums.get(threat.id, 0) / experts_count
+                if experts_count > 0
+                else 0
+            )
+            _threat["adverse_actions"] = actions_by_threat.get(threat.id, [])
+            threats_by_active.setdefault(threat.active_id, []).append(_threat)
+
+        _actives = []
+        for active in actives:
+            rollup = active_rollups.get(active.id, {})
+            sub, rep, ess = (
+                rollup.get(field, (0, 0, 0))[1]
+                for field in SCORE_TYPES["active"][2]
+            )
+            total = rollup.get("substitutability", (0, 0, 0))[0]
+            denominator = total if total > 0 else 1
+
+            _active = active.to_dict()
+            _active["average_substitutability"] = sub / denominator
+            _active["average_replacement_cost"] = rep / denominator
+            _active["average_essentiality"] = ess / denominator
+            _active["score"] = (
+                _active["average_substitutability"]
+                + _active["average_replacement_cost"]
+                + _active["average_essentiality"]
+            ) / 3
+            _active["threats"] = threats_by_active.get(active.id, [])
+            _actives.append(_active)
+
+        return _actives
+
+    def get_experts_progress(
+        self,
+        analysis: Analysis,
+        expert_ids: Optional[List[int]] = None,
+    ) -> Dict[int, Tuple[int, int]]:
+        """Obtém o progresso (itens pontuados e total de itens) de todos os
+        especialistas de uma análise.
+
+        São contabilizados os ativos, as ações adversas e as vulnerabilidades
+        da análise. Os totais e os itens pontuados por especialista são
+        obtidos com consultas COUNT/GROUP BY, independente da quantidade de
+        especialistas e de itens.
+
+        Args:
+            analysis (Analysis): Análise
+            expert_ids (Optional[List[int]], optional): IDs dos especialistas.
+                Padrão é None (todos os especialistas da análise).
+
+        Returns:
+            Dict[int, Tuple[int, int]]: Dicionário `{user_id: (scored, total)}`
+
+        Raises:
+            KeyError: Se a análise não possuir análise de risco ou de
+                vulnerabilidade
+        """
+        if expert_ids is None:
+            expert_ids = [expert.id for expert in getattr(analysis, "experts")]
 
-                _active = active.to_dict()
-                _active["average_substitutability"] = sum(
-                    score.substitutability for score in active_scores
-                ) / (denominator)
-
-                _active["average_replacement_cost"] = sum(
-                    score.replacement_cost for score in active_scores
-                ) / (denominator)
-
-                _active["average_essentiality"] = sum(
-                    score.essentiality for score in active_scores
-                ) / (denominator)
-
-                _active["score"] = (
-                    _active["average_substitutability"]
-                    + _active["average_replacement_cost"]
-                    + _active["average_essentiality"]
-                ) / 3
-
-                _active["threats"] = []
-                for threat in active.associated_threats:
-                    threat_score = self.get_threat_score(threat, analysis)
-                    threat_adverse_actions = self.get_adverse_actions(
-                        threat_id=threat.id
-                    )
-                    threat = threat.to_dict()
-                    threat["score"] = threat_score
-                    threat["adverse_actions"] = threat_adverse_actions
-                    _active["threats"].append(threat)
-
-                _actives.append(_active)
-            actives = _actives
-
-        return actives
-
-    def get_expert_stats(
-        self, expert_id: int, analysis: Analysis
-    ) -> Tuple[int, int]:
-        expert = [e for e in getattr(analysis, "experts") if e.id == expert_id]
-        if not expert:
-            raise KeyError("Especialista não encontrado")
-
-        expert = expert[0]
-        scored = 0
-        total = 0
         analysis_risk = AnalysisRisk.query.filter_by(
             analysis_id=analysis.id
         ).first()
         if not analysis_risk:
-            raise KeyError("Analise de risco não encontrada")
+            raise KeyError("Analise de risco não encontrada")
 
-        # Obtém scores de ativos
-        actives = getattr(analysis_risk, "associated_actives")
-        total += len(actives)
-
-        for active in actives:
-            active_score = ActiveScore.query.filter_by(
-                active_id=active.id,
-                user_id=expert.id,
-            ).first()
-
-            if active_score:
-                scored += 1
-
-            # Obtém scores de ações adversas
-            threats = getattr(active, "associated_threats")
-            for threat in threats:
-                adverse_actions = AdverseAction.query.filter_by(
-                    threat_id=threat.id
-                ).all()
-                total += len(adverse_actions)
-                for adverse_action in adverse_actions:
-                    adverse_action_score = AdverseActionScore.query.filter_by(
-                        adverse_action_id=adverse_action.id, user_id=expert.id
-                    ).first()
-                    if adverse_action_score:
-                        scored += 1
-
-        # Obtém scores de Vulnerabilidades
         analysis_vulnerability = getattr(analysis, "analysis_vulnerability")
         if not analysis_vulnerability:
-            raise KeyError("Analise de Vulnerabilidade não encontrada")
+            raise KeyError("Analise de Vulnerabilidade não encontrada")
+
+        session = self.__db.session
+
+        actives = session.query(Active.id).filter(
+            Active.analysis_risk_id == analysis_risk.id
+        )
+        adverse_actions = (
+            session.query(AdverseAction.id)
+            .join(Threat, AdverseAction.threat_id == Threat.id)
+            .join(Active, Threat.active_id == Active.id)
+            .filter(Active.analysis_risk_id == analysis_risk.id)
+        )
+        vulnerabilities = (
+            session.query(Vulnerability.id)
+            .join(
+                VulnerabilitySubCategory,
+                Vulnerability.sub_category_id == VulnerabilitySubCategory.id,
+            )
+            .join(
+                VulnerabilityCategory,
+                VulnerabilitySubCategory.category_id
+                == VulnerabilityCategory.id,
+            )
+            .filter(self.get_catalog_condition(analysis_vulnerability))
+        )
 
-        vulnerability_categories = getattr(
-            analysis_vulnerability, "vulnerability_categories"
+        total = (
+            actives.count() + adverse_actions.count() + vulnerabilities.count()
         )
-        for vuln_category in vulnerability_categories:
-            vuln_subcategories = VulnerabilitySubCategory.query.filter_by(
-                category_id=vuln_category.id
-            ).all()
-            for vuln_subcategory in vuln_subcategories:
-                vulns = Vulnerability.query.filter_by(
-                    sub_category_id=vuln_subcategory.id,
-                ).all()
-                total += len(vulns)
-                for vuln in vulns:
-                    vuln_score = VulnerabilityScore.query.filter_by(
-                        vulnerability_id=vuln.id, user_id=expert.id
-                    ).first()
-                    if vuln_score:
-                        scored += 1
-
-        return scored, total
+
+        if not expert_ids:
+            return {}
+
+        scored = {expert_id: 0 for expert_id in expert_ids}
+
+        for score_model, item_column, items, conditions in (
+            (ActiveScore, ActiveScore.active_id, actives, ()),
+            (
+                AdverseActionScore,
+                AdverseActionScore.adverse_action_id,
+                adverse_actions,
+                (),
+            ),
+            (
+                VulnerabilityScore,
+                VulnerabilityScore.vulnerability_id,
+                vulnerabilities,
+                (
+                    VulnerabilityScore.analysis_vulnerability_id
+                    == analysis_vulnerability.id,
+                ),
+            ),
+        ):
+            rows = (
+                session.query(
+                    score_model.user_id,
+                    func.count(func.distinct(item_column)),
+                )
+                .filter(
+                    score_model.user_id.in_(expert_ids),
+                    item_column.in_(items.scalar_subquery()),
+                    *conditions,
+                )
+                .group_by(score_model.user_id)
+                .all()
+            )
+            for user_id, count in rows:
+                scored[user_id] += count
+
+        return {
+            expert_id: (expert_scored, total)
+            for expert_id, expert_scored in scored.items()
+        }
 
     def update_adverse_actions_score(
         self,
@@ -873,69 +1433,431 @@ class DatabaseManager:
                 atualizado se a atualização for bem-sucedida, None
                 caso contrário.
         """
-        adverse_action_score = AdverseActionScore.query.filter_by(
-            adverse_action_id=adverse_action_id,
-            user_id=user_id,
-        ).first()
-
-        if adverse_action_score:
-            for score, value in scores.items():
-                setattr(adverse_action_score, score, value)
-        else:
-            adverse_action_score = AdverseActionScore(
-                **scores,
-                adverse_action_id=adverse_action_id,
-                user_id=user_id,
-            )
-            self.__db.session.add(adverse_action_score)
-
-        self.__db.session.commit()
+        self.upsert_scores(
+            user_id, {"adverse_action": {(adverse_action_id,): scores}}
+        )
 
     def update_active_score(
         self, active_id: int, scores: Dict[str, Any], user_id: int
     ) -> None:
         """
-        Atualiza a pontuação de um ativo.
+        Atualiza a pontuação de um ativo, criando-a caso ainda não exista.
         """
+        self.upsert_scores(user_id, {"active": {(active_id,): scores}})
 
-        active_score = ActiveScore.query.filter_by(
-            active_id=active_id,
-            user_id=user_id,
-        ).first()
+    def update_vulnerability_score(
+        self,
+        vuln_id: int,
+        score: float,
+        user_id: int,
+        analysis_vulnerability_id: Optional[int] = None,
+    ) -> None:
+        """
+        Atualiza a pontuação de uma vulnerabilidade, criando-a caso ainda
+        não exista.
 
-        for score, value in scores.items():
-            setattr(active_score, score, value)
+        Args:
+            vuln_id (int): ID da vulnerabilidade
+            score (float): Pontuação
+            user_id (int): ID do usuário
+            analysis_vulnerability_id (Optional[int], optional): ID da
+                análise de vulnerabilidade. Obrigatório para vulnerabilidades
+                do catálogo compartilhado. Padrão é None (a análise que
+                possui a vulnerabilidade).
 
-        self.__db.session.commit()
+        Raises:
+            KeyError: Se a análise de vulnerabilidade não for encontrada ou
+                se a vulnerabilidade não pertencer ao catálogo dela
+        """
+        if analysis_vulnerability_id is not None:
+            key = (analysis_vulnerability_id, vuln_id)
+            if not self.get_analyses_by_score_items({"vulnerability": [key]}):
+                raise KeyError("Vulnerabilidade não encontrada")
+        else:
+            analysis_vulnerability_id = self.__db.session.execute(
+                select(VulnerabilityCategory.analysis_vulnerability_id)
+                .join(
+                    VulnerabilitySubCategory,
+                    VulnerabilitySubCategory.category_id
+                    == VulnerabilityCategory.id,
+                )
+                .join(
+                    Vulnerability,
+                    Vulnerability.sub_category_id
+                    == VulnerabilitySubCategory.id,
+                )
+                .where(Vulnerability.id == vuln_id)
+            ).scalar()
+            if analysis_vulnerability_id is None:
+                raise KeyError("Analise de Vulnerabilidade não encontrada")
+
+        self.upsert_scores(
+            user_id,
+            {
+                "vulnerability": {
+                    (analysis_vulnerability_id, vuln_id): {"score": score}
+                }
+            },
+        )
 
-    def update_vulnerability_score(
-        self, vuln_id: int, score: float, user_id: int
-    ) -> None:
+    def get_analyses_by_score_items(
+        self, items: Dict[str, List[ScoreKey]]
+    ) -> Dict[Tuple[str, ScoreKey], int]:
+        """Obtém a análise de cada item pontuável
+
+        Args:
+            items (Dict[str, List[ScoreKey]]): Chaves dos itens por tipo
+                (`"active"`, `"adverse_action"` ou `"vulnerability"`), na
+                ordem das colunas do item em `SCORE_TYPES`, ex:
+                `{"active": [(1,)], "vulnerability": [(av_id, vuln_id)]}`
+
+        Returns:
+            Dict[Tuple[str, ScoreKey], int]: ID da análise por (tipo, chave
+                do item). Itens inexistentes, ou vulnerabilidades fora do
+                catálogo da análise de vulnerabilidade, não são incluídos.
+        """
+        session = self.__db.session
+        analyses: Dict[Tuple[str, ScoreKey], int] = {}
+
+        risk_items = [
+            (_type, _id)
+            for _type in ("active", "adverse_action")
+            for (_id,) in items.get(_type, [])
+        ]
+        if risk_items:
+            rows = session.execute(
+                select(
+                    HierarchyClosure.descendant_type,
+                    HierarchyClosure.descendant_id,
+                    HierarchyClosure.ancestor_id,
+                ).where(
+                    HierarchyClosure.ancestor_type == "analysis",
+                    tuple_(
+                        HierarchyClosure.descendant_type,
+                        HierarchyClosure.descendant_id,
+                    ).in_(risk_items),
+                )
+            )
+            for _type, _id, analysis_id in rows:
+                analyses[(_type, (_id,))] = analysis_id
+
+        if items.get("vulnerability"):
+            rows = session.execute(
+                select(
+                    AnalysisVulnerability.id,
+                    Vulnerability.id,
+                    AnalysisVulnerability.analysis_id,
+                )
+                .join(
+                    VulnerabilitySubCategory,
+                    Vulnerability.sub_category_id
+                    == VulnerabilitySubCategory.id,
+                )
+                .join(
+                    VulnerabilityCategory,
+                    VulnerabilitySubCategory.category_id
+                    == VulnerabilityCategory.id,
+                )
+                .join(AnalysisVulnerability, self.get_catalog_condition())
+                .where(
+                    tuple_(AnalysisVulnerability.id, Vulnerability.id).in_(
+                        items["vulnerability"]
+                    )
+                )
+            )
+            for av_id, _id, analysis_id in rows:
+                analyses[("vulnerability", (av_id, _id))] = analysis_id
+
+        return analyses
+
+    def upsert_scores(
+        self,
+        user_id: int,
+        scores: Dict[str, Dict[ScoreKey, Dict[str, int]]],
+    ) -> Dict[Tuple[str, ScoreKey], str]:
+        """Grava as pontuações de um usuário em uma única transação
+
+        As pontuações são gravadas em lote (executemany) com um upsert
+        nativo do banco (`ON CONFLICT`/`ON DUPLICATE KEY UPDATE`) sobre o
+        índice único (item, usuário). As alterações são registradas em
+        `Change` e os totais pré-agregados (`ScoreRollup`) são atualizados
+        na mesma transação.
+
+        Args:
+            user_id (int): ID do usuário
+            scores (Dict[str, Dict[ScoreKey, Dict[str, int]]]): Valores das
+                pontuações por tipo e chave do item (ver `SCORE_TYPES`), ex:
+                `{"active": {(1,): {"essentiality": 3}}}`
+
+        Returns:
+            Dict[Tuple[str, ScoreKey], str]: Situação por (tipo, chave do
+                item): `"created"`, `"updated"` ou `"unchanged"`
         """
-        Atualiza a pontuação de uma vulnerabilidade.
+        session = self.__db.session
+        now = datetime.now()
+        status: Dict[Tuple[str, ScoreKey], str] = {}
+        deltas: Dict[Any, List[int]] = {}
+
+        try:
+            for _type, items in scores.items():
+                if not items:
+                    continue
+
+                model, item_columns, fields = SCORE_TYPES[_type]
+                table = model.__table__
+                item_cols = [table.c[column] for column in item_columns]
+
+                items = {
+                    tuple(int(_id) for _id in key): {
+                        field: int(value)
+                        for field, value in values.items()
+                        if field in fields
+                    }
+                    for key, values in items.items()
+                }
+
+                existing = {}
+                rows = session.execute(
+                    select(
+                        table.c.id,
+                        table.c.updated_at,
+                        *item_cols,
+                        *(table.c[field] for field in fields),
+                    )
+                    .where(
+                        table.c.user_id == user_id,
+                        tuple_(*item_cols).in_(list(items)),
+                    )
+                    .order_by(table.c.id)
+                )
+                for row in rows:
+                    key = tuple(row._mapping[column] for column in item_cols)
+                    existing.setdefault(key, row._mapping)
+
+                inserts, updates = [], []
+                for key, values in items.items():
+                    item = dict(zip(item_columns, key))
+                    # O último valor da chave é o item; os demais, o escopo
+                    scope_id = key[0] if len(key) > 1 else 0
+                    row = existing.get(key)
+                    if row is None:
+                        created = {
+                            field: values.get(field, 0) for field in fields
+                        }
+                        inserts.append({**created, **item, "user_id": user_id})
+                        merge_deltas(
+                            deltas,
+                            score_deltas(
+                                _type, key[-1], None, created, scope_id
+                            ),
+                        )
+                        status[(_type, key)] = "created"
+                        continue
+
+                    old = {
+                        field: row[field]
+                        for field in values
+                        if row[field] != values[field]
+                    }
+                    if not old:
+                        status[(_type, key)] = "unchanged"
+                        continue
+
+                    new = {field: values[field] for field in old}
+                    merge_deltas(
+                        deltas,
+                        score_deltas(_type, key[-1], old, new, scope_id),
+                    )
+                    updates.append(
+                        {
+                            **{field: row[field] for field in fields},
+                            **new,
+                            **item,
+                            "user_id": user_id,
+                        }
+                    )
+                    session.add(
+                        Change(
+                            object_old={
+                                **old,
+                                "id": row["id"],
+                                "updated_at": row["updated_at"],
+                            },
+                            object_new={
+                                **new,
+                                "id": row["id"],
+                                "updated_at": now,
+                            },
+                            user_id=user_id,
+                            object_type=model.__name__,
+                        )
+                    )
+                    status[(_type, key)] = "updated"
+
+                upsert = self._upsert_statement(
+                    table, [*item_columns, "user_id"], (*fields, "updated_at")
+                )
+                if upsert is not None and (inserts or updates):
+                    session.execute(
+                        upsert,
+                        [
+                            {**row, "updated_at": now}
+                            for row in inserts + updates
+                        ],
+                    )
+                    continue
+
+                if inserts:
+                    session.execute(insert(table), inserts)
+                if updates:
+                    session.execute(
+                        update(table)
+                        .where(
+                            *(
+                                table.c[column] == bindparam(f"_{column}")
+                                for column in (*item_columns, "user_id")
+                            )
+                        )
+                        .values(
+                            updated_at=now,
+                            **{field: bindparam(field) for field in fields},
+                        ),
+                        [
+                            {
+                                **{field: row[field] for field in fields},
+                                **{
+                                    f"_{column}": row[column]
+                                    for column in (*item_columns, "user_id")
+                                },
+                            }
+                            for row in updates
+                        ],
+                    )
+
+            apply_deltas(session.connection(), deltas)
+
+            # As pontuações não passam pelo flush da sessão
+            changed: Dict[str, List[ScoreKey]] = {}
+            for (_type, key), _status in status.items():
+                if _status != "unchanged":
+                    changed.setdefault(_type, []).append(key)
+            if changed:
+                mark_reports_stale(
+                    session,
+                    self.get_analyses_by_score_items(changed).values(),
+                )
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+        return status
+
+    def _upsert_statement(
+        self, table: Any, index_elements: List[str], fields: Tuple[str, ...]
+    ) -> Any:
+        """Obtém um INSERT que atualiza `fields` quando a linha já existe
+        (`ON CONFLICT` no SQLite/PostgreSQL e `ON DUPLICATE KEY UPDATE` no
+        MySQL/MariaDB)
+
+        Returns:
+            Insert | None: O comando ou None caso o banco não suporte
         """
-        print("vuln_id", vuln_id)
-        print("user_id", user_id)
-        print("score", score)
-        vuln_score = VulnerabilityScore.query.filter_by(
-            vulnerability_id=vuln_id, user_id=user_id  # type: ignore
-        ).first()
+        dialect = self.__db.session.get_bind().dialect.name
+
+        if dialect in ("sqlite", "postgresql"):
+            if dialect == "sqlite":
+                statement = sqlite_insert(table)
+            else:
+                statement = postgresql_insert(table)
+            return statement.on_conflict_do_update(
+                index_elements=index_elements,
+                set_={field: statement.excluded[field] for field in fields},
+            )
 
-        print(vuln_score)
+        if dialect in ("mysql", "mariadb"):
+            statement = mysql_insert(table)
+            return statement.on_duplicate_key_update(
+                {field: statement.inserted[field] for field in fields}
+            )
 
-        setattr(vuln_score, "score", score)
+        return None
 
-        self.__db.session.commit()
+    def get_analysis_report(
+        self,
+        analysis: Analysis,
+        user_id: int | None = None,
+    ) -> Dict[str, Any]:
+        """Obtém o relatório exibido na página de uma análise: progresso dos
+        especialistas, matriz de risco e fator de vulnerabilidade.
+
+        O relatório é mantido em cache (ver `ANALYSIS_REPORT_CACHE`) até que
+        uma transação altere as pontuações, ativos, ameaças, ações adversas,
+        vulnerabilidades ou especialistas da análise.
+
+        Args:
+            analysis (Analysis): Análise
+            user_id (int | None, optional): ID do usuário cujos scores das
+                ações adversas serão exibidos. Padrão é None
+                (`current_user`).
+
+        Returns:
+            Dict[str, Any]: Dicionário com a seguinte estrutura:
+            >>> {
+            ...    "experts": [
+            ...        {
+            ...            "id": int,
+            ...            "name": str,
+            ...            "cpf_censored": str,
+            ...            "scored": int,
+            ...            "not_scored": int,
+            ...            "total": int,
+            ...            "average_score": float,
+            ...        },
+            ...        ...
+            ...    ],
+            ...    "actives": [...],  # ver `get_risk_matrix`
+            ...    "vuln_factor": float,
+            ... }
+        """
+        user_id = user_id or current_user.id  # type: ignore [current_user isn't None]
+
+        def build() -> Dict[str, Any]:
+            experts = [
+                {
+                    "id": expert.id,
+                    "name": expert.name,
+                    "cpf_censored": expert.cpf_censored,
+                    "scored": expert.scored,
+                    "not_scored": expert.not_scored,
+                    "total": expert.total,
+                    "average_score": expert.average_score,
+                }
+                for expert in self.get_experts_by_analysis(analysis)
+            ]
+            vuln_factor = (
+                self.get_vuln_factor(analysis.analysis_vulnerability)
+                if analysis.analysis_vulnerability
+                else 0
+            )
+            return {
+                "experts": experts,
+                "actives": self.get_risk_matrix(analysis, user_id),
+                "vuln_factor": vuln_factor,
+            }
+
+        return cached_report(analysis.id, user_id, build)
 
     def get_experts_by_analysis(
         self,
         analysis: Analysis,
     ):
         experts = getattr(analysis, "experts", [])
+        progress = self.get_experts_progress(
+            analysis, [expert.id for expert in experts]
+        )
         for expert in experts:
-            scored, total = database_manager.get_expert_stats(
-                expert.id, analysis
-            )
+            scored, total = progress[expert.id]
             expert.scored = scored
             expert.not_scored = total - scored
             expert.total = total
@@ -1019,15 +1941,6 @@ class DatabaseManager:
 
         return active
 
-    def add_active_score(self, **kwargs) -> ActiveScore:
-        """Adiciona uma pontuação de um ativo ao banco de dados"""
-        active_score = ActiveScore(**kwargs)
-
-        self.__db.session.add(active_score)
-        self.__db.session.commit()
-
-        return active_score
-
     def add_threat(self, **kwargs) -> Threat:
         """Adiciona uma ameaça ao banco de dados"""
         threat = Threat(**kwargs)
@@ -1064,44 +1977,32 @@ class DatabaseManager:
         Raises:
             NotFoundError: Se `or_404=True` e a analise de risco não foi encontrada
         """
-        analysis_risk = (
-            AnalysisRisk.query.filter_by(id=analysis_risk_id).first_or_404(
-                "Análise de Risco não encontrada"
-            )
-            if or_404
-            else AnalysisRisk.query.filter_by(id=analysis_risk_id).first()
+        return self._get_by_id(
+            AnalysisRisk,
+            analysis_risk_id,
+            or_404,
+            "Análise de Risco não encontrada",
         )
 
-        return analysis_risk
-
     def get_threat(self, threat_id: int, or_404: bool = True) -> Threat | None:
         """Obtém uma ameaça por ID"""
 
-        threat = (
-            Threat.query.filter_by(id=threat_id).first_or_404(
-                "Ameaça não encontrada"
-            )
-            if or_404
-            else Threat.query.filter_by(id=threat_id).first()
+        return self._get_by_id(
+            Threat, threat_id, or_404, "Ameaça não encontrada"
         )
 
-        return threat
-
     def get_adverse_action(
         self, adverse_action_id: int, or_404: bool = True
     ) -> AdverseAction | None:
         """Obtém uma ação adversa por ID"""
 
-        adverse_action = (
-            AdverseAction.query.filter_by(id=adverse_action_id).first_or_404(
-                "Ação Adversa não encontrada"
-            )
-            if or_404
-            else AdverseAction.query.filter_by(id=adverse_action_id).first()
+        return self._get_by_id(
+            AdverseAction,
+            adverse_action_id,
+            or_404,
+            "Ação Adversa não encontrada",
         )
 
-        return adverse_action
-
     def get_analysis_vulnerability(
         self, analysis_vulnerability_id: int, or_404: bool = True
     ) -> AnalysisVulnerability | None:
@@ -1118,16 +2019,12 @@ class DatabaseManager:
         Raises:
             NotFoundError: Se `or_404=True` e a analise de vulnerabilidade não foi encontrada
         """
-        analysis_vulnerability = (
-            AnalysisVulnerability.query.filter_by(
-                id=analysis_vulnerability_id
-            ).first_or_404("Análise de Vulnerabilidade não encontrada")
-            if or_404
-            else AnalysisVulnerability.query.filter_by(
-                id=analysis_vulnerability_id
-            ).first()
+        return self._get_by_id(
+            AnalysisVulnerability,
+            analysis_vulnerability_id,
+            or_404,
+            "Análise de Vulnerabilidade não encontrada",
         )
-        return analysis_vulnerability
 
     def get_active(self, active_id: int, or_404: bool = True) -> Active | None:
         """Obtém um ativo por ID
@@ -1140,98 +2037,56 @@ class DatabaseManager:
             Active: O objeto do ativo
             None: Caso não exista um ativo com o ID especificado
         """
-        active = (
-            Active.query.filter_by(id=active_id).first_or_404(
-                "Ativo não encontrado"
-            )
-            if or_404
-            else Active.query.filter_by(id=active_id).first()
+        return self._get_by_id(
+            Active, active_id, or_404, "Ativo não encontrado"
         )
-        return active
-
-    def get_experts_by_threat(self, threat_id: int) -> List[User]:
-        """Obtém os experts relacionados à uma Análise -> Análise de Risco -> Ativo -> Ameaça"""
-
-        _threat = self.get_threat(threat_id)
-        _active = self.get_active(getattr(_threat, "active_id"))
-        _analysis_risk = self.get_analysis_risk(
-            getattr(_active, "analysis_risk_id")
-        )
-        _analysis = self.get_analysis(getattr(_analysis_risk, "analysis_id"))
-        return self.get_experts_by_analysis(_analysis)  # type: ignore
 
-    def get_adverse_actions(
-        self,
-        *,
-        threat_id: int,
-        user_id: int | None = None,
-        with_scores: bool = True,
-    ) -> List[Dict]:
-        """Obtém uma lista de ações adversas
+    def get_adverse_actions_by_threat_ids(
+        self, threat_ids: List[int], user_id: int
+    ) -> Dict[int, List[Dict]]:
+        """Obtém as ações adversas de várias ameaças, com as pontuações de um
+        usuário, em duas consultas
 
         Args:
-            threat_id (int): ID da Ameaça com a qual está relacionadas as ações adversas
-            with_scores (bool, optional): Se True, atribui scores. Padrão é True.
-            user_id (int | None, optional): ID do usuário que atribuiu notas
-                (Caso `with_scores=True`). Padrão é None.
-                Caso user_id = None, então todos os usuários serão considerados.
+            threat_ids (List[int]): IDs das ameaças
+            user_id (int): ID do usuário que atribuiu as notas
 
         Returns:
-            List[AdverseAction]: A lista de ações adversas
+            Dict[int, List[Dict]]: Ações adversas (com `scores` e `score`)
+                por ID da ameaça
         """
-        user_id = user_id or current_user.id  # type: ignore [current_user isn't None]
-        _adverse_actions = AdverseAction.query.filter_by(
-            threat_id=threat_id
-        ).all()
-        _new_adverse_actions = []
-        for adverse_action in _adverse_actions:
-            adverse_action = adverse_action.as_dict()
-            if with_scores:
-                adverse_action_scores = AdverseActionScore.query.filter_by(
-                    adverse_action_id=adverse_action["id"]
-                )
-                if user_id:
-                    adverse_action_scores = adverse_action_scores.filter_by(
-                        user_id=user_id
-                    ).first()
-                else:
-                    experts = self.get_experts_by_threat(threat_id)
-                    experts_count = len(experts)
-
-                    adverse_action_scores = adverse_action_scores.all()
-
-                    motivation, capacity, accessibility = (0, 0, 0)
-                    for adverse_action_score in adverse_action_scores:
-                        motivation += adverse_action_score.motivation
-                        capacity += adverse_action_score.capacity
-                        accessibility += adverse_action_score.accessibility
-
-                    motivation /= experts_count if experts_count > 0 else 1
-                    capacity /= experts_count if experts_count > 0 else 1
-                    accessibility /= experts_count if experts_count > 0 else 1
-
-                    adverse_action_scores = AdverseActionScore(
-                        motivation=int(motivation),
-                        capacity=int(capacity),
-                        accessibility=int(accessibility),
-                        user_id=0,
-                        adverse_action_id=0,
-                    )
-
-                adverse_action["scores"] = (
-                    adverse_action_scores.as_dict()
-                    if adverse_action_scores
-                    else {}
-                )
-                adverse_action["score"] = (
-                    adverse_action["scores"].get("motivation", 0)
-                    + adverse_action["scores"].get("capacity", 0)
-                    + adverse_action["scores"].get("accessibility", 0)
-                ) / 3
+        adverse_actions: Dict[int, List[Dict]] = {
+            threat_id: [] for threat_id in threat_ids
+        }
+        if not adverse_actions:
+            return adverse_actions
+
+        rows = (
+            AdverseAction.query.filter(AdverseAction.threat_id.in_(threat_ids))
+            .order_by(AdverseAction.id)
+            .all()
+        )
+        scores = {
+            score.adverse_action_id: score.as_dict()
+            for score in AdverseActionScore.query.filter(
+                AdverseActionScore.adverse_action_id.in_(
+                    [row.id for row in rows]
+                ),
+                AdverseActionScore.user_id == user_id,
+            )
+        }
 
-            _new_adverse_actions.append(adverse_action)
+        for row in rows:
+            adverse_action = row.as_dict()
+            adverse_action["scores"] = scores.get(row.id, {})
+            adverse_action["score"] = (
+                adverse_action["scores"].get("motivation", 0)
+                + adverse_action["scores"].get("capacity", 0)
+                + adverse_action["scores"].get("accessibility", 0)
+            ) / 3
+            adverse_actions[row.threat_id].append(adverse_action)
 
-        return _new_adverse_actions
+        return adverse_actions
 
     def add_vulnerability_category(self, name: str) -> None:
         """Adiciona uma nova categoria de vulnerabilidade
@@ -1391,12 +2246,7 @@ class DatabaseManager:
         Returns:
             Institution | None: O objeto da instituição
         """
-        institution_units_alias = aliased(institution_units)
-        return (
-            Institution.query.join(institution_units_alias)
-            .filter(institution_units_alias.c.unit_id == unit_id)
-            .first()
-        )
+        return get_ancestor(Institution, "unit", unit_id)
 
     def get_unit_by_analysis(self, analysis_id: int) -> Unit | None:
         """Obtém uma unidade por análise
@@ -1407,29 +2257,24 @@ class DatabaseManager:
         Returns:
             Unit | None: O objeto da unidade ou None
         """
-        unit_analysis_alias = aliased(unit_analysis)
-        return (
-            Unit.query.join(unit_analysis_alias).filter(
-                unit_analysis_alias.c.analysis_id == analysis_id
-            )
-        ).first()
+        return get_ancestor(Unit, "analysis", analysis_id)
 
     def get_organ_by_institution(self, institution_id: int) -> Organ | None:
-        organ_institutions_alias = aliased(organ_institutions)
-        return (
-            Organ.query.join(organ_institutions_alias)
-            .filter(
-                organ_institutions_alias.c.institution_id == institution_id
-            )
-            .first()
-        )
+        return get_ancestor(Organ, "institution", institution_id)
 
     def get_vulns_category_by_analysis_vulnerability_id(
         self,
         av_id: int,
     ) -> List[VulnerabilityCategory]:
-        return VulnerabilityCategory.query.filter_by(
-            analysis_vulnerability_id=av_id, is_template=False
+        analysis_vulnerability = self.get_analysis_vulnerability(
+            av_id, or_404=False
+        )
+        if not analysis_vulnerability:
+            return []
+
+        return VulnerabilityCategory.query.filter(
+            self.get_catalog_condition(analysis_vulnerability),
+            VulnerabilityCategory.is_template.is_(False),
         ).all()
 
     def get_vuln_sub_categories_by_category_id(
@@ -1446,24 +2291,302 @@ class DatabaseManager:
             sub_category_id=sc_id, is_template=False
         ).all()
 
-    def get_vuln_score_by_user(
-        self, vulnerability_id: int, user_id: int
-    ) -> int:
-        score = VulnerabilityScore.query.filter_by(
-            vulnerability_id=vulnerability_id, user_id=user_id
-        ).first()
+    def get_vulnerabilities_by_subcategory_ids(
+        self, sc_ids: List[int]
+    ) -> Dict[int, List[Vulnerability]]:
+        """Obtém as vulnerabilidades de várias subcategorias com uma única
+        consulta
+
+        Args:
+            sc_ids (List[int]): IDs das subcategorias
+
+        Returns:
+            Dict[int, List[Vulnerability]]: Vulnerabilidades por ID da
+                subcategoria (inclusive subcategorias sem vulnerabilidades)
+        """
+        vulnerabilities: Dict[int, List[Vulnerability]] = {
+            sc_id: [] for sc_id in sc_ids
+        }
+        if not vulnerabilities:
+            return vulnerabilities
+
+        rows = (
+            Vulnerability.query.filter(
+                Vulnerability.sub_category_id.in_(sc_ids),
+                Vulnerability.is_template.is_(False),
+            )
+            .order_by(Vulnerability.id)
+            .all()
+        )
+        for vulnerability in rows:
+            vulnerabilities[vulnerability.sub_category_id].append(
+                vulnerability
+            )
+        return vulnerabilities
+
+    def get_vuln_scores_by_user(
+        self,
+        vulnerability_ids: List[int],
+        user_id: int,
+        analysis_vulnerability_id: Optional[int] = None,
+    ) -> Dict[int, int]:
+        """Obtém as pontuações de um usuário para várias vulnerabilidades
+
+        Vulnerabilidades ainda não pontuadas recebem a pontuação padrão (0),
+        sem gravar nada no banco.
+
+        Args:
+            vulnerability_ids (List[int]): IDs das vulnerabilidades
+            user_id (int): ID do usuário
+            analysis_vulnerability_id (Optional[int], optional): ID da
+                análise de vulnerabilidade. Obrigatório para vulnerabilidades
+                do catálogo compartilhado. Padrão é None.
+
+        Returns:
+            Dict[int, int]: Pontuação por ID da vulnerabilidade
+        """
+        scores = {
+            vulnerability_id: 0 for vulnerability_id in vulnerability_ids
+        }
+        if not scores:
+            return scores
+
+        query = self.__db.session.query(
+            VulnerabilityScore.vulnerability_id, VulnerabilityScore.score
+        ).filter(
+            VulnerabilityScore.user_id == user_id,
+            VulnerabilityScore.vulnerability_id.in_(vulnerability_ids),
+        )
+        if analysis_vulnerability_id is not None:
+            query = query.filter(
+                VulnerabilityScore.analysis_vulnerability_id
+                == analysis_vulnerability_id
+            )
+
+        rows = query.order_by(VulnerabilityScore.id.desc()).all()
+        for vulnerability_id, score in rows:
+            scores[vulnerability_id] = score
+
+        return scores
+
+    def get_active_scores_by_user(
+        self, active_ids: List[int], user_id: int
+    ) -> Dict[int, Dict[str, int]]:
+        """Obtém as pontuações de um usuário para vários ativos
+
+        Ativos ainda não pontuados recebem as pontuações padrão (0), sem
+        gravar nada no banco.
+
+        Args:
+            active_ids (List[int]): IDs dos ativos
+            user_id (int): ID do usuário
+
+        Returns:
+            Dict[int, Dict[str, int]]: Pontuações por ID do ativo
+        """
+        fields = SCORE_TYPES["active"][2]
+        scores = {
+            active_id: {field: 0 for field in fields}
+            for active_id in active_ids
+        }
+        if not scores:
+            return scores
+
+        rows = (
+            self.__db.session.query(
+                ActiveScore.active_id,
+                *(getattr(ActiveScore, field) for field in fields),
+            )
+            .filter(
+                ActiveScore.user_id == user_id,
+                ActiveScore.active_id.in_(active_ids),
+            )
+            .order_by(ActiveScore.id.desc())
+            .all()
+        )
+        for active_id, *values in rows:
+            scores[active_id] = dict(zip(fields, values))
+
+        return scores
+
+    def get_analysis_risk_workspace(
+        self, analysis_risk_id: int, user_id: int
+    ) -> Dict[str, Any]:
+        """Obtém a árvore de ativos, ameaças e ações adversas de uma análise
+        de risco, com as pontuações de um usuário
+
+        Utiliza uma quantidade constante de consultas (ativos, pontuações dos
+        ativos, ameaças, ações adversas e pontuações das ações adversas).
+
+        Args:
+            analysis_risk_id (int): ID da análise de risco
+            user_id (int): ID do usuário
+
+        Returns:
+            Dict[str, Any]: Ativos por ID, no formato de `get-user-actives`,
+                cada um com as suas ameaças (`threats`) no formato de
+                `get-threats`
+        """
+        actives = (
+            Active.query.filter(Active.analysis_risk_id == analysis_risk_id)
+            .order_by(Active.id)
+            .all()
+        )
+        active_ids = [active.id for active in actives]
+        active_scores = self.get_active_scores_by_user(active_ids, user_id)
+
+        threats = (
+            Threat.query.filter(Threat.active_id.in_(active_ids))
+            .order_by(Threat.id)
+            .all()
+            if active_ids
+            else []
+        )
+        adverse_actions = self.get_adverse_actions_by_threat_ids(
+            [threat.id for threat in threats], user_id
+        )
+
+        workspace: Dict[str, Any] = {
+            "analysis_risk_id": analysis_risk_id,
+            "actives": {
+                active.id: {
+                    "id": active.id,
+                    "title": active.title,
+                    "description": active.description,
+                    "scores": active_scores[active.id],
+                    "threats": {},
+                }
+                for active in actives
+            },
+        }
+        for threat in threats:
+            workspace["actives"][threat.active_id]["threats"][threat.id] = {
+                "title": threat.title,
+                "description": threat.description,
+                "adverses_actions": adverse_actions[threat.id],
+            }
+        return workspace
+
+    def get_analysis_vulnerability_workspace(
+        self, analysis_vulnerability: AnalysisVulnerability, user_id: int
+    ) -> Dict[str, Any]:
+        """Obtém a árvore de categorias, subcategorias e vulnerabilidades de
+        uma análise de vulnerabilidade, com as pontuações de um usuário
+
+        Utiliza quatro consultas (categorias, subcategorias, vulnerabilidades
+        e pontuações).
+
+        Args:
+            analysis_vulnerability (AnalysisVulnerability): Análise de
+                vulnerabilidade
+            user_id (int): ID do usuário
+
+        Returns:
+            Dict[str, Any]: Categorias por ID, no formato de
+                `get-categories`, cada uma com as suas subcategorias
+                (`subcategories`) no formato de `get-subcategories`
+        """
+        categories = (
+            VulnerabilityCategory.query.filter(
+                self.get_catalog_condition(analysis_vulnerability),
+                VulnerabilityCategory.is_template.is_(False),
+            )
+            .order_by(VulnerabilityCategory.id)
+            .all()
+        )
+        category_ids = [category.id for category in categories]
+
+        subcategories = (
+            VulnerabilitySubCategory.query.filter(
+                VulnerabilitySubCategory.category_id.in_(category_ids),
+                VulnerabilitySubCategory.is_template.is_(False),
+            )
+            .order_by(VulnerabilitySubCategory.id)
+            .all()
+            if category_ids
+            else []
+        )
+        vulnerabilities = self.get_vulnerabilities_by_subcategory_ids(
+            [subcategory.id for subcategory in subcategories]
+        )
+        scores = self.get_vuln_scores_by_user(
+            [
+                vulnerability.id
+                for items in vulnerabilities.values()
+                for vulnerability in items
+            ],
+            user_id,
+            analysis_vulnerability.id,
+        )
 
-        if not score:
-            score = VulnerabilityScore(
-                vulnerability_id=vulnerability_id, user_id=user_id
+        workspace: Dict[str, Any] = {
+            "analysis_vulnerability_id": analysis_vulnerability.id,
+            "categories": {
+                category.id: {**category.as_dict(), "subcategories": []}
+                for category in categories
+            },
+        }
+        for subcategory in subcategories:
+            workspace["categories"][subcategory.category_id][
+                "subcategories"
+            ].append(
+                {
+                    **subcategory.as_dict(),
+                    "vulnerabilities": [
+                        {
+                            **vulnerability.as_dict(),
+                            "score": scores[vulnerability.id],
+                        }
+                        for vulnerability in vulnerabilities[subcategory.id]
+                    ],
+                }
             )
-            self.__db.session.add(score)
+        return workspace
+
+    def delete_category(
+        self, category_id: int, analysis_vulnerability_id: int
+    ) -> None:
+        """Remove uma categoria do catálogo de uma análise de vulnerabilidade
+
+        Categorias do catálogo compartilhado não são removidas, apenas
+        ocultadas para a análise de vulnerabilidade
+        (`VulnerabilityCategoryOverride`).
+
+        Args:
+            category_id (int): ID da categoria
+            analysis_vulnerability_id (int): ID da análise de
+                vulnerabilidade
+        """
+        category = self.get_category(category_id, or_404=False)
+        if not category:
+            return
+
+        if category.snapshot_id is None:
+            VulnerabilityCategory.query.filter_by(id=category_id).delete()
             self.__db.session.commit()
+            return
 
-        return score.score
+        analysis_vulnerability = self.get_analysis_vulnerability(
+            analysis_vulnerability_id, or_404=False
+        )
+        if (
+            not analysis_vulnerability
+            or analysis_vulnerability.snapshot_id != category.snapshot_id
+        ):
+            return
+
+        override = VulnerabilityCategoryOverride.query.filter_by(
+            analysis_vulnerability_id=analysis_vulnerability_id,
+            category_id=category_id,
+        ).first()
+        if not override:
+            override = VulnerabilityCategoryOverride(
+                analysis_vulnerability_id=analysis_vulnerability_id,
+                category_id=category_id,
+            )
+            self.__db.session.add(override)
 
-    def delete_category(self, category_id: int) -> None:
-        VulnerabilityCategory.query.filter_by(id=category_id).delete()
+        override.is_hidden = True
         self.__db.session.commit()
 
 
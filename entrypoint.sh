@@ -12,6 +12,7 @@ done
 echo "Database connection established."
 
 flask db upgrade head  # Inicialização do banco de dados e migração
+flask rebuildhierarchy  # Garante a tabela de fechamento (já populada pela migração)
 flask createroles
 flask createsu
 uwsgi --ini wsgi.ini
@@ -4,6 +4,10 @@ from logging.config import fileConfig
 from flask import current_app
 
 from alembic import context
+from alembic.operations import ops
+
+from coruja.models.log_partitions import PARTITION_TABLE
+from coruja.models.search import FTS_TABLE, FULLTEXT_INDEX
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -51,6 +55,55 @@ def get_metadata():
     return target_db.metadata
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    # O índice de busca de usuários depende do banco (FULLTEXT no MySQL,
+    # tabela virtual FTS5 e suas tabelas auxiliares no SQLite) e não faz
+    # parte dos models
+    if reflected and compare_to is None:
+        if type_ == 'table' and name.startswith(FTS_TABLE):
+            return False
+        if type_ == 'index' and name == FULLTEXT_INDEX:
+            return False
+        # Tabelas mensais dos logs de acesso (SQLite)
+        if type_ == 'table' and PARTITION_TABLE.match(name):
+            return False
+    # Tabelas particionadas (MySQL) não possuem chaves estrangeiras
+    if (
+        type_ == 'foreign_key_constraint'
+        and not reflected
+        and compare_to is None
+        and object.table.name == 'access_log'
+    ):
+        return False
+    return True
+
+
+def is_access_log_primary_key(op_):
+    # No MySQL a chave primária de `access_log` é (id, access_at), exigida
+    # pelo particionamento, e não a declarada no model
+    if getattr(op_, 'table_name', None) != 'access_log':
+        return False
+    return isinstance(op_, ops.CreatePrimaryKeyOp) or (
+        isinstance(op_, ops.DropConstraintOp)
+        and op_.constraint_type == 'primary'
+    )
+
+
+def exclude_access_log_primary_key(upgrade_ops):
+    for container in list(upgrade_ops.ops):
+        if not isinstance(container, ops.ModifyTableOps):
+            continue
+        container.ops = [
+            op_ for op_ in container.ops
+            if not is_access_log_primary_key(op_)
+        ]
+        if container.is_empty():
+            upgrade_ops.ops.remove(container)
+    upgrade_ops.ops = [
+        op_ for op_ in upgrade_ops.ops if not is_access_log_primary_key(op_)
+    ]
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -65,7 +118,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -86,11 +140,13 @@ def run_migrations_online():
     def process_revision_directives(context, revision, directives):
         if getattr(config.cmd_opts, 'autogenerate', False):
             script = directives[0]
+            exclude_access_log_primary_key(script.upgrade_ops)
             if script.upgrade_ops.is_empty():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
     conf_args = current_app.extensions['migrate'].configure_args
+    conf_args.setdefault('include_object', include_object)
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
 
@@ -0,0 +1,107 @@
+"""hierarchy closure table
+
+Revision ID: 3f9c2a7d1e45
+Revises: b6b511ad4ffd
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2a7d1e45'
+down_revision = 'b6b511ad4ffd'
+branch_labels = None
+depends_on = None
+
+# Tabelas dos objetos da hierarquia
+NODES = {
+    'organ': 'organ',
+    'institution': 'institution',
+    'unit': 'unit',
+    'analysis': 'analysis',
+    'analysis_risk': 'analysis_risk',
+    'active': 'active',
+    'threat': 'threat',
+    'adverse_action': 'adverse_action',
+}
+
+# (tipo filho, tipo pai, tabela de ligação, coluna filho, coluna pai), do
+# topo para a base da hierarquia
+LINKS = (
+    ('institution', 'organ', 'organ_institutions', 'institution_id', 'organ_id'),
+    ('unit', 'institution', 'institution_units', 'unit_id', 'institution_id'),
+    ('analysis', 'unit', 'unit_analysis', 'analysis_id', 'unit_id'),
+    ('analysis_risk', 'analysis', 'analysis_risk', 'id', 'analysis_id'),
+    ('active', 'analysis_risk', 'active', 'id', 'analysis_risk_id'),
+    ('threat', 'active', 'threat', 'id', 'active_id'),
+    ('adverse_action', 'threat', 'adverse_action', 'id', 'threat_id'),
+)
+
+CLOSURE_COLUMNS = (
+    '(ancestor_type, ancestor_id, descendant_type, descendant_id, depth)'
+)
+
+
+def link_source(child_type, parent_type, table, child_col, parent_col):
+    """Ligações (filho, pai) de um nível, ignorando ligações órfãs"""
+    source = (
+        f'{table} AS link '
+        f'JOIN {NODES[parent_type]} AS parent ON parent.id = link.{parent_col}'
+    )
+    if table != NODES[child_type]:
+        source += (
+            f' JOIN {NODES[child_type]} AS child '
+            f'ON child.id = link.{child_col}'
+        )
+    return source
+
+
+def upgrade():
+    op.create_table('hierarchy_closure',
+    sa.Column('ancestor_type', sa.String(length=32), nullable=False),
+    sa.Column('ancestor_id', sa.Integer(), nullable=False),
+    sa.Column('descendant_type', sa.String(length=32), nullable=False),
+    sa.Column('descendant_id', sa.Integer(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('ancestor_type', 'ancestor_id', 'descendant_type', 'descendant_id')
+    )
+    with op.batch_alter_table('hierarchy_closure', schema=None) as batch_op:
+        batch_op.create_index('ix_hierarchy_closure_descendant', ['descendant_type', 'descendant_id', 'depth'], unique=False)
+
+    # Popula a tabela a partir das ligações existentes, com o mesmo
+    # resultado de `flask rebuildhierarchy`. Como cada tipo ocupa um nível
+    # fixo da hierarquia, os ancestrais a uma profundidade `depth` são os
+    # ancestrais do pai a `depth - 1`.
+    for _type, table in NODES.items():
+        op.execute(
+            f'INSERT INTO hierarchy_closure {CLOSURE_COLUMNS} '
+            f"SELECT '{_type}', id, '{_type}', id, 0 FROM {table}"
+        )
+
+    for level, link in enumerate(LINKS, start=1):
+        child_type, parent_type, _, child_col, parent_col = link
+        source = link_source(*link)
+        op.execute(
+            f'INSERT INTO hierarchy_closure {CLOSURE_COLUMNS} '
+            f"SELECT DISTINCT '{parent_type}', link.{parent_col}, "
+            f"'{child_type}', link.{child_col}, 1 FROM {source}"
+        )
+        for depth in range(2, level + 1):
+            op.execute(
+                f'INSERT INTO hierarchy_closure {CLOSURE_COLUMNS} '
+                'SELECT DISTINCT closure.ancestor_type, closure.ancestor_id, '
+                f"'{child_type}', link.{child_col}, {depth} FROM {source} "
+                'JOIN hierarchy_closure AS closure '
+                f"ON closure.descendant_type = '{parent_type}' "
+                f'AND closure.descendant_id = link.{parent_col} '
+                f'AND closure.depth = {depth - 1}'
+            )
+
+
+def downgrade():
+    with op.batch_alter_table('hierarchy_closure', schema=None) as batch_op:
+        batch_op.drop_index('ix_hierarchy_closure_descendant')
+
+    op.drop_table('hierarchy_closure')
@@ -0,0 +1,116 @@
+"""copy-on-write vulnerability catalog
+
+Revision ID: 5b7e9d2c4a10
+Revises: 8d41c6e0b2a9
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e9d2c4a10'
+down_revision = '8d41c6e0b2a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('vulnerability_snapshot',
+    sa.Column('is_current', sa.Boolean(), nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    with op.batch_alter_table('vulnerability_category', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('snapshot_id', sa.Integer(), nullable=True))
+        batch_op.create_index('ix_vulnerability_category_snapshot_id', ['snapshot_id'], unique=False)
+        batch_op.create_foreign_key('fk_vulnerability_category_snapshot_id', 'vulnerability_snapshot', ['snapshot_id'], ['id'])
+
+    with op.batch_alter_table('analysis_vulnerability', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('snapshot_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_analysis_vulnerability_snapshot_id', 'vulnerability_snapshot', ['snapshot_id'], ['id'])
+
+    op.create_table('vulnerability_category_override',
+    sa.Column('analysis_vulnerability_id', sa.Integer(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('is_hidden', sa.Boolean(), nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['analysis_vulnerability_id'], ['analysis_vulnerability.id'], ),
+    sa.ForeignKeyConstraint(['category_id'], ['vulnerability_category.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('vulnerability_category_override', schema=None) as batch_op:
+        batch_op.create_index('uq_vulnerability_category_override', ['analysis_vulnerability_id', 'category_id'], unique=True)
+
+    with op.batch_alter_table('vulnerability_score', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('analysis_vulnerability_id', sa.Integer(), nullable=True))
+
+    # Até aqui cada vulnerabilidade pertencia a uma única análise de
+    # vulnerabilidade (a dona da cópia do catálogo)
+    op.execute(
+        'UPDATE vulnerability_score SET analysis_vulnerability_id = ('
+        'SELECT vulnerability_category.analysis_vulnerability_id '
+        'FROM vulnerability '
+        'JOIN vulnerability_sub_category '
+        'ON vulnerability_sub_category.id = vulnerability.sub_category_id '
+        'JOIN vulnerability_category '
+        'ON vulnerability_category.id = vulnerability_sub_category.category_id '
+        'WHERE vulnerability.id = vulnerability_score.vulnerability_id)'
+    )
+    op.execute(
+        'DELETE FROM vulnerability_score '
+        'WHERE analysis_vulnerability_id IS NULL'
+    )
+
+    # No MySQL o índice único antigo é o único que atende à chave
+    # estrangeira de `vulnerability_id` e não pode ser removido sem outro
+    with op.batch_alter_table('vulnerability_score', schema=None) as batch_op:
+        batch_op.alter_column('analysis_vulnerability_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_foreign_key('fk_vulnerability_score_analysis_vulnerability_id', 'analysis_vulnerability', ['analysis_vulnerability_id'], ['id'])
+        batch_op.create_index('ix_vulnerability_score_vulnerability_id', ['vulnerability_id'], unique=False)
+        batch_op.drop_index('uq_vulnerability_score_vulnerability_user')
+        batch_op.create_index('uq_vulnerability_score_analysis_vulnerability_user', ['analysis_vulnerability_id', 'vulnerability_id', 'user_id'], unique=True)
+
+
+def downgrade():
+    # No MySQL o índice único atende às chaves estrangeiras de
+    # `analysis_vulnerability_id` e `vulnerability_id`: a primeira é
+    # removida antes dele e o índice da segunda só após recriar o antigo
+    with op.batch_alter_table('vulnerability_score', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_vulnerability_score_analysis_vulnerability_id', type_='foreignkey')
+        batch_op.drop_index('uq_vulnerability_score_analysis_vulnerability_user')
+
+    # Vulnerabilidades do catálogo compartilhado podem ter sido pontuadas em
+    # mais de uma análise; mantém a pontuação mais antiga
+    op.execute(
+        'DELETE FROM vulnerability_score WHERE id NOT IN ('
+        'SELECT id FROM (SELECT MIN(id) AS id FROM vulnerability_score '
+        'GROUP BY vulnerability_id, user_id) AS keep)'
+    )
+
+    with op.batch_alter_table('vulnerability_score', schema=None) as batch_op:
+        batch_op.create_index('uq_vulnerability_score_vulnerability_user', ['vulnerability_id', 'user_id'], unique=True)
+        batch_op.drop_index('ix_vulnerability_score_vulnerability_id')
+        batch_op.drop_column('analysis_vulnerability_id')
+
+    with op.batch_alter_table('vulnerability_category_override', schema=None) as batch_op:
+        batch_op.drop_index('uq_vulnerability_category_override')
+
+    op.drop_table('vulnerability_category_override')
+
+    with op.batch_alter_table('analysis_vulnerability', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_analysis_vulnerability_snapshot_id', type_='foreignkey')
+        batch_op.drop_column('snapshot_id')
+
+    with op.batch_alter_table('vulnerability_category', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_vulnerability_category_snapshot_id', type_='foreignkey')
+        batch_op.drop_index('ix_vulnerability_category_snapshot_id')
+        batch_op.drop_column('snapshot_id')
+
+    op.drop_table('vulnerability_snapshot')
@@ -0,0 +1,77 @@
+"""composite indexes and unique constraints
+
+Revision ID: 8d41c6e0b2a9
+Revises: 3f9c2a7d1e45
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41c6e0b2a9'
+down_revision = '3f9c2a7d1e45'
+branch_labels = None
+depends_on = None
+
+# (tabela, índice, colunas, único)
+INDEXES = (
+    ('access_log', 'ix_access_log_user_access_at', ['user_id', 'access_at'], False),
+    ('permission', 'ix_permission_type_object', ['type', 'object_type', 'object_id'], False),
+    ('active_score', 'uq_active_score_active_user', ['active_id', 'user_id'], True),
+    ('adverse_action_score', 'uq_adverse_action_score_adverse_action_user', ['adverse_action_id', 'user_id'], True),
+    ('vulnerability_score', 'uq_vulnerability_score_vulnerability_user', ['vulnerability_id', 'user_id'], True),
+    ('analytics_administrators', 'uq_analytics_administrators', ['analysis_id', 'user_id'], True),
+    ('analytics_experts', 'uq_analytics_experts', ['analysis_id', 'user_id'], True),
+    ('institution_administrators', 'uq_institution_administrators', ['institution_id', 'user_id'], True),
+    ('unit_analysis', 'uq_unit_analysis', ['unit_id', 'analysis_id'], True),
+    ('units_administrators', 'uq_units_administrators', ['unit_id', 'user_id'], True),
+    ('units_staff', 'uq_units_staff', ['unit_id', 'user_id'], True),
+    ('vulnerability_categories', 'uq_vulnerability_categories', ['analysis_vulnerability_id', 'vulnerability_category_id'], True),
+)
+
+
+def remove_duplicates(table, columns):
+    """Remove linhas repetidas antes de criar um índice único"""
+    bind = op.get_bind()
+    cols = ', '.join(columns)
+
+    if table.endswith('_score'):
+        # Mantém a pontuação mais antiga (a mesma lida pela aplicação)
+        bind.execute(sa.text(
+            f'DELETE FROM {table} WHERE id NOT IN ('
+            f'SELECT id FROM (SELECT MIN(id) AS id FROM {table} '
+            f'GROUP BY {cols}) AS keep)'
+        ))
+        return
+
+    # Tabelas de associação não possuem chave primária
+    duplicates = bind.execute(sa.text(
+        f'SELECT {cols} FROM {table} GROUP BY {cols} HAVING COUNT(*) > 1'
+    )).fetchall()
+    where = ' AND '.join(f'{column} = :{column}' for column in columns)
+    for row in duplicates:
+        params = dict(zip(columns, row))
+        bind.execute(sa.text(f'DELETE FROM {table} WHERE {where}'), params)
+        bind.execute(
+            sa.text(
+                f'INSERT INTO {table} ({cols}) VALUES '
+                f'({", ".join(":" + column for column in columns)})'
+            ),
+            params,
+        )
+
+
+def upgrade():
+    for table, name, columns, unique in INDEXES:
+        if unique:
+            remove_duplicates(table, columns)
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(name, columns, unique=unique)
+
+
+def downgrade():
+    for table, name, _, _ in reversed(INDEXES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(name)
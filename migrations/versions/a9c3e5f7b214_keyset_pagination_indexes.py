@@ -0,0 +1,32 @@
+"""keyset pagination indexes for logs
+
+Revision ID: a9c3e5f7b214
+Revises: e7f1a3b5c920
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c3e5f7b214'
+down_revision = 'e7f1a3b5c920'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('access_log', schema=None) as batch_op:
+        batch_op.create_index('ix_access_log_access_at_id', ['access_at', 'id'], unique=False)
+
+    with op.batch_alter_table('change', schema=None) as batch_op:
+        batch_op.create_index('ix_change_created_at_id', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('change', schema=None) as batch_op:
+        batch_op.drop_index('ix_change_created_at_id')
+
+    with op.batch_alter_table('access_log', schema=None) as batch_op:
+        batch_op.drop_index('ix_access_log_access_at_id')
@@ -0,0 +1,36 @@
+"""access_log.access_at not null
+
+Revision ID: b8d0e2f4a618
+Revises: f1c3d5e7a904
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d0e2f4a618'
+down_revision = 'f1c3d5e7a904'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # No MySQL a coluna já é NOT NULL desde o particionamento (d4b8f2a6c371)
+    bind = op.get_bind()
+    if bind.dialect.name in ('mysql', 'mariadb'):
+        return
+
+    op.execute('UPDATE access_log SET access_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE access_at IS NULL')
+    with op.batch_alter_table('access_log', schema=None) as batch_op:
+        batch_op.alter_column('access_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name in ('mysql', 'mariadb'):
+        return
+
+    with op.batch_alter_table('access_log', schema=None) as batch_op:
+        batch_op.alter_column('access_at', existing_type=sa.DateTime(), nullable=True)
@@ -0,0 +1,91 @@
+"""score rollup table
+
+Revision ID: c2a4f6e8b013
+Revises: 5b7e9d2c4a10
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2a4f6e8b013'
+down_revision = '5b7e9d2c4a10'
+branch_labels = None
+depends_on = None
+
+# object_type: (origem, coluna do objeto, coluna do escopo, colunas)
+ROLLUP_SOURCES = {
+    'active': (
+        'active_score',
+        'active_score.active_id',
+        None,
+        ('substitutability', 'replacement_cost', 'essentiality'),
+    ),
+    'adverse_action': (
+        'adverse_action_score',
+        'adverse_action_score.adverse_action_id',
+        None,
+        ('motivation', 'capacity', 'accessibility'),
+    ),
+    'vulnerability': (
+        'vulnerability_score',
+        'vulnerability_score.vulnerability_id',
+        'vulnerability_score.analysis_vulnerability_id',
+        ('score',),
+    ),
+    'vulnerability_subcategory': (
+        'vulnerability_score '
+        'JOIN vulnerability '
+        'ON vulnerability.id = vulnerability_score.vulnerability_id',
+        'vulnerability.sub_category_id',
+        'vulnerability_score.analysis_vulnerability_id',
+        ('score',),
+    ),
+    'vulnerability_category': (
+        'vulnerability_score '
+        'JOIN vulnerability '
+        'ON vulnerability.id = vulnerability_score.vulnerability_id '
+        'JOIN vulnerability_sub_category '
+        'ON vulnerability_sub_category.id = vulnerability.sub_category_id',
+        'vulnerability_sub_category.category_id',
+        'vulnerability_score.analysis_vulnerability_id',
+        ('score',),
+    ),
+}
+
+
+def upgrade():
+    op.create_table('score_rollup',
+    sa.Column('object_type', sa.String(length=32), nullable=False),
+    sa.Column('object_id', sa.Integer(), nullable=False),
+    sa.Column('scope_id', sa.Integer(), nullable=False),
+    sa.Column('field', sa.String(length=32), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('total_squares', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('object_type', 'object_id', 'scope_id', 'field')
+    )
+
+    # Mesmos totais calculados por `rebuild_rollups`, para que as leituras
+    # e as atualizações incrementais partam das pontuações já existentes
+    for object_type, (source, object_col, scope_col, fields) in ROLLUP_SOURCES.items():
+        group_by = object_col if scope_col is None else f'{object_col}, {scope_col}'
+        table = source.split()[0]
+        for field in fields:
+            column = f'{table}.{field}'
+            op.execute(
+                'INSERT INTO score_rollup '
+                '(object_type, object_id, scope_id, field, '
+                'count, total, total_squares) '
+                f"SELECT '{object_type}', {object_col}, {scope_col or 0}, "
+                f"'{field}', COUNT(*), COALESCE(SUM({column}), 0), "
+                f'COALESCE(SUM({column} * {column}), 0) '
+                f'FROM {source} WHERE {object_col} IS NOT NULL '
+                f'GROUP BY {group_by}'
+            )
+
+
+def downgrade():
+    op.drop_table('score_rollup')
@@ -0,0 +1,71 @@
+"""monthly access log partitions
+
+Revision ID: d4b8f2a6c371
+Revises: a9c3e5f7b214
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from datetime import date, datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b8f2a6c371'
+down_revision = 'a9c3e5f7b214'
+branch_labels = None
+depends_on = None
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def upgrade():
+    # No SQLite as tabelas mensais (access_log_pAAAAMM) são criadas sob
+    # demanda e os logs existentes são movidos por `flask maintain-logs`
+    bind = op.get_bind()
+    if bind.dialect.name not in ('mysql', 'mariadb'):
+        return
+
+    # Tabelas particionadas não suportam chaves estrangeiras e a chave
+    # primária precisa conter a coluna do particionamento
+    for foreign_key in sa.inspect(bind).get_foreign_keys('access_log'):
+        op.drop_constraint(foreign_key['name'], 'access_log', type_='foreignkey')
+
+    op.execute('UPDATE access_log SET access_at = COALESCE(created_at, NOW()) WHERE access_at IS NULL')
+    op.execute('ALTER TABLE access_log MODIFY access_at DATETIME NOT NULL')
+    op.execute('ALTER TABLE access_log DROP PRIMARY KEY, ADD PRIMARY KEY (id, access_at)')
+
+    oldest = bind.execute(sa.text('SELECT MIN(access_at) FROM access_log')).scalar()
+    today = datetime.now()
+    month = date((oldest or today).year, (oldest or today).month, 1)
+    last = add_months(date(today.year, today.month, 1), 1)
+
+    partitions = []
+    while month <= last:
+        end = add_months(month, 1)
+        partitions.append(
+            f"PARTITION p{month:%Y%m} VALUES LESS THAN (TO_DAYS('{end:%Y-%m-%d}'))"
+        )
+        month = end
+    partitions.append('PARTITION pmax VALUES LESS THAN MAXVALUE')
+
+    op.execute(
+        'ALTER TABLE access_log PARTITION BY RANGE (TO_DAYS(access_at)) ('
+        + ', '.join(partitions)
+        + ')'
+    )
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name not in ('mysql', 'mariadb'):
+        return
+
+    op.execute('ALTER TABLE access_log REMOVE PARTITIONING')
+    op.execute('ALTER TABLE access_log DROP PRIMARY KEY, ADD PRIMARY KEY (id)')
+    op.execute('ALTER TABLE access_log MODIFY access_at DATETIME NULL')
+    op.create_foreign_key('access_log_ibfk_1', 'access_log', 'user', ['user_id'], ['id'])
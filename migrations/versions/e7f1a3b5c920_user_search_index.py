@@ -0,0 +1,45 @@
+"""user search index
+
+Revision ID: e7f1a3b5c920
+Revises: c2a4f6e8b013
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7f1a3b5c920'
+down_revision = 'c2a4f6e8b013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name in ('mysql', 'mariadb'):
+        op.create_index('ft_user_search', 'user', ['name', 'email_personal', 'email_professional'], mysql_prefix='FULLTEXT')
+    elif bind.dialect.name == 'sqlite':
+        # Sem o módulo FTS5 a busca utiliza o índice de trigramas em memória
+        try:
+            op.execute(
+                'CREATE VIRTUAL TABLE user_search USING fts5('
+                'name, email_personal, email_professional, '
+                "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+        except sa.exc.OperationalError:
+            return
+        op.execute(
+            'INSERT INTO user_search '
+            '(rowid, name, email_personal, email_professional) '
+            'SELECT id, name, email_personal, email_professional FROM "user"'
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name in ('mysql', 'mariadb'):
+        op.drop_index('ft_user_search', table_name='user')
+    elif bind.dialect.name == 'sqlite':
+        op.execute('DROP TABLE IF EXISTS user_search')
@@ -0,0 +1,78 @@
+"""per-analysis permissions for existing analyses
+
+Revision ID: f1c3d5e7a904
+Revises: d4b8f2a6c371
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c3d5e7a904'
+down_revision = 'd4b8f2a6c371'
+branch_labels = None
+depends_on = None
+
+# Permissões atribuídas aos administradores e especialistas de uma análise
+PERMISSION_TYPES = ('read', 'update', 'delete')
+
+# Administradores e especialistas de cada análise
+MEMBERS = (
+    'SELECT analysis_id, user_id FROM analytics_administrators '
+    'UNION '
+    'SELECT analysis_id, user_id FROM analytics_experts'
+)
+
+
+def upgrade():
+    # Análises criadas antes da correção de `add_analysis` atribuíam aos
+    # membros permissões sem o ID da análise, que não concedem mais acesso
+    for permission_type in PERMISSION_TYPES:
+        op.execute(
+            'INSERT INTO permission '
+            '(type, object_type, object_id, created_at, updated_at) '
+            f"SELECT DISTINCT '{permission_type}', 'analysis', "
+            'members.analysis_id, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP '
+            f'FROM ({MEMBERS}) AS members '
+            'WHERE members.analysis_id IS NOT NULL AND NOT EXISTS ('
+            'SELECT 1 FROM permission AS existing '
+            f"WHERE existing.type = '{permission_type}' "
+            "AND existing.object_type = 'analysis' "
+            'AND existing.object_id = members.analysis_id)'
+        )
+
+    op.execute(
+        'INSERT INTO user_permissions (user_id, permission_id) '
+        'SELECT DISTINCT members.user_id, permission.id '
+        f'FROM ({MEMBERS}) AS members '
+        'JOIN permission '
+        "ON permission.object_type = 'analysis' "
+        'AND permission.object_id = members.analysis_id '
+        'WHERE members.user_id IS NOT NULL '
+        f'AND permission.type IN {PERMISSION_TYPES!r} '
+        'AND NOT EXISTS ('
+        'SELECT 1 FROM user_permissions AS existing '
+        'WHERE existing.user_id = members.user_id '
+        'AND existing.permission_id = permission.id)'
+    )
+
+    # Permissões sem o ID da análise não correspondem a nenhum objeto
+    orphans = (
+        'SELECT id FROM permission '
+        "WHERE object_type = 'analysis' AND object_id IS NULL"
+    )
+    op.execute(
+        f'DELETE FROM user_permissions WHERE permission_id IN ({orphans})'
+    )
+    op.execute(
+        'DELETE FROM permission '
+        "WHERE object_type = 'analysis' AND object_id IS NULL"
+    )
+
+
+def downgrade():
+    # As permissões sem o ID da análise não são recriadas: elas não
+    # concediam acesso a uma análise específica
+    pass
@@ -0,0 +1,10 @@
+import pytest
+
+from coruja.benchmarks import BUDGET_SCALES, measure_scales
+
+
+@pytest.fixture(scope="session")
+def query_measures():
+    """Consultas de cada rota de ROUTE_REQUESTS em cada escala de
+    BUDGET_SCALES, medidas em bancos temporários criados por `seeded_app`"""
+    return measure_scales(BUDGET_SCALES)
@@ -0,0 +1,195 @@
+import pytest
+
+from coruja.benchmarks import SEED_PASSWORD, seeded_app
+from coruja.decorators.permissions import (
+    HierarchyGraph,
+    PermissionIndex,
+    get_permission_index,
+)
+from coruja.extensions.database import db
+from coruja.models import Institution, Organ, Permission, Unit, User
+
+# Órgão 1 -> Instituição 10 -> Unidades 100 e 101 -> Análises 1000 e 1010,
+# Órgão 2 -> Instituição 20 -> Unidade 200 -> Análise 2000 e a
+# Instituição 30, ligada aos dois órgãos, -> Unidade 300 -> Análise 3000
+PARENTS = {
+    ("institution", 10): [("organ", 1)],
+    ("unit", 100): [("institution", 10)],
+    ("unit", 101): [("institution", 10)],
+    ("analysis", 1000): [("unit", 100)],
+    ("analysis", 1010): [("unit", 101)],
+    ("institution", 20): [("organ", 2)],
+    ("unit", 200): [("institution", 20)],
+    ("analysis", 2000): [("unit", 200)],
+    ("institution", 30): [("organ", 1), ("organ", 2)],
+    ("unit", 300): [("institution", 30)],
+    ("analysis", 3000): [("unit", 300)],
+}
+
+ORGAN_1_SUBTREE = [
+    ("organ", 1),
+    ("institution", 10),
+    ("unit", 100),
+    ("unit", 101),
+    ("analysis", 1000),
+    ("analysis", 1010),
+]
+ORGAN_2_SUBTREE = [
+    ("organ", 2),
+    ("institution", 20),
+    ("unit", 200),
+    ("analysis", 2000),
+]
+
+
+def _index(*permissions):
+    return PermissionIndex(permissions, HierarchyGraph(PARENTS))
+
+
+def test_root_follows_first_parent():
+    graph = HierarchyGraph(PARENTS)
+
+    assert graph.root(("analysis", 1000)) == ("organ", 1)
+    assert graph.root(("unit", 200)) == ("organ", 2)
+    assert graph.root(("analysis", 3000)) == ("organ", 1)
+    assert graph.root(("organ", 1)) == ("organ", 1)
+    assert graph.root(("unit", 999)) == ("unit", 999)
+
+
+def test_root_stops_on_cycle():
+    graph = HierarchyGraph(
+        {("unit", 1): [("institution", 1)], ("institution", 1): [("unit", 1)]}
+    )
+
+    assert graph.root(("unit", 1)) in {("unit", 1), ("institution", 1)}
+
+
+@pytest.mark.parametrize(
+    "grant",
+    [
+        ("organ", 1),
+        ("institution", 10),
+        ("unit", 100),
+        ("analysis", 1000),
+    ],
+)
+def test_grant_reaches_own_subtree(grant):
+    """Uma permissão em qualquer nível concede acesso a todo o órgão"""
+    index = _index(("read", *grant))
+
+    for node in ORGAN_1_SUBTREE:
+        assert index.has_access("read", *node)
+
+
+@pytest.mark.parametrize(
+    "grant",
+    [
+        ("organ", 1),
+        ("institution", 10),
+        ("unit", 100),
+        ("analysis", 1000),
+    ],
+)
+def test_grant_denied_on_sibling_subtree(grant):
+    index = _index(("read", *grant))
+
+    for node in ORGAN_2_SUBTREE:
+        assert not index.has_access("read", *node)
+
+
+def test_grant_requires_same_kind_access():
+    index = _index(("read", "unit", 100))
+
+    assert not index.has_access("update", "unit", 100)
+    assert not index.has_access("update", "analysis", 1000)
+
+
+def test_multi_parent_institution_reaches_both_organs():
+    index = _index(("read", "institution", 30))
+
+    for node in [*ORGAN_1_SUBTREE, *ORGAN_2_SUBTREE]:
+        assert index.has_access("read", *node)
+    assert index.has_access("read", "analysis", 3000)
+
+
+def test_multi_parent_descendant_resolves_through_first_organ():
+    assert _index(("read", "organ", 1)).has_access("read", "analysis", 3000)
+    assert not _index(("read", "organ", 2)).has_access(
+        "read", "analysis", 3000
+    )
+
+
+def test_non_hierarchy_permissions_are_exact():
+    index = _index(("read", "access_logs", None), ("update", "user", 5))
+
+    assert index.has_access("read", "access_logs", None)
+    assert index.has_access("update", "user", 5)
+    assert not index.has_access("update", "user", 6)
+    assert not index.has_access("read", "organ", None)
+
+
+@pytest.fixture(params=[0, 3600], ids=["request-cache", "process-cache"])
+def permission_app(request):
+    with seeded_app(organs=2) as (app, ids):
+        app.config["PERMISSION_CACHE_TTL"] = request.param
+        with app.app_context():
+            user = User(
+                name="Usuário",
+                cpf="1" * 11,
+                password=SEED_PASSWORD,
+                email_professional="usuario@coruja",
+            )
+            db.session.add(user)
+            db.session.commit()
+            yield user, ids
+
+
+def _organs():
+    return Organ.query.order_by(Organ.id).all()
+
+
+def test_index_invalidated_on_permission_change(permission_app):
+    user, ids = permission_app
+    organ = _organs()[0]
+
+    assert not get_permission_index(user).has_access(
+        "read", "analysis", ids["analysis_id"]
+    )
+
+    permission = Permission(
+        type="read", object_type="organ", object_id=organ.id
+    )
+    db.session.add(permission)
+    user.add_permission(permission)
+    assert get_permission_index(user).has_access(
+        "read", "analysis", ids["analysis_id"]
+    )
+
+    user.permissions.remove(permission)
+    db.session.commit()
+    assert not get_permission_index(user).has_access(
+        "read", "analysis", ids["analysis_id"]
+    )
+
+
+def test_index_invalidated_on_link_change(permission_app):
+    user, _ = permission_app
+    first, second = _organs()
+
+    permission = Permission(
+        type="read", object_type="organ", object_id=first.id
+    )
+    db.session.add(permission)
+    user.add_permission(permission)
+
+    unit = (
+        Unit.query.join(Unit.institutions)
+        .filter(Institution.organs.contains(second))
+        .first()
+    )
+    assert not get_permission_index(user).has_access("read", "unit", unit.id)
+
+    institution = unit.institutions[0]
+    institution.organs = [first]
+    db.session.commit()
+    assert get_permission_index(user).has_access("read", "unit", unit.id)
@@ -0,0 +1,18 @@
+import pytest
+
+from coruja.benchmarks import (
+    BUDGET_SCALES,
+    ROUTE_REQUESTS,
+    check_query_budgets,
+)
+
+
+@pytest.mark.parametrize(
+    "endpoint", [endpoint for endpoint, _, _ in ROUTE_REQUESTS]
+)
+def test_query_budget(query_measures, endpoint):
+    """A rota responde, respeita o orçamento e não possui consultas N+1"""
+    violations = check_query_budgets(
+        query_measures, BUDGET_SCALES, endpoints=[endpoint]
+    )
+    assert violations == []
@@ -0,0 +1,144 @@
+import pytest
+from sqlalchemy import select
+
+from coruja.benchmarks import seeded_app
+from coruja.extensions.database import db
+from coruja.models import (
+    AdverseAction,
+    Threat,
+    Vulnerability,
+    VulnerabilityCategory,
+    VulnerabilitySubCategory,
+)
+from coruja.models.rollups import rebuild_rollups
+from coruja.utils import database_manager
+
+
+@pytest.fixture
+def scoring_app():
+    """Aplicação populada, cliente autenticado como administrador (que
+    ainda não pontuou nenhum item) e os itens a pontuar"""
+    with seeded_app() as (app, ids):
+        with app.app_context():
+            ids["adverse_action_id"] = db.session.scalar(
+                select(AdverseAction.id)
+                .join(Threat, AdverseAction.threat_id == Threat.id)
+                .where(Threat.active_id == ids["active_id"])
+                .order_by(AdverseAction.id)
+            )
+            ids["vulnerability_id"] = db.session.scalar(
+                select(Vulnerability.id)
+                .join(
+                    VulnerabilitySubCategory,
+                    Vulnerability.sub_category_id
+                    == VulnerabilitySubCategory.id,
+                )
+                .join(
+                    VulnerabilityCategory,
+                    VulnerabilitySubCategory.category_id
+                    == VulnerabilityCategory.id,
+                )
+                .where(VulnerabilityCategory.id == ids["category_id"])
+                .order_by(Vulnerability.id)
+            )
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(ids["admin_id"])
+            session["_fresh"] = True
+
+        yield app, client, ids
+
+
+def _rollup_mismatches(app) -> int:
+    with app.app_context():
+        _, mismatches = rebuild_rollups(db.session.connection())
+        db.session.rollback()
+    return mismatches
+
+
+def test_single_routes_keep_rollups(scoring_app):
+    app, client, ids = scoring_app
+    av_id = ids["analysis_vulnerability_id"]
+
+    # Cria e depois atualiza a pontuação de cada item
+    for value in (2, 5):
+        response = client.post(
+            "/api/v1/update-active-score",
+            json={
+                "ac_id": ids["active_id"],
+                "scores": {"essentiality": value, "replacement_cost": 1},
+            },
+        )
+        assert response.status_code == 200
+
+        response = client.post(
+            "/api/v1/update-adveser-action-score",
+            json={
+                "ad_id": ids["adverse_action_id"],
+                "scores": {"motivation": value, "capacity": value},
+            },
+        )
+        assert response.status_code == 200
+
+        response = client.post(
+            "/api/v1/update-vulnerability-score",
+            json={
+                "vuln_id": ids["vulnerability_id"],
+                "score": value,
+                "av_id": av_id,
+            },
+        )
+        assert response.status_code == 200
+
+    assert _rollup_mismatches(app) == 0
+
+
+def test_batch_route_keeps_rollups(scoring_app):
+    app, client, ids = scoring_app
+    items = [
+        {"type": "active", "id": ids["active_id"]},
+        {"type": "adverse_action", "id": ids["adverse_action_id"]},
+        {
+            "type": "vulnerability",
+            "id": ids["vulnerability_id"],
+            "av_id": ids["analysis_vulnerability_id"],
+        },
+    ]
+    fields = {
+        "active": "substitutability",
+        "adverse_action": "accessibility",
+        "vulnerability": "score",
+    }
+
+    for value, status in ((3, "created"), (4, "updated"), (4, "unchanged")):
+        scores = [
+            {**item, "scores": {fields[item["type"]]: value}} for item in items
+        ]
+        response = client.post("/api/v1/scores/batch", json={"scores": scores})
+        assert response.status_code == 200
+        assert [r["status"] for r in response.get_json()["results"]] == [
+            status
+        ] * len(items)
+
+    assert _rollup_mismatches(app) == 0
+
+
+def test_upsert_scores_keeps_rollups(scoring_app):
+    app, _, ids = scoring_app
+    key = (ids["analysis_vulnerability_id"], ids["vulnerability_id"])
+
+    with app.app_context():
+        for value in (1, 4):
+            database_manager.upsert_scores(
+                ids["admin_id"],
+                {
+                    "active": {(ids["active_id"],): {"essentiality": value}},
+                    "adverse_action": {
+                        (ids["adverse_action_id"],): {"capacity": value}
+                    },
+                    "vulnerability": {key: {"score": value}},
+                },
+            )
+
+    assert _rollup_mismatches(app) == 0